@@ -0,0 +1,111 @@
+#!/usr/bin/python3
+
+# AI 531 - Project 2 - 15 Puzzle
+# Scaling benchmark across board sizes
+
+import os
+import random
+import sys
+import time
+
+from hda_star import hdaStar
+from ida_star import idaStar
+from linear_conflict import heuristicMy
+from move_pruning import getMoveAutomaton, inverseDepth
+from puzzle import Puzzle, aStar
+
+"""
+Solves the same number of seeded scrambles on each board size (8, 15, 24 and 35 puzzles) and reports
+nodes expanded per second, so the cost per node can be compared as the board grows. Every size runs
+in the same process, which also checks that the per-size tables do not interfere with each other.
+The parallel benchmark solves one fixed set of hard 4x4 scrambles with hdaStar on 1..N workers.
+"""
+
+benchmarkSizes = [3, 4, 5, 6]  # rows/cols of the boards to benchmark
+benchmarkSearches = {'astar': aStar, 'idaStar': idaStar}  # name -> search function
+benchmarkScramble = 30  # scramble length of each puzzle
+benchmarkPuzzles = 5  # puzzles per board size
+parallelScramble = 60  # scramble length of the hdaStar instance set
+parallelPuzzles = 5  # puzzles in the hdaStar instance set
+parallelNodeLimit = 1000000  # node limit for hdaStar, high enough that the instance set is solved
+
+
+def scaleBenchmark(sizes=None, searches=None, m=benchmarkScramble, puzzles=benchmarkPuzzles, seed=0):
+    """
+    Solve seeded scrambles of every size with every search and report nodes/second
+    :param sizes: board sizes (defaults to benchmarkSizes)
+    :param searches: name -> search function (defaults to benchmarkSearches)
+    :param m: scramble length
+    :param puzzles: puzzles per size
+    :param seed: base seed, the same seed gives the same puzzles
+    :return: list of (size, search name, nodes, seconds, solved count)
+    """
+    results = []
+    getMoveAutomaton()  # the pruning automata are shared by every size, build them before timing
+    getMoveAutomaton(inverseDepth)
+    for size in sizes or benchmarkSizes:
+        random.seed('%s-%d' % (seed, size))
+        tilesList = []
+        for i in range(puzzles):
+            puzzle = Puzzle(size=size)
+            puzzle.scramblePuzzle(m)
+            tilesList.append(puzzle.tiles)
+        heuristicMy(Puzzle(size=size))  # build the size's heuristic tables before timing
+
+        for name, search in (searches or benchmarkSearches).items():
+            nodes = 0
+            solved = 0
+            start = time.perf_counter()
+            for tiles in tilesList:
+                result = search(tiles, heuristicMy)
+                nodes += result.stats.expanded
+                if result[0]:
+                    solved += 1
+            runTime = time.perf_counter() - start
+
+            print('%dx%d %s: nodes=%d, time=%.3f, nodes/second=%.0f, solved=%d/%d' % (
+                size, size, name, nodes, runTime, nodes / runTime if runTime else 0, solved, puzzles))
+            results.append((size, name, nodes, runTime, solved))
+
+    return results
+
+
+def parallelBenchmark(workerCounts=None, m=parallelScramble, puzzles=parallelPuzzles, seed=0):
+    """
+    Solve a fixed set of seeded 4x4 scrambles with hdaStar on 1..N workers and report time and speedup
+    :param workerCounts: worker counts to run (defaults to 1 up to the number of cpus)
+    :param m: scramble length
+    :param puzzles: puzzles in the set
+    :param seed: seed of the instance set
+    :return: list of (workers, nodes, seconds, speedup over the first worker count)
+    """
+    random.seed('%s-parallel' % seed)
+    tilesList = []
+    for i in range(puzzles):
+        puzzle = Puzzle()
+        puzzle.scramblePuzzle(m)
+        tilesList.append(puzzle.tiles)
+
+    results = []
+    for workers in workerCounts or range(1, os.cpu_count() + 1):
+        nodes = 0
+        start = time.perf_counter()
+        for tiles in tilesList:
+            result = hdaStar(tiles, heuristicMy, workers, parallelNodeLimit)
+            nodes += result.stats.expanded
+        runTime = time.perf_counter() - start
+        speedup = results[0][2] / runTime if results else 1.0
+
+        print('hdaStar %d workers: nodes=%d, time=%.3f, nodes/second=%.0f, speedup=%.2f' % (
+            workers, nodes, runTime, nodes / runTime, speedup))
+        results.append((workers, nodes, runTime, speedup))
+
+    return results
+
+
+if __name__ == '__main__':
+    # python benchmark.py [size ...]  or  python benchmark.py parallel [workers ...]
+    if sys.argv[1:2] == ['parallel']:
+        parallelBenchmark([int(arg) for arg in sys.argv[2:]] or None)
+    else:
+        scaleBenchmark([int(arg) for arg in sys.argv[1:]] or None)
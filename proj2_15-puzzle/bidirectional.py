@@ -0,0 +1,144 @@
+#!/usr/bin/python3
+
+# AI 531 - Project 2 - 15 Puzzle
+# Bidirectional heuristic search (MM)
+
+from open_list import BucketQueue
+import puzzle as puzzleModule
+from puzzle import newSearchNode, newSolutionNode, childHeuristic, finishSearch, \
+    getBoardInfo, reverseMoves
+from search_stats import SearchStats, SearchStatus
+from sys import maxsize
+
+"""
+MM (Holte, Felner, Sharon and Sturtevant, 2016) searches forward from the start and backward from the goal
+at the same time, front-to-end: forward nodes estimate their distance to the goal and backward nodes their
+distance to the start. Backward nodes are built on the BoardInfo whose goal is the start board, so the same
+heuristic functions work in both directions.
+
+Each direction orders its open list by priority pr(n) = max(f(n), 2g(n)) and the search expands the node
+with the lowest priority of the two directions. A child whose state was reached by the other direction
+joins the two paths into a solution; U is the cheapest found so far. C, the lowest priority left in either
+open list, is a lower bound on any solution not yet found, so when U <= C the search stops with U optimal.
+(The full MM stopping rule also looks at the lowest f and g in each direction, which only stops sooner.)
+Children with f >= U are not queued, they can not lead to a cheaper solution.
+
+The 2g term keeps each direction from going past the middle of the solution before the other direction
+gets there, so the two searches meet in the middle.
+"""
+
+
+class Frontier:
+    """
+    One direction of the search: its open list and the cheapest node found for each state
+    """
+
+    def __init__(self, root, whichHeuristic, stats):
+        self.open = BucketQueue()
+        self.reached = {}  # state -> cheapest node found to it (a queue entry that is not this node is stale)
+        self.whichHeuristic = whichHeuristic
+        self.stats = stats
+        root.heuristic = stats.evaluate(whichHeuristic, root)
+        self.put(root)
+
+    def put(self, node):
+        self.reached[node.getKey()] = node
+        self.open.put(max(node.cost + node.heuristic, 2 * node.cost), node.cost, node)
+
+    def minPriority(self):
+        """
+        Drop stale entries from the front of the open list and return the lowest priority left
+        :return: priority, or maxsize if the open list is empty
+        """
+        while not self.open.empty():
+            (priority, cost, node) = self.open.get()
+            if self.reached[node.getKey()] is node:
+                self.open.put(priority, cost, node)  # put back, it is still the best entry
+                return priority
+            self.stats.duplicates += 1
+        return maxsize
+
+
+def pathMoves(node):
+    """
+    Return the moves from the root of a node's search to the node
+    :param node:
+    :return:
+    """
+    moves = []
+    while node.parent is not None:
+        moves.append(node.move)
+        node = node.parent
+    moves.reverse()
+    return moves
+
+
+def mmSearch(tiles, whichHeuristic, goal=None):
+    """
+    Bidirectional MM search, finds an optimal solution with an admissible heuristic
+    :param tiles: starting board (2D list)
+    :param whichHeuristic: heuristic that reads its targets from the node's board (heuristicCityBlock, heuristicMy)
+    :param goal: board to solve to (2D list, defaults to tiles in order)
+    :return: Solution node (or None if no solution found), fLimit, nodes checked, moves (stats in result.stats)
+    """
+    count = 0
+    stats = SearchStats()
+    goal = goal or getBoardInfo(len(tiles)).solvedTiles
+    start = newSearchNode(tiles, goal)
+    end = newSearchNode(goal, tiles)  # backward nodes are solved when they reach the start
+    forward = Frontier(start, whichHeuristic, stats)
+    backward = Frontier(end, whichHeuristic, stats)
+
+    incumbent = maxsize  # U: cost of the cheapest solution found
+    meeting = None  # (forward node, backward node) of that solution
+    if start.getKey() == end.getKey():
+        incumbent = 0
+        meeting = (start, end)
+
+    while True:
+        forwardPriority = forward.minPriority()
+        backwardPriority = backward.minPriority()
+        if incumbent <= min(forwardPriority, backwardPriority):
+            break  # C >= U, no solution cheaper than the incumbent is left
+        if count >= puzzleModule.maxNodesPerSearch:
+            print('Max nodes exceeded, terminating search. Nodes checked: %d' % count)
+            return finishSearch(None, None, count, 0, stats, SearchStatus.NODE_LIMIT)
+
+        # expand from the direction with the lower priority, the one with fewer open nodes on a tie
+        if (forwardPriority, len(forward.open)) <= (backwardPriority, len(backward.open)):
+            frontier, other = forward, backward
+        else:
+            frontier, other = backward, forward
+        (priority, cost, node) = frontier.open.get()
+
+        children = node.generateChildren()
+        stats.expand(node.cost)
+        stats.generated += len(children)
+        for child in children:
+            childKey = child.getKey()
+            best = frontier.reached.get(childKey)
+            if best is not None and best.cost <= child.cost:
+                stats.duplicates += 1
+                continue  # already reached as cheaply (reached children are checked against the other side then)
+
+            meet = other.reached.get(childKey)
+            if meet is not None and child.cost + meet.cost < incumbent:
+                incumbent = child.cost + meet.cost
+                meeting = (child, meet) if frontier is forward else (meet, child)
+
+            h = childHeuristic(frontier.whichHeuristic, node, child, stats)
+            if child.cost + h >= incumbent:
+                continue  # can not be on a cheaper solution
+            frontier.put(child)
+            count += 1
+        stats.updatePeaks(len(forward.open) + len(backward.open), len(forward.reached) + len(backward.reached))
+
+    if meeting is None:
+        print("No solution found")
+        return finishSearch(None, maxsize, count, 0, stats, SearchStatus.NO_SOLUTION)
+
+    # the backward path runs from the goal to the meeting state: undo its moves in reverse order
+    (forwardNode, backwardNode) = meeting
+    moves = pathMoves(forwardNode) + [reverseMoves[move] for move in reversed(pathMoves(backwardNode))]
+    node = newSolutionNode(tiles, moves, goal)
+    return finishSearch(node, incumbent, count, node.cost, stats, SearchStatus.SOLVED)
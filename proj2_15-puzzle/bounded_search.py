@@ -0,0 +1,203 @@
+#!/usr/bin/python3
+
+# AI 531 - Project 2 - 15 Puzzle
+# Bounded-suboptimal searches: weighted A* and focal search
+
+import heapq
+
+from open_list import HeapQueue
+import puzzle as puzzleModule
+from puzzle import newSearchNode, childHeuristic, finishSearch
+from search_stats import SearchStats, SearchStatus
+from sys import maxsize
+
+"""
+Both searches give up optimality for speed, with a limit on how far from optimal the solution can be
+(when the heuristic is admissible):
+    weightedAStar orders the open list by g + w * h, the solution costs at most w times the optimal cost
+    focalSearch expands, among the open nodes with g + h within (1 + epsilon) of the lowest g + h, the one
+    with the lowest h, the solution costs at most (1 + epsilon) times the optimal cost
+States are reopened when a cheaper path to them is found, so the open list always holds a node of an optimal
+path with its optimal cost. When the goal is reached, the lowest g + h on the open list is a lower bound on
+the optimal cost, and the achieved bound (solution cost / lower bound) is reported in result.stats, which is
+usually much tighter than w or 1 + epsilon.
+"""
+
+defaultWeight = 1.5  # weight on h used by weightedAStar
+defaultEpsilon = 0.2  # focalSearch solutions are within (1 + epsilon) of optimal
+
+
+class FocalQueue:
+    """
+    Open list for focalSearch. Takes (f, g, node) entries with small integer f like BucketQueue, and get()
+    returns the entry with the lowest h = f - g (then highest g, then newest) among the entries whose
+    f is at most (1 + epsilon) times the lowest f on the list (the focal list).
+    """
+
+    def __init__(self, epsilon=defaultEpsilon):
+        self.epsilon = epsilon
+        self.waiting = []  # waiting[f] = (g, node) entries with this f that are not on the focal list yet
+        self.counts = []  # counts[f] = entries with this f (waiting or focal)
+        self.focal = []  # heap of (h, -g, -count, f, node)
+        self.focalF = -1  # entries with f up to this value go on the focal list
+        self.minF = 0  # lowest f on the list
+        self.size = 0
+        self.count = 0  # insertion counter, negated so later entries win ties
+
+    def put(self, f, g, node):
+        while len(self.counts) <= f:
+            self.counts.append(0)
+            self.waiting.append([])
+        self.counts[f] += 1
+
+        if self.size == 0 or f < self.minF:
+            self.minF = f
+            if f * (1 + self.epsilon) < self.focalF:
+                self.shrinkFocal()
+        self.size += 1
+
+        if f <= self.focalF:
+            self.count += 1
+            heapq.heappush(self.focal, (f - g, -g, -self.count, f, node))
+        else:
+            self.waiting[f].append((g, node))
+
+    def shrinkFocal(self):
+        """
+        The lowest f went down: move entries above the new focal limit back to the waiting lists
+        :return:
+        """
+        self.focalF = int(self.minF * (1 + self.epsilon))
+        entries = self.focal
+        self.focal = []
+        for entry in entries:
+            (h, negG, negCount, f, node) = entry
+            if f <= self.focalF:
+                self.focal.append(entry)
+            else:
+                self.waiting[f].append((-negG, node))
+        heapq.heapify(self.focal)
+
+    def get(self):
+        """
+        Remove and return the best entry of the focal list
+        :return: (f, g, node)
+        """
+        counts = self.counts
+        while not counts[self.minF]:
+            self.minF += 1
+
+        # the lowest f may have gone up since the last call, so more waiting entries can be focal now
+        limit = int(self.minF * (1 + self.epsilon))
+        for f in range(self.focalF + 1, min(limit, len(counts) - 1) + 1):
+            for (g, node) in self.waiting[f]:
+                self.count += 1
+                heapq.heappush(self.focal, (f - g, -g, -self.count, f, node))
+            self.waiting[f] = []
+        self.focalF = max(self.focalF, limit)
+
+        (h, negG, negCount, f, node) = heapq.heappop(self.focal)
+        counts[f] -= 1
+        self.size -= 1
+        return f, -negG, node
+
+    def empty(self):
+        return self.size == 0
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        """
+        Yield every (f, g, node) entry without removing it, in no particular order
+        """
+        for (h, negG, negCount, f, node) in self.focal:
+            yield f, -negG, node
+        for f, entries in enumerate(self.waiting):
+            for (g, node) in entries:
+                yield f, g, node
+
+
+def weightedAStar(tiles, whichHeuristic, weight=defaultWeight):
+    """
+    Weighted A* (WA*): A* on f = g + weight * h
+    :param weight: weight on the heuristic (1 gives A*)
+    :return: Solution node (or None if no solution found), fLimit, nodes checked, moves (stats in result.stats)
+    """
+    return boundedSearch(tiles, whichHeuristic, HeapQueue(), weight)
+
+
+def focalSearch(tiles, whichHeuristic, epsilon=defaultEpsilon):
+    """
+    Focal search (A* epsilon): expands the node closest to the goal among those within (1 + epsilon) of the lowest f
+    :param epsilon: allowed suboptimality, 0 gives A*
+    :return: Solution node (or None if no solution found), fLimit, nodes checked, moves (stats in result.stats)
+    """
+    return boundedSearch(tiles, whichHeuristic, FocalQueue(epsilon), 1)
+
+
+def boundedSearch(tiles, whichHeuristic, Q, weight):
+    """
+    Best first search with reopening, shared by weightedAStar and focalSearch
+    :param Q: open list (entries are put with f = g + weight * h)
+    :param weight: weight on the heuristic
+    :return: SearchResult
+    """
+    count = 0
+    node = None
+    stats = SearchStats()
+    bestCost = {}  # cheapest cost found so far for each state (a cheaper path reopens an expanded state)
+
+    root = newSearchNode(tiles)
+    root.heuristic = stats.evaluate(whichHeuristic, root)
+    Q.put(weight * root.heuristic, root.cost, root)
+    bestCost[root.getKey()] = root.cost
+
+    while not Q.empty():
+        if count >= puzzleModule.maxNodesPerSearch:
+            print('Max nodes exceeded, terminating search. Nodes checked: %d' % count)
+            return finishSearch(None, None, count, node.cost, stats, SearchStatus.NODE_LIMIT)
+        (nodeEstimate, nodeCost, node) = Q.get()
+
+        key = node.getKey()
+        if node.cost > bestCost[key]:
+            stats.duplicates += 1
+            continue  # stale queue entry, this state was reached more cheaply
+        if node.isPuzzleSolved():
+            proveBound(node, root, Q, bestCost, stats)
+            return finishSearch(node, None, count, node.cost, stats, SearchStatus.SOLVED)
+        children = node.generateChildren()
+        stats.expand(node.cost)
+        stats.generated += len(children)
+
+        for child in children:
+            childKey = child.getKey()
+            if bestCost.get(childKey, maxsize) <= child.cost:
+                stats.duplicates += 1
+                continue  # already reached with an equal or better cost
+            bestCost[childKey] = child.cost
+            count += 1
+            estimate = childHeuristic(whichHeuristic, node, child, stats)
+            Q.put(child.cost + weight * estimate, child.cost, child)
+        stats.updatePeaks(len(Q), len(bestCost))  # states seen so far are kept for duplicate detection
+
+    return finishSearch(node, None, count, node.cost if node else 0, stats, SearchStatus.NO_SOLUTION)
+
+
+def proveBound(goal, root, Q, bestCost, stats):
+    """
+    Set stats.lowerBound and stats.suboptimality when the goal is reached
+    The lowest g + h of the live open entries (and the root's h) cannot exceed the optimal cost
+    :param goal: solution node
+    :param root: start node
+    :param Q: open list
+    :param bestCost: cheapest cost of each state, entries above it are stale
+    :param stats:
+    :return:
+    """
+    lowerBound = goal.cost
+    for (f, g, node) in Q:
+        if node.cost == bestCost[node.getKey()] and node.cost + node.heuristic < lowerBound:
+            lowerBound = node.cost + node.heuristic
+    stats.lowerBound = max(lowerBound, root.heuristic)
+    stats.suboptimality = goal.cost / stats.lowerBound if stats.lowerBound else 1.0
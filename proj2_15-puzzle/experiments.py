@@ -0,0 +1,179 @@
+#!/usr/bin/python3
+
+# AI 531 - Project 2 - 15 Puzzle
+# Parallel data collection for the report
+
+import csv
+import random
+import sys
+import time
+
+from linear_conflict import heuristicMy
+from multiprocessing import Pool
+from puzzle import Puzzle, aStar, rbfs, heuristicCityBlock, csvFilename
+from walking_distance import heuristicWalkingDistance
+
+"""
+Runs the (m, trial, algorithm, heuristic) grid of the assignment. Every solve is independent, so the
+grid is split into jobs and sent to a process pool. Each job scrambles its own puzzle from a seed
+derived from (seed, m, trial), so the same puzzle is given to every algorithm/heuristic pair and
+a run can be repeated exactly, no matter which worker picks the job up or in what order.
+"""
+
+searchFuncs = {'astar': aStar, 'rbfs': rbfs}  # name used in the csv -> search function
+heuristics = {'cityBlock': heuristicCityBlock, 'myHeuristic': heuristicMy,
+              'walkingDistance': heuristicWalkingDistance}  # name used in the csv -> heuristic
+TRIALS = [10, 20, 30, 40, 50]  # scramble lengths
+numTrials = 10  # puzzles per scramble length
+csvHeader = ['m', 'puzzleNum', 'searchFunc', 'heuristic', 'moves', 'nodesChecked', 'runTime (seconds)',
+             'solutionFound', 'heuristic % runTime', 'heuristic time']
+
+
+def scramble(m, trialSeed):
+    """
+    Return the tiles of a puzzle scrambled m moves from the goal, using its own seeded RNG
+    :param m: number of scramble moves
+    :param trialSeed: seed for this puzzle
+    :return:
+    """
+    random.seed(trialSeed)
+    puzzle = Puzzle()
+    puzzle.scramblePuzzle(m)
+    return puzzle.tiles
+
+
+def runJob(job):
+    """
+    Solve one puzzle with one search function and heuristic (runs in a worker process)
+    :param job: (m, puzzleNum, algo name, heuristic name, seed for the puzzle)
+    :return: (m, puzzleNum, algo, heuristic, [moves, nodesChecked, runTime, solutionFound, heuristicPct, heuristicTime])
+    """
+    (m, puzzleNum, algo, heuristic, trialSeed) = job
+    tiles = scramble(m, trialSeed)
+
+    start = time.time()
+    result = searchFuncs[algo](tiles, heuristics[heuristic])
+    runTime = time.time() - start
+    (node, fLimit, nodesChecked, moves) = result
+    heuristicTime = result.stats.heuristicNs / 1e9
+
+    solutionFound = False
+    if node:
+        moves = node.cost
+        solutionFound = True
+    heuristicPct = heuristicTime / runTime * 100 if runTime else 0
+
+    return m, puzzleNum, algo, heuristic, [moves, nodesChecked, runTime, solutionFound, heuristicPct, heuristicTime]
+
+
+def buildJobs(trials, trialsPerM, seed):
+    """
+    List every (m, puzzleNum, algo, heuristic, puzzle seed) combination to solve
+    :param trials: scramble lengths
+    :param trialsPerM: puzzles per scramble length
+    :param seed: base seed for the run
+    :return:
+    """
+    jobs = []
+    for m in trials:
+        for n in range(trialsPerM):
+            trialSeed = '%s-%d-%d' % (seed, m, n)  # string seeds are hashed the same way in every process
+            for algo in searchFuncs:
+                for heuristic in heuristics:
+                    jobs.append((m, n, algo, heuristic, trialSeed))
+    return jobs
+
+
+def runExperiments(trials=None, trialsPerM=numTrials, workers=None, seed=0, filename=csvFilename):
+    """
+    Solve the whole grid in a process pool, report progress, and write the results to a csv
+    :param trials: scramble lengths (defaults to TRIALS)
+    :param trialsPerM: puzzles per scramble length
+    :param workers: number of processes (None = one per cpu, 1 = run in this process)
+    :param seed: base seed, the same seed gives the same puzzles
+    :param filename: csv to write
+    :return: run data as runData[algo][heuristic][m] = list of trial results (in puzzle order)
+    """
+    trials = trials or TRIALS
+    jobs = buildJobs(trials, trialsPerM, seed)
+
+    runData = {}
+    for algo in searchFuncs:
+        runData[algo] = {}
+        for heuristic in heuristics:
+            runData[algo][heuristic] = {m: [None] * trialsPerM for m in trials}
+
+    start = time.time()
+    if workers == 1:
+        results = map(runJob, jobs)
+        pool = None
+    else:
+        pool = Pool(workers)
+        results = pool.imap_unordered(runJob, jobs)
+
+    try:
+        for done, (m, puzzleNum, algo, heuristic, trial) in enumerate(results, 1):
+            runData[algo][heuristic][m][puzzleNum] = trial
+            (moves, nodesChecked, runTime, solutionFound, heuristicPct, heuristicTime) = trial
+            print('[%d/%d %.0fs] m=%d puzzle=%d %s w/ %s: moves=%3d, nodes=%5d, time=%f, heuristicPct=%2.4f' % (
+                done, len(jobs), time.time() - start, m, puzzleNum, algo, heuristic, moves, nodesChecked, runTime,
+                heuristicPct))
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+
+    writeResults(runData, filename)
+    return runData
+
+
+def writeResults(runData, filename=csvFilename):
+    """
+    Write the run data to a csv grouped by algo/heuristic, and print the summary rows for the report
+    :param runData: runData[algo][heuristic][m] = list of trial results
+    :param filename: csv to write
+    :return:
+    """
+    with open(filename, 'w', newline='') as csvFH:
+        writer = csv.writer(csvFH)
+        writer.writerow(csvHeader)
+
+        for algo in runData:
+            for heuristic in runData[algo]:
+                print('Algo = %s, Heuristic = %s' % (algo, heuristic))
+
+                for mValue in runData[algo][heuristic]:
+                    moveSum = 0
+                    nodeSum = 0
+                    timeSum = 0
+                    solnCount = 0
+                    trialCount = len(runData[algo][heuristic][mValue])
+
+                    for puzzleNum, trial in enumerate(runData[algo][heuristic][mValue]):
+                        (moves, nodesChecked, runTime, solutionFound, heuristicPct, heuristicTime) = trial
+                        writer.writerow(
+                            [mValue, puzzleNum, algo, heuristic, moves, nodesChecked, runTime, solutionFound,
+                             heuristicPct, heuristicTime])
+                        nodeSum += nodesChecked
+                        timeSum += runTime
+                        if solutionFound:
+                            moveSum += moves
+                            solnCount += 1
+
+                    moveAvg = 0
+                    if solnCount:  # only average if a puzzle was solved, else 0
+                        moveAvg = int(moveSum / solnCount)  # average the moves on SOLVED puzzles only
+                    nodeAvg = int(nodeSum / trialCount)
+                    timeAvg = "%.4f" % (timeSum / trialCount)
+                    solnAvg = int(solnCount / trialCount * 100)
+
+                    # printout for tables in latex report
+                    print(f' & {mValue} & {timeAvg} & {nodeAvg} & {moveAvg} & {solnAvg} \\\\')
+
+    print('Data collection complete, results written to: %s' % filename)
+
+
+if __name__ == '__main__':
+    # python experiments.py [workers] [seed]
+    runExperiments(workers=int(sys.argv[1]) if len(sys.argv) > 1 else None,
+                   seed=sys.argv[2] if len(sys.argv) > 2 else 0)
@@ -0,0 +1,240 @@
+#!/usr/bin/python3
+
+# AI 531 - Project 2 - 15 Puzzle
+# External-memory breadth first search
+
+import glob
+import heapq
+import mmap
+import os
+import sys
+import time
+
+from permutation_rank import rankState, stateCount, unknownDistance
+from puzzle import getBoardInfo, movePacked
+
+"""
+A breadth first search that keeps its layers on disk instead of in a closed set, for spaces too big for
+memory (large pattern databases, complete distance maps of reduced puzzles). Each layer is a file of
+states sorted in ascending order, stateBytes big-endian bytes per state, and is read back memory-mapped.
+
+Duplicate detection is delayed: the children of layer d are collected in memory up to runStates at a
+time, each batch is sorted and written as a run file, and then the runs are merged in one streaming
+pass. The merge drops repeated states and every state of layers d and d - 1, the only earlier layers a
+child of layer d can be in (moves can be undone), and writes what is left as layer d + 1. So memory
+only holds one batch of children, whatever the size of the layers.
+
+A layer file is written to a temporary name and renamed when complete. A search that is interrupted
+and run again with the same directory starts after the last complete layer; an empty layer file marks
+a finished search.
+"""
+
+runStates = 1 << 20  # children sorted in memory at a time (each batch becomes one run file)
+
+
+def layerFilename(directory, depth):
+    """
+    Return the file of one layer
+    :param directory: search directory
+    :param depth: distance of the layer's states from the start
+    :return:
+    """
+    return os.path.join(directory, 'layer%03d.bin' % depth)
+
+
+def readLayer(directory, depth, stateBytes):
+    """
+    Generate the states of a layer in ascending order, reading the file memory-mapped
+    :param directory: search directory
+    :param depth: distance of the layer's states from the start
+    :param stateBytes: bytes per state
+    :return:
+    """
+    with open(layerFilename(directory, depth), 'rb') as fh:
+        if os.fstat(fh.fileno()).st_size == 0:
+            return
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for offset in range(0, len(data), stateBytes):
+                yield int.from_bytes(data[offset:offset + stateBytes], 'big')
+
+
+def readRun(filename, stateBytes):
+    """
+    Generate the states of a run file in ascending order
+    :param filename:
+    :param stateBytes: bytes per state
+    :return:
+    """
+    with open(filename, 'rb') as fh:
+        while True:
+            data = fh.read(stateBytes * 4096)
+            if not data:
+                return
+            for offset in range(0, len(data), stateBytes):
+                yield int.from_bytes(data[offset:offset + stateBytes], 'big')
+
+
+def writeStates(filename, states, stateBytes):
+    """
+    Write states (already sorted) to a file, through a temporary name so a partial file is never read
+    :param filename:
+    :param states: iterable of states in ascending order
+    :param stateBytes: bytes per state
+    :return: number of states written
+    """
+    count = 0
+    with open(filename + '.tmp', 'wb') as fh:
+        buffer = []
+        for state in states:
+            buffer.append(state.to_bytes(stateBytes, 'big'))
+            if len(buffer) >= 4096:
+                fh.write(b''.join(buffer))
+                buffer = []
+            count += 1
+        fh.write(b''.join(buffer))
+    os.replace(filename + '.tmp', filename)
+    return count
+
+
+def completedLayers(directory, stateBytes):
+    """
+    Return the sizes of the complete layers already in a search directory (layer 0 first)
+    :param directory: search directory
+    :param stateBytes: bytes per state
+    :return:
+    """
+    sizes = []
+    while os.path.exists(layerFilename(directory, len(sizes))):
+        size = os.path.getsize(layerFilename(directory, len(sizes)))
+        if size % stateBytes:
+            raise ValueError('%s is not a layer of %d byte states' % (layerFilename(directory, len(sizes)),
+                                                                       stateBytes))
+        sizes.append(size // stateBytes)
+    return sizes
+
+
+def newStates(children, seen):
+    """
+    Merge step of delayed duplicate detection: states of children that are not in seen, each once
+    :param children: sorted states (may repeat)
+    :param seen: sorted states of the previous layers
+    :return:
+    """
+    seen = iter(seen)
+    other = next(seen, None)
+    last = None
+    for state in children:
+        if state == last:
+            continue
+        last = state
+        while other is not None and other < state:
+            other = next(seen, None)
+        if state != other:
+            yield state
+
+
+def externalBFS(directory, starts, successors, stateBytes, maxDepth=None):
+    """
+    Breadth first search with its layers on disk, resuming after the last complete layer in directory
+    :param directory: search directory (created if needed)
+    :param starts: states at depth 0 (ignored when resuming)
+    :param successors: function state -> iterable of child states
+    :param stateBytes: bytes per state (states are non-negative ints below 256 ** stateBytes)
+    :param maxDepth: stop after writing this layer (None runs until a layer is empty)
+    :return: list of layer sizes (layer 0 first)
+    """
+    os.makedirs(directory, exist_ok=True)
+    sizes = completedLayers(directory, stateBytes)
+    for depth in range(len(sizes)):  # runs of a layer the last run wrote but did not get to delete
+        for filename in glob.glob(layerFilename(directory, depth) + '.*'):
+            os.remove(filename)
+    if not sizes:
+        sizes.append(writeStates(layerFilename(directory, 0), sorted(set(starts)), stateBytes))
+
+    while sizes[-1] and (maxDepth is None or len(sizes) <= maxDepth):
+        depth = len(sizes) - 1
+        nextLayer = layerFilename(directory, depth + 1)
+        for filename in glob.glob(nextLayer + '.*'):  # left over from an interrupted run
+            os.remove(filename)
+
+        # sorted runs of the children of this layer
+        runs = []
+        batch = []
+        for state in readLayer(directory, depth, stateBytes):
+            batch.extend(successors(state))
+            if len(batch) >= runStates:
+                runs.append(nextLayer + '.run%d' % len(runs))
+                writeStates(runs[-1], sorted(set(batch)), stateBytes)
+                batch = []
+        if batch or not runs:
+            runs.append(nextLayer + '.run%d' % len(runs))
+            writeStates(runs[-1], sorted(set(batch)), stateBytes)
+
+        children = heapq.merge(*[readRun(run, stateBytes) for run in runs])
+        seen = readLayer(directory, depth, stateBytes)
+        if depth:
+            seen = heapq.merge(seen, readLayer(directory, depth - 1, stateBytes))
+        sizes.append(writeStates(nextLayer, newStates(children, seen), stateBytes))
+        for run in runs:
+            os.remove(run)
+
+    return sizes
+
+
+def puzzleSuccessors(size):
+    """
+    Return the successor function of packed boards of one size, for externalBFS
+    :param size: number of rows and cols of the board
+    :return:
+    """
+    board = getBoardInfo(size)
+    bits = board.cellBits
+    mask = board.cellMask
+
+    def successors(state):
+        blank = 0
+        while (state >> (blank * bits)) & mask:
+            blank += 1
+        return [movePacked(state, blank, target, bits) for move, target in board.packedMoves[blank]]
+
+    return successors
+
+
+def puzzleStateBytes(size):
+    """
+    Bytes needed for a packed board of one size
+    :param size: number of rows and cols of the board
+    :return:
+    """
+    board = getBoardInfo(size)
+    return (board.numCells * board.cellBits + 7) // 8
+
+
+def puzzleDistances(directory, size=3, maxDepth=None):
+    """
+    Distance from the goal of every board of a (reduced) puzzle, searched with externalBFS and stored
+    by permutation rank
+    :param directory: search directory
+    :param size: number of rows and cols of the board
+    :param maxDepth: deepest layer to search
+    :return: bytearray indexed by rankState (unknownDistance for boards not reached)
+    """
+    board = getBoardInfo(size)
+    stateBytes = puzzleStateBytes(size)
+    sizes = externalBFS(directory, [board.solvedState], puzzleSuccessors(size), stateBytes, maxDepth)
+    distances = bytearray([unknownDistance]) * stateCount(size)
+    for depth in range(len(sizes)):
+        for state in readLayer(directory, depth, stateBytes):
+            distances[rankState(state, board)] = depth
+    return distances
+
+
+if __name__ == '__main__':
+    # search every board of a puzzle on disk: python external_bfs.py directory [size]
+    directory = sys.argv[1]
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    start = time.time()
+    sizes = externalBFS(directory, [getBoardInfo(size).solvedState], puzzleSuccessors(size), puzzleStateBytes(size))
+    for depth, count in enumerate(sizes):
+        print('%3d %d' % (depth, count))
+    print('%d states in %.1f seconds' % (sum(sizes), time.time() - start))
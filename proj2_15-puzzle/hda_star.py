@@ -0,0 +1,336 @@
+#!/usr/bin/python3
+
+# AI 531 - Project 2 - 15 Puzzle
+# Hash-distributed parallel A* (HDA*)
+
+import os
+import pickle
+import queue
+
+from multiprocessing import Process, Queue, get_start_method
+from node_arena import hashMultiplier, hashMask, moveCodes, moveIndex
+from open_list import BucketQueue
+import puzzle as puzzleModule
+from puzzle import PackedPuzzle, movePacked, newSolutionNode, finishSearch
+from search_stats import SearchStats, SearchStatus
+from sys import maxsize
+
+"""
+HDA* splits one A* search over worker processes. Every state is owned by one worker, chosen by hashing
+the state, and only its owner keeps it in an open list and a table of the cheapest path found to it.
+A worker expands its best nodes, computes the children's f values, and sends each child to its owner
+in batches. Expansion order is only best first within each worker, so states can be reached more
+cheaply after they were expanded: they are then reopened.
+
+When a worker reaches the goal it reports the cost to the coordinator (the calling process), which
+sends it to every worker as the incumbent. Nodes with f at or above the incumbent are dropped. The search
+is over when no worker has nodes left below the incumbent and no batch is still on its way: the coordinator
+asks every worker whether it is idle and how many batches it has sent and received, and stops when two
+rounds in a row find every worker idle, equal sent and received totals and the same counts. The incumbent
+is then optimal (for an admissible heuristic), and the path is rebuilt by asking each state's owner for
+its parent.
+
+Workers get the heuristic as a Process argument. With the fork start method (the default on Linux) they
+inherit it and every table loaded in the calling process, so any heuristic works. With spawn or forkserver
+(macOS, Windows) the heuristic is pickled, which only works for top-level functions (not the ones
+symmetricHeuristic returns), and each worker loads its tables again from their default directories.
+"""
+
+batchSize = 128  # children buffered per destination worker before they are sent
+expansionsPerCycle = 64  # nodes a worker expands between checks of its inbox
+
+
+def ownerOf(state, workers):
+    """
+    Return the worker that owns a state
+    :param state: packed state
+    :param workers: number of workers
+    :return:
+    """
+    return (((hash(state) * hashMultiplier) & hashMask) >> 32) % workers
+
+
+def hdaWorker(workerId, workers, tiles, whichHeuristic, nodeLimit, inboxes, results):
+    """
+    Search loop of one worker process, runs until the coordinator sends stop
+    Messages in: ('nodes', batch), ('incumbent', cost), ('probe', round), ('parent', state), ('stop',)
+    Messages out: ('goal', id, cost, state), ('idle', id), ('limit', id), ('status', id, round, idle, sent, received),
+    ('parent', state, parent state, move code), ('stats', id, nodes queued, SearchStats)
+    :param workerId: index of this worker
+    :param workers: number of workers
+    :param tiles: starting board
+    :param whichHeuristic:
+    :param nodeLimit: nodes this worker may queue before the search gives up
+    :param inboxes: one message queue per worker
+    :param results: message queue of the coordinator
+    :return:
+    """
+    stats = SearchStats()
+    view = PackedPuzzle(tiles)  # node the heuristics are evaluated on, moved to each child in turn
+    view.parent = PackedPuzzle(tiles)  # the node being expanded, whose keys a heuristic's delta reads
+    board = view.board
+    bits = board.cellBits
+    mask = board.cellMask
+    delta = getattr(whichHeuristic, 'delta', None)
+    inbox = inboxes[workerId]
+    openList = BucketQueue()  # states owned by this worker waiting to be expanded
+    best = {}  # state -> [g, parent state, move code, blank] of the cheapest path found (parent None for the start)
+    outboxes = [[] for i in range(workers)]  # children waiting to be sent to each worker
+    sent = 0  # batches sent to other workers
+    received = 0  # batches received from other workers
+    count = 0  # nodes queued
+    incumbent = maxsize  # cost of the best solution known
+    idle = False
+    limitReached = False
+
+    def accept(f, g, state, blank, parent, move):
+        """
+        Queue a node owned by this worker unless its state was already reached as cheaply
+        """
+        nonlocal count, incumbent
+        entry = best.get(state)
+        if entry is not None and entry[0] <= g:
+            stats.duplicates += 1
+            return
+        best[state] = [g, parent, move, blank]
+        if state == board.solvedState:
+            if g < incumbent:
+                incumbent = g
+                results.put(('goal', workerId, g, state))
+        elif f < incumbent:
+            openList.put(f, g, state)
+            count += 1
+
+    if ownerOf(view.state, workers) == workerId:
+        accept(stats.evaluate(whichHeuristic, view), 0, view.state, view.blank, None, 0)
+
+    while True:
+        # handle waiting messages, blocking for the first one when there is nothing to expand
+        block = idle
+        while True:
+            try:
+                message = inbox.get(block)
+            except queue.Empty:
+                break
+            block = False
+            kind = message[0]
+            if kind == 'nodes':
+                received += 1
+                for node in message[1]:
+                    accept(*node)
+                idle = False
+            elif kind == 'incumbent':
+                incumbent = min(incumbent, message[1])
+            elif kind == 'probe':
+                results.put(('status', workerId, message[1], idle, sent, received))
+            elif kind == 'parent':
+                entry = best[message[1]]
+                results.put(('parent', message[1], entry[1], entry[2]))
+            elif kind == 'stop':
+                results.put(('stats', workerId, count, stats))
+                return
+
+        # expand a few nodes
+        expanded = 0
+        while expanded < expansionsPerCycle and not openList.empty() and not limitReached:
+            (f, g, state) = openList.get()
+            entry = best[state]
+            if g > entry[0]:
+                stats.duplicates += 1
+                continue  # stale queue entry, this state was reached more cheaply
+            if f >= incumbent:
+                continue  # cannot lead to a better solution
+            if count >= nodeLimit:
+                limitReached = True
+                results.put(('limit', workerId))
+                break
+            stats.expand(g)
+            expanded += 1
+
+            blank = entry[3]
+            h = f - g
+            view.parent.state = state
+            view.parent.blank = blank
+            view.parent.heuristicKeys = None  # the delta builds them once for all the children
+            for move, target in board.packedMoves[blank]:
+                childState = movePacked(state, blank, target, bits)
+                if childState == entry[1]:
+                    continue  # undoes the last move
+                stats.generated += 1
+                view.state = childState
+                view.blank = target
+                view.cost = g + 1
+                view.move = move
+                if delta:
+                    childH = stats.evaluate(delta, h, move, (state >> (target * bits)) & mask, view)
+                else:
+                    childH = stats.evaluate(whichHeuristic, view)
+                if g + 1 + childH >= incumbent:
+                    continue
+
+                node = (g + 1 + childH, g + 1, childState, target, state, moveIndex[move])
+                owner = ownerOf(childState, workers)
+                if owner == workerId:
+                    accept(*node)
+                else:
+                    outboxes[owner].append(node)
+                    if len(outboxes[owner]) >= batchSize:
+                        inboxes[owner].put(('nodes', outboxes[owner]))
+                        outboxes[owner] = []
+                        sent += 1
+            stats.updatePeaks(len(openList), len(best))
+
+        for owner, batch in enumerate(outboxes):
+            if batch:
+                inboxes[owner].put(('nodes', batch))
+                outboxes[owner] = []
+                sent += 1
+
+        if (openList.empty() or limitReached) and not idle:
+            idle = True
+            results.put(('idle', workerId))
+
+
+def receive(results, processes):
+    """
+    Return the next message for the coordinator, raising an error if a worker died
+    Busy workers can go a long time without sending anything, so the wait only ends when a worker has exited
+    :param results: message queue of the coordinator
+    :param processes: worker processes that have to be running until they send their next message
+    :return:
+    """
+    while True:
+        try:
+            return results.get(timeout=1)
+        except queue.Empty:
+            if not all(process.is_alive() for process in processes):
+                raise RuntimeError('HDA* worker stopped responding')
+
+
+def hdaStar(tiles, whichHeuristic, workers=None, nodeLimit=None):
+    """
+    Hash-distributed parallel A* search
+    :param workers: number of worker processes (defaults to one per cpu)
+    :param nodeLimit: nodes to queue (over all workers) before giving up (defaults to maxNodesPerSearch)
+    :return: Solution node (or None if no solution found), fLimit, nodes checked, moves (stats in result.stats)
+    """
+    if get_start_method() != 'fork':
+        try:
+            pickle.dumps(whichHeuristic)
+        except (pickle.PicklingError, AttributeError, TypeError):
+            raise ValueError('hdaStar workers are started with %s, which needs a top-level heuristic function '
+                             '(%s can not be pickled)' % (get_start_method(), whichHeuristic.__name__)) from None
+    workers = workers or os.cpu_count()
+    nodeLimit = nodeLimit or puzzleModule.maxNodesPerSearch
+    inboxes = [Queue() for i in range(workers)]
+    results = Queue()
+    workerLimit = -(-nodeLimit // workers)  # states are spread evenly, so each worker gets an equal share
+    processes = [Process(target=hdaWorker, args=(workerId, workers, tiles, whichHeuristic, workerLimit, inboxes,
+                                                 results), daemon=True) for workerId in range(workers)]
+    for process in processes:
+        process.start()
+
+    def broadcast(message):
+        for inbox in inboxes:
+            inbox.put(message)
+
+    try:
+        incumbent = maxsize
+        goalState = None
+        status = None
+        idleWorkers = set()  # workers that said they were idle since the last failed probe
+        probing = False
+        probeRound = 0
+        replies = {}
+        lastSnapshot = None  # (idle, sent, received) of every worker in the previous probe round
+
+        while status is None:
+            message = receive(results, processes)
+            kind = message[0]
+            if kind == 'goal':
+                (kind, workerId, cost, state) = message
+                if cost < incumbent:
+                    incumbent = cost
+                    goalState = state
+                    broadcast(('incumbent', cost))
+            elif kind == 'limit':
+                status = SearchStatus.NODE_LIMIT
+            elif kind == 'idle':
+                idleWorkers.add(message[1])
+                if len(idleWorkers) == workers and not probing:
+                    probing = True
+                    probeRound += 1
+                    replies = {}
+                    broadcast(('probe', probeRound))
+            elif kind == 'status':
+                (kind, workerId, round, idle, sent, received) = message
+                if round != probeRound:
+                    continue
+                replies[workerId] = (idle, sent, received)
+                if not idle:
+                    idleWorkers.discard(workerId)
+                if len(replies) < workers:
+                    continue
+
+                snapshot = [replies[workerId] for workerId in range(workers)]
+                allIdle = all(idle for (idle, sent, received) in snapshot)
+                balanced = sum(sent for (idle, sent, received) in snapshot) == \
+                    sum(received for (idle, sent, received) in snapshot)
+                if allIdle and balanced and snapshot == lastSnapshot:
+                    status = SearchStatus.SOLVED if goalState is not None else SearchStatus.NO_SOLUTION
+                elif allIdle:  # probe again, a batch may have been on its way
+                    lastSnapshot = snapshot
+                    probeRound += 1
+                    replies = {}
+                    broadcast(('probe', probeRound))
+                else:
+                    lastSnapshot = None
+                    probing = False
+                    if len(idleWorkers) == workers:  # the busy workers went idle before the round ended
+                        probing = True
+                        probeRound += 1
+                        replies = {}
+                        broadcast(('probe', probeRound))
+
+        # rebuild the solution by asking each state's owner for its parent
+        node = None
+        if status == SearchStatus.SOLVED:
+            moves = []
+            state = goalState
+            while True:
+                inboxes[ownerOf(state, workers)].put(('parent', state))
+                message = receive(results, processes)
+                while message[0] != 'parent':
+                    message = receive(results, processes)
+                (kind, state, parent, move) = message
+                if parent is None:
+                    break
+                moves.append(moveCodes[move])
+                state = parent
+            moves.reverse()
+            node = newSolutionNode(tiles, moves)
+
+        broadcast(('stop',))
+        stats = SearchStats()
+        count = 0
+        finished = set()
+        while len(finished) < workers:
+            # a worker exits once it sent its stats, only the others have to be running
+            message = receive(results, [process for workerId, process in enumerate(processes)
+                                        if workerId not in finished])
+            if message[0] == 'stats':
+                count += message[2]
+                stats.merge(message[3])
+                finished.add(message[1])
+        for process in processes:
+            process.join()
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    if status == SearchStatus.NODE_LIMIT:
+        print('Max nodes exceeded, terminating search. Nodes checked: %d' % count)
+    elif status == SearchStatus.NO_SOLUTION:
+        print("No solution found")
+    return finishSearch(node, None, count, node.cost if node else 0, stats, status)
@@ -0,0 +1,169 @@
+#!/usr/bin/python3
+
+# AI 531 - Project 2 - 15 Puzzle
+# Iterative deepening A*
+
+from move_pruning import getMoveAutomaton
+import puzzle as puzzleModule
+from puzzle import PackedPuzzle, movePacked, newSolutionNode, finishSearch
+from search_stats import SearchStats, SearchStatus
+from symmetry import dualMarker, dualState, undoDualSwitches
+from transposition_table import TranspositionTable
+from sys import maxsize
+
+"""
+IDA* runs depth first searches with an increasing bound on f = g + h. Each iteration's bound is the
+smallest f value that went over the previous bound. All searching is done on one PackedPuzzle:
+moves are applied to it before going deeper and undone on the way back, so no node is created
+per state and memory only grows with the depth of the search (the list of moves made).
+Moves that complete a redundant move sequence (move_pruning) are skipped, which also keeps the search from
+undoing the last move.
+With a transposition table, the smallest f over the bound found below a state is remembered (as a bound on
+the moves left), so a state met again, in the same or a later iteration, is cut off without searching it.
+With dual search, a state with the empty square home whose dual board (symmetry) has a higher heuristic value
+is searched from the dual board instead; dualMarker is put in the path and undoDualSwitches rebuilds the moves.
+"""
+
+foundSolution = -1  # returned by searchBound when the goal is reached
+nodeLimitReached = -2  # returned by searchBound when maxNodesPerSearch is hit
+
+nodesChecked = 0  # nodes expanded by the current idaStar call
+
+
+def idaStar(tiles, whichHeuristic, tableBytes=None, dualSearch=False):
+    """
+    IDA* search
+    :param tableBytes: memory budget of a TranspositionTable (no table when None)
+    :param dualSearch: switch to the dual board when it has the higher heuristic value (usual goal only)
+    :return: Solution node (or None if no solution found), fLimit, nodes checked, moves (stats in result.stats)
+    """
+    global nodesChecked
+    nodesChecked = 0
+    stats = SearchStats()
+
+    board = PackedPuzzle(tiles)  # the only board, moves are made and unmade on it
+    path = []  # moves from the start to the board's current state
+    h = stats.evaluate(whichHeuristic, board)
+    bound = h
+    automaton = getMoveAutomaton()
+    table = TranspositionTable(automaton, tableBytes) if tableBytes else None
+
+    while True:
+        result = searchBound(board, path, 0, bound, h, 0, automaton, table, whichHeuristic, stats, dualSearch)
+        if result == foundSolution:
+            node = newSolutionNode(tiles, undoDualSwitches(path))
+            return finishSearch(node, bound, nodesChecked, node.cost, stats, SearchStatus.SOLVED)
+        if result == nodeLimitReached:
+            print('Max nodes exceeded, terminating search. Nodes checked: %d' % nodesChecked)
+            return finishSearch(None, bound, nodesChecked, 0, stats, SearchStatus.NODE_LIMIT)
+        if result == maxsize:
+            print("No solution found")
+            return finishSearch(None, maxsize, nodesChecked, 0, stats, SearchStatus.NO_SOLUTION)
+        bound = result
+
+
+def searchBound(board, path, cost, bound, h, moveState, automaton, table, whichHeuristic, stats, dualSearch=False):
+    """
+    Depth first search below the board's current state, cutting off nodes with f above bound
+    :param board: mutable puzzle (restored before returning unless the goal was found)
+    :param path: moves made so far (the solution when foundSolution is returned)
+    :param cost: moves made to reach the current state
+    :param bound: f limit for this iteration
+    :param h: heuristic value of the current state
+    :param moveState: automaton state of the moves that led here
+    :param automaton: MoveAutomaton of the redundant move sequences to skip
+    :param table: TranspositionTable (or None)
+    :param whichHeuristic:
+    :param stats: SearchStats of the solve
+    :param dualSearch: switch to the dual board when it has the higher heuristic value
+    :return: foundSolution, nodeLimitReached or the smallest f value over the bound
+    """
+    global nodesChecked
+
+    f = cost + h
+    if f > bound:
+        return f
+    info = board.board  # move and packing tables for the board size
+    if board.state == info.solvedState:
+        return foundSolution
+
+    keys = board.heuristicKeys  # put back with the state, a heuristic's delta reads them as the parent's
+    if dualSearch and board.blank == info.solvedBlank:
+        state = board.state
+        board.state = dualState(state, info)  # as many moves from the goal, the empty square stays home
+        dualH = stats.evaluate(whichHeuristic, board)
+        if dualH > h:
+            stats.dualSwitches += 1
+            path.append(dualMarker)
+            # the dual's moves are not a continuation of the path, so move pruning starts again
+            result = searchBound(board, path, cost, bound, dualH, 0, automaton, table, whichHeuristic, stats,
+                                 dualSearch)
+            if result == foundSolution:
+                return result
+            path.pop()
+            board.state = state
+            board.heuristicKeys = keys
+            return result
+        board.state = state
+        board.heuristicKeys = keys
+
+    nodesChecked += 1
+    if nodesChecked >= puzzleModule.maxNodesPerSearch:
+        return nodeLimitReached
+    stats.expand(cost)
+    stats.updatePeaks(cost + 1)  # boards on the path (only one is stored, the rest are moves in path)
+
+    delta = getattr(whichHeuristic, 'delta', None)
+    state = board.state
+    blank = board.blank
+    bits = info.cellBits
+    mask = info.cellMask
+    nextStates = automaton.next[moveState]
+    minimum = maxsize
+
+    for move, target in info.packedMoves[blank]:
+        nextState = nextStates.get(move)
+        if nextState is None:  # completes a redundant move sequence
+            continue
+
+        # make the move
+        tile = (state >> (target * bits)) & mask
+        board.state = movePacked(state, blank, target, bits)
+        board.blank = target
+        entry = table.get(board.state, nextState) if table is not None else None
+        if entry:
+            stats.tableHits += 1
+            childH = entry[0]
+            board.heuristicKeys = None  # the heuristic did not see this board
+        else:
+            if table is not None:
+                stats.tableMisses += 1
+            if delta:
+                childH = stats.evaluate(delta, h, move, tile, board)
+            else:
+                childH = stats.evaluate(whichHeuristic, board)
+        stats.generated += 1
+        path.append(move)
+
+        if entry and cost + 1 + entry[1] > bound:
+            result = min(cost + 1 + entry[1], maxsize)  # searched before, nothing below is within the bound
+        else:
+            result = searchBound(board, path, cost + 1, bound, childH, nextState, automaton, table, whichHeuristic,
+                                 stats, dualSearch)
+            if result == foundSolution:
+                return result
+            if table is not None and result != nodeLimitReached:
+                table.store(board.state, nextState, childH, result - cost - 1)
+
+        # unmake the move
+        path.pop()
+        board.state = state
+        board.blank = blank
+        board.heuristicKeys = keys
+
+        if result == nodeLimitReached:
+            return result
+        if result < minimum:
+            minimum = result
+
+    return minimum
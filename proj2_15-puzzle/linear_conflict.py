@@ -1,13 +1,11 @@
-import copy
-import time
-import utility
-
 from typing import List
-from puzzle import Puzzle, emptySquare, puzzleSize, heuristicCityBlock
+from weakref import WeakKeyDictionary
+from puzzle import Puzzle, PackedPuzzle, emptySquare, heuristicCityBlock, moveL, moveR, packTiles
 
 def count_conflicts_line(config: List[int], sol: List[int]):
-    counts = [0 for x in range(puzzleSize)]
-    for i in range(puzzleSize):
+    lineSize = len(config)
+    counts = [0 for x in range(lineSize)]
+    for i in range(lineSize):
         val_i = config[i]
         if val_i == emptySquare:
             continue
@@ -15,7 +13,7 @@ def count_conflicts_line(config: List[int], sol: List[int]):
             continue
         solved_i_pos = sol.index(val_i)
 
-        for j in range(i + 1, puzzleSize):
+        for j in range(i + 1, lineSize):
             val_j = config[j]
             if val_j == emptySquare:
                 continue
@@ -35,27 +33,196 @@ def count_conflicts_line(config: List[int], sol: List[int]):
         config[argmax_id] = -1
         return 1 + count_conflicts_line(config, sol)
 
+maxTableKeyBits = 16  # lines whose packed key fits in this many bits get a flat table indexed by the key
+
+
+def rowKey(state, row, board):
+    """
+    Return the packed tiles of one row (cellBits per cell, first column in the lowest bits)
+    :param state: packed puzzle state
+    :param row:
+    :param board: BoardInfo of the puzzle
+    :return:
+    """
+    return (state >> (row * board.lineBits)) & board.lineMask
+
+
+def columnKey(state, col, board):
+    """
+    Return the packed tiles of one column (cellBits per cell, first row in the lowest bits)
+    :param state: packed puzzle state
+    :param col:
+    :param board: BoardInfo of the puzzle
+    :return:
+    """
+    state >>= col * board.cellBits
+    key = 0
+    for row, shift in enumerate(board.columnShifts):
+        key |= (state >> shift) & (board.cellMask << (row * board.cellBits))
+    return key
+
+
+class PatternLineTable:
+    """
+    Conflict counts for one line of a board whose packed line keys are too wide for a flat table
+    (5x5 and up). Indexing maps the key to its pattern number one cell at a time.
+    """
+
+    def __init__(self, digits, patternCounts, board):
+        self.digits = digits
+        self.patternCounts = patternCounts
+        self.board = board
+
+    def __getitem__(self, key):
+        board = self.board
+        pattern = 0
+        weight = 1
+        for i in range(board.size):
+            pattern += self.digits[key & board.cellMask] * weight
+            key >>= board.cellBits
+            weight *= board.size + 1
+        return self.patternCounts[pattern]
+
+
+def buildPatternCounts(size):
+    """
+    Conflict count of every pattern of goal positions in a line of the given length
+    Digit i of a pattern (base size + 1) is 1 + goal position of the tile at position i, or 0 if the
+    tile does not belong to the line. Patterns that repeat a goal position cannot occur and are left at 0.
+    :param size: cells in a line
+    :return: list indexed by pattern number
+    """
+    base = size + 1
+    patternCounts = []
+    for pattern in range(base ** size):
+        config = []
+        for i in range(size):
+            config.append(pattern % base)
+            pattern //= base
+        inLine = [digit for digit in config if digit]
+        if len(set(inLine)) < len(inLine):
+            patternCounts.append(0)
+        else:
+            patternCounts.append(count_conflicts_line(config, list(range(1, base))))
+    return patternCounts
+
+
+def buildConflictTables(sols, board, patternCounts):
+    """
+    Precompute the conflict count of every possible packed line for each row (or column)
+    A line's count only depends on which of its tiles belong to it and their goal order, so
+    count_conflicts_line is run once per pattern of goal positions and every packed key is
+    mapped to its pattern.
+    :param sols: goal line for each row (BoardInfo.rowSols) or column (BoardInfo.colSols)
+    :param board: BoardInfo of the puzzle
+    :param patternCounts: buildPatternCounts(board.size)
+    :return: list of tables, table[line][key] = number of conflicts
+    """
+    size = board.size
+    base = size + 1
+    tables = []
+    for sol in sols:
+        digits = [0] * (1 << board.cellBits)  # pattern digit of each tile value for this line
+        for pos, val in enumerate(sol):
+            if val != emptySquare:
+                digits[val] = pos + 1
+
+        if board.lineBits > maxTableKeyBits:
+            tables.append(PatternLineTable(digits, patternCounts, board))
+            continue
+
+        keyPatterns = [0]  # pattern number for every key of the cells added so far
+        for i in range(size):
+            weight = base ** i
+            keyPatterns = [pattern + digits[val] * weight for val in range(1 << board.cellBits)
+                           for pattern in keyPatterns]
+        tables.append(bytes(patternCounts[pattern] for pattern in keyPatterns))
+    return tables
+
+
+conflictTables = WeakKeyDictionary()  # BoardInfo (one per board size and goal) -> (row tables, column tables)
+
+
+def getConflictTables(board):
+    """
+    Return the row and column conflict tables for a board size and goal, building them on first use
+    :param board: BoardInfo of the puzzle
+    :return: (row tables, column tables)
+    """
+    tables = conflictTables.get(board)
+    if tables is None:
+        patternCounts = buildPatternCounts(board.size)
+        tables = conflictTables[board] = (buildConflictTables(board.rowSols, board, patternCounts),
+                                               buildConflictTables(board.colSols, board, patternCounts))
+    return tables
+
+
 def linear_conflict_heuristic(puzzle: Puzzle):
-    res = 0
-    config = copy.deepcopy(puzzle.tiles)  # type: List[List[int]]
-    row_configs = [config[i] for i in range(puzzleSize)]
-    col_configs = list(map(list, zip(*config)))
+    board = puzzle.board
+    if isinstance(puzzle, PackedPuzzle):
+        state = puzzle.state
+    else:
+        state, blank = packTiles(puzzle.tiles, board)
 
-    for i in range(puzzleSize):
-        res += count_conflicts_line(row_configs[i], utility.row_sols[i]) * 2
-    for i in range(puzzleSize):
-        res += count_conflicts_line(col_configs[i], utility.col_sols[i]) * 2
+    rowConflicts, colConflicts = getConflictTables(board)
+    res = 0
+    for i in range(board.size):
+        res += rowConflicts[i][rowKey(state, i, board)] + colConflicts[i][columnKey(state, i, board)]
 
-    return res
+    return res * 2
 
 def heuristicMy(puzzle: Puzzle):
-    start = time.time()
     city_block = heuristicCityBlock(puzzle)
     linear_conflict = linear_conflict_heuristic(puzzle)
-    utility.heuristicTime += time.time() - start
     return city_block + linear_conflict
 
 
+def heuristicMyDelta(parentH, move, movedTile, child: Puzzle):
+    """
+    Incremental version of heuristicMy. The moved tile changes its city block term, and it only
+    leaves/enters lines across the move direction: a left/right move changes two columns,
+    an up/down move changes two rows. Only those two lines are looked up, before and after the move
+    (the parent's line keys are made from the child's by putting the tile back, so no parent node is needed).
+    :param parentH: heuristicMy value of the parent
+    :param move: direction the empty square moved
+    :param movedTile: numbered tile that moved
+    :param child: node after the move
+    :return: heuristicMy value of the child
+    """
+    board = child.board
+    size = board.size
+    row, col = child.getEmptyPosition()
+    oldCell = row * size + col
+    newCell = oldCell - board.moveOffsets[move]
+    res = parentH - board.cityBlockTable[movedTile][oldCell] + board.cityBlockTable[movedTile][newCell]
+
+    if isinstance(child, PackedPuzzle):
+        state = child.state
+    else:
+        state, blank = packTiles(child.tiles, board)
+
+    rowConflicts, colConflicts = getConflictTables(board)
+    if move in (moveL, moveR):  # tile moved between columns, row order is unchanged
+        tables, lineKey, pos = colConflicts, columnKey, row
+        oldLine, newLine = oldCell % size, newCell % size
+    else:  # tile moved between rows, column order is unchanged
+        tables, lineKey, pos = rowConflicts, rowKey, col
+        oldLine, newLine = oldCell // size, newCell // size
+
+    # the old line has the empty square (0) where the tile was, the new line has the tile where the empty square was
+    oldKey = lineKey(state, oldLine, board)
+    newKey = lineKey(state, newLine, board)
+    tileBits = movedTile << (pos * board.cellBits)
+    res += (tables[oldLine][oldKey] - tables[oldLine][oldKey | tileBits]) * 2
+    res += (tables[newLine][newKey] - tables[newLine][newKey ^ tileBits]) * 2
+
+    return res
+
+
+heuristicMy.delta = heuristicMyDelta
+heuristicMy.cheap = heuristicCityBlock  # lower bound used to queue children in lazy aStar
+
+
 if __name__ == '__main__':
     puzzle = Puzzle(tiles=[[4, 1, 2, 3], [5, 6, 7, 8], [9, 10, 11, 12], [13, 14, 15, emptySquare]])
     # print(heuristicMy(puzzle))
@@ -5,12 +5,41 @@
 # Joe Nguyen
 # Matthew Pacey
 
+import copy
 import csv
+import os
+import random
+import tempfile
 import time
 import unittest
+import utility
 
-from linear_conflict import heuristicMy
-from puzzle import Puzzle, emptySquare, collectData, csvFilename, rbfs, heuristicCityBlock, aStar
+from bidirectional import mmSearch
+from bounded_search import weightedAStar, focalSearch
+from experiments import runExperiments, TRIALS, numTrials
+import external_bfs
+from external_bfs import externalBFS, puzzleSuccessors, puzzleStateBytes, puzzleDistances, layerFilename
+from hda_star import hdaStar, receive
+from ida_star import idaStar
+from node_arena import arenaAStar, NodeArena
+from open_list import BucketQueue, HeapQueue
+from search_stats import SearchStats, SearchStatus
+from sma_star import smaStar
+from sys import maxsize
+from symmetry import symmetricHeuristic, reflectState, dualState, blankHome, undoDualSwitches, dualMarker
+from transposition_table import TranspositionTable
+from unittest import mock
+import puzzle as puzzleModule
+from multiprocessing import Process, Queue
+from move_pruning import getMoveAutomaton, inverseDepth, branchingFactor
+from linear_conflict import heuristicMy, linear_conflict_heuristic, count_conflicts_line
+from perimeter import loadPerimeter, perimeterFilename, buildPerimeter, getPerimeter, maxPerimeterDepth
+from permutation_rank import BitSet, rankPuzzle, unrankPuzzle, stateCount, breadthFirstDistances, unknownDistance
+from pattern_database import heuristicPDB, buildPartition, usePatternDatabases, rankPositions, tableSize, \
+    loadedDatabases, tileDatabases
+from walking_distance import heuristicWalkingDistance, loadWalkingDistance, walkingFilename
+from puzzle import Puzzle, emptySquare, collectData, rbfs, heuristicCityBlock, aStar, PackedPuzzle, \
+    packTiles, unpackState, solvedState, maxNodesPerSearch, getBoardInfo
 
 moveL = 'L'  # movement the empty tile can do: left, right, up, down
 moveR = 'R'  # if tile is on an edge, some movements will not be allowed
@@ -75,115 +104,35 @@ class TestPuzzle(unittest.TestCase):
     def test_data_collection(self):
         """
         Try all combinations of searches and collect performance data into a csv
+        Puzzles are solved in parallel, one process per cpu
         :return:
         """
         if not collectData:
             self.skipTest("Data collection skipped")
 
-        # save raw data to csv file
-        csvFH = open(csvFilename, 'w', newline='')
-        writer = csv.writer(csvFH)
-
-        # header of csv
-        writer.writerow(
-            ['m', 'puzzleNum', 'searchFunc', 'heuristic', 'moves', 'nodesChecked', 'runTime (seconds)', 'solutionFound',
-             'heuristic % runTime', 'heuristic time'])
-
-        # collect data into run data and write it later
-        runData = {}
-        for algo in ['astar', 'rbfs']:
-            runData[algo] = {}
-            for heuristic in ['cityBlock', 'myHeuristic']:
-                runData[algo][heuristic] = {}
-
-        numTrials = 10  # run this many tests at each m
-        TRIALS = [10, 20, 30, 40, 50]
-        # TRIALS = [10]
-        for m in TRIALS:  # run for increasing number of moves from solved puzzle
-
-            runData['astar']['cityBlock'][m] = []
-            runData['astar']['myHeuristic'][m] = []
-            runData['rbfs']['cityBlock'][m] = []
-            runData['rbfs']['myHeuristic'][m] = []
-
-            for n in range(numTrials):
-                base = Puzzle()
-                base.scramblePuzzle(m)  # ensure all 4 configurations use the same scrambled puzzle
-
-                baseTiles = base.tiles
-                print('Puzzle Number %d (m=%d)' % (n, m))
-                base.print()
-
-                # # astar with city block heuristic
-                heuristicTime = 0  # reset heuristic timer
-                (nodesChecked, moves, runTime, solutionFound) = self.runTest(baseTiles, aStar, heuristicCityBlock)
-                heuristicPct = heuristicTime / runTime * 100
-                runData['astar']['cityBlock'][m].append(
-                    [moves, nodesChecked, runTime, solutionFound, heuristicPct, heuristicTime])
-                print('aStar w/ cityBlock: moves=%3d, nodes=%5d, time=%1.6f, heuristicPct=%2.4f' % (
-                    moves, nodesChecked, runTime, heuristicPct))
-
-                # astar with my heuristic
-                heuristicTime = 0  # reset heuristic timer
-                (nodesChecked, moves, runTime, solutionFound) = self.runTest(baseTiles, aStar,
-                                                                             heuristicMy)
-                heuristicPct = heuristicTime / runTime * 100
-                runData['astar']['myHeuristic'][m].append(
-                    [moves, nodesChecked, runTime, solutionFound, heuristicPct, heuristicTime])
-                print('aStar w/ myHeuristic: moves=%3d, nodes=%5d, time=%1.6f, heuristicPct=%2.4f' % (
-                    moves, nodesChecked, runTime, heuristicPct))
-
-                # rbfs with city block heuristic
-                heuristicTime = 0  # reset heuristic timer
-                (nodesChecked, moves, runTime, solutionFound) = self.runTest(baseTiles, rbfs, heuristicCityBlock)
-                heuristicPct = heuristicTime / runTime * 100
-                runData['rbfs']['cityBlock'][m].append(
-                    [moves, nodesChecked, runTime, solutionFound, heuristicPct, heuristicTime])
-                print('rbfs  w/ cityBlock: moves=%3d, nodes=%5d, time=%f, heuristicPct=%2.4f' % (
-                    moves, nodesChecked, runTime, heuristicPct))
-
-                # rbfs with my heuristic
-                heuristicTime = 0  # reset heuristic timer
-                (nodesChecked, moves, runTime, solutionFound) = self.runTest(baseTiles, rbfs, heuristicMy)
-                heuristicPct = heuristicTime / runTime * 100
-                runData['rbfs']['myHeuristic'][m].append(
-                    [moves, nodesChecked, runTime, solutionFound, heuristicPct, heuristicTime])
-                print('rbfs  w/ myHeuristic: moves=%3d, nodes=%5d, time=%f, heuristicPct=%2.4f' % (
-                    moves, nodesChecked, runTime, heuristicPct))
-
-        # now that all data has been collected, write it grouped by algo/heuristic
-        for algo in runData:
-            for heuristic in runData[algo]:
-                print('Algo = %s, Heuristic = %s' % (algo, heuristic))
-
-                for mValue in runData[algo][heuristic]:
-                    moveSum = 0
-                    nodeSum = 0
-                    timeSum = 0
-                    solnCount = 0
-
-                    for puzzleNum, trial in enumerate(runData[algo][heuristic][mValue]):
-                        (moves, nodesChecked, runTime, solutionFound, heuristicPct, heuristicTime) = trial
-                        writer.writerow(
-                            [mValue, puzzleNum, algo, heuristic, moves, nodesChecked, runTime, solutionFound,
-                             heuristicPct, heuristicTime])
-                        nodeSum += nodesChecked
-                        timeSum += runTime
-                        if solutionFound:
-                            moveSum += moves
-                            solnCount += 1
-
-                    moveAvg = 0
-                    if solnCount:  # only average if a puzzle was solved, else 0
-                        moveAvg = int(moveSum / solnCount)  # average the moves on SOLVED puzzles only
-                    nodeAvg = int(nodeSum / numTrials)
-                    timeAvg = "%.4f" % (timeSum / numTrials)
-                    solnAvg = int(solnCount / numTrials * 100)
-
-                    # printout for tables in latex report
-                    print(f' & {mValue} & {timeAvg} & {nodeAvg} & {moveAvg} & {solnAvg} \\\\')
-
-        print('Data collection complete, results written to: %s' % csvFilename)
+        runExperiments(TRIALS, numTrials)
+
+    def test_experiments(self):
+        """
+        A small experiment grid should give the same results with one or two workers
+        :return:
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'data.csv')
+            serial = runExperiments([4, 6], 2, workers=1, seed=7, filename=filename)
+            parallel = runExperiments([4, 6], 2, workers=2, seed=7, filename=filename)
+
+            with open(filename, newline='') as csvFH:
+                rows = list(csv.reader(csvFH))
+
+        self.assertEqual(1 + 2 * 2 * 2 * 3, len(rows))  # header + m values * trials * algos * heuristics
+        for algo in serial:
+            for heuristic in serial[algo]:
+                for m in serial[algo][heuristic]:
+                    for trial, parallelTrial in zip(serial[algo][heuristic][m], parallel[algo][heuristic][m]):
+                        self.assertTrue(trial[3])
+                        self.assertGreater(trial[5], 0)  # heuristic time was measured
+                        self.assertEqual(trial[:2], parallelTrial[:2])  # same moves and nodes checked
 
     def test_rbfs(self):
         """
@@ -235,6 +184,29 @@ class TestPuzzle(unittest.TestCase):
         self.assertTrue(node.cost <= m, 'Solution took move moves than scramble')
         print('Nodes checked: %d' % nodesChecked)
 
+    def test_rbfs_status(self):
+        """
+        rbfs finds optimal solutions and reports running out of nodes as a status instead of raising
+        :return:
+        """
+        random.seed(10)
+        puzzle = Puzzle()
+        puzzle.scramblePuzzle(24)
+        result = rbfs(puzzle.tiles, heuristicMy)
+        (aStarNode, fLimit, count, moves) = aStar(puzzle.tiles, heuristicMy)
+        self.assertEqual(SearchStatus.SOLVED, result.status)
+        self.assertEqual(aStarNode.cost, result[0].cost)
+
+        limit = puzzleModule.maxNodesPerSearch
+        puzzleModule.maxNodesPerSearch = 5
+        try:
+            for searchFunc in [rbfs, aStar, idaStar, weightedAStar, arenaAStar, mmSearch]:
+                result = searchFunc(puzzle.tiles, heuristicCityBlock)
+                self.assertIsNone(result[0])
+                self.assertEqual(SearchStatus.NODE_LIMIT, result.status)
+        finally:
+            puzzleModule.maxNodesPerSearch = limit
+
     def test_astar(self):
         """
         Functional tests for Sstar search algo
@@ -267,6 +239,230 @@ class TestPuzzle(unittest.TestCase):
             print('Solved with cost %d' % node.cost)
         self.assertEqual(2, node.cost)
 
+    def test_astar_m_values(self):
+        """
+        Duplicate detection should keep a 30 move scramble well below the node limit
+        :return:
+        """
+        random.seed(30)
+        m = 30
+        puzzle = Puzzle()
+        puzzle.scramblePuzzle(m)
+        (node, fLimit, count, moves) = aStar(puzzle.tiles, heuristicCityBlock)
+        self.assertIsNotNone(node, "Failed to find solution")
+        self.assertTrue(node.cost <= m, 'Solution took move moves than scramble')
+        self.assertLess(count, maxNodesPerSearch / 10)
+
+    def test_hdaStar(self):
+        """
+        Parallel A* should find solutions as short as aStar's with any number of workers
+        :return:
+        """
+        (node, fLimit, count, moves) = hdaStar(Puzzle().tiles, heuristicMy, 2)
+        self.assertEqual(0, node.cost)
+
+        random.seed(16)
+        for i in range(3):
+            puzzle = Puzzle()
+            puzzle.scramblePuzzle(30)
+            (optimal, fLimit, count, moves) = aStar(puzzle.tiles, heuristicMy)
+            for workers in [1, 3]:
+                result = hdaStar(puzzle.tiles, heuristicMy, workers)
+                (node, fLimit, count, moves) = result
+                self.assertEqual(SearchStatus.SOLVED, result.status)
+                self.assertTrue(node.isPuzzleSolved())
+                self.assertEqual(optimal.cost, node.cost)
+                self.assertEqual(result.stats.expanded, sum(result.stats.depthExpansions))
+
+        result = hdaStar(puzzle.tiles, heuristicMy, 2, nodeLimit=20)
+        self.assertIsNone(result[0])
+        self.assertEqual(SearchStatus.NODE_LIMIT, result.status)
+
+        limit = puzzleModule.maxNodesPerSearch
+        puzzleModule.maxNodesPerSearch = 20
+        try:
+            result = hdaStar(puzzle.tiles, heuristicMy, 2)
+            self.assertIsNone(result[0])
+            self.assertEqual(SearchStatus.NODE_LIMIT, result.status)
+        finally:
+            puzzleModule.maxNodesPerSearch = limit
+
+        # the coordinator waits on busy workers for as long as they run, but not on one that exited
+        worker = Process(target=time.sleep, args=(0,))
+        worker.start()
+        worker.join()
+        self.assertRaises(RuntimeError, receive, Queue(), [worker])
+
+        # forked workers inherit any heuristic, spawned ones need one that can be pickled
+        heuristic = symmetricHeuristic(heuristicCityBlock, dual=False)
+        self.assertEqual(0, hdaStar(Puzzle().tiles, heuristic, 2)[0].cost)
+        with mock.patch('hda_star.get_start_method', return_value='spawn'):
+            self.assertRaises(ValueError, hdaStar, puzzle.tiles, heuristic, 2)
+
+    def test_nodeArena(self):
+        """
+        A* on the node arena should expand the same nodes as aStar, walk parent indices back to the start,
+        and use far less memory per node than Puzzle objects
+        :return:
+        """
+        random.seed(15)
+        for size, m in [(4, 30), (4, 30), (3, 20), (5, 20)]:
+            puzzle = Puzzle(size=size)
+            puzzle.scramblePuzzle(m)
+            expected = aStar(puzzle.tiles, heuristicMy)
+            result = arenaAStar(puzzle.tiles, heuristicMy)
+            (node, fLimit, count, moves) = result
+            self.assertTrue(node.isPuzzleSolved())
+            self.assertEqual(expected[0].cost, node.cost)
+            self.assertEqual(expected[2], count)
+            self.assertEqual(expected.stats.expanded, result.stats.expanded)
+            if size == 4:
+                self.assertLess(result.arena.memoryBytes() / len(result.arena), 100)  # Puzzle nodes take hundreds
+
+        # states are found again after the hash table grows, and only cheaper paths update a node
+        arena = NodeArena(puzzleModule.getBoardInfo(4), tableBits=2)
+        for state in range(1, 100):
+            self.assertEqual(state - 1, arena.reach(state, 0, -1, 0, 5))
+        for state in range(1, 100):
+            self.assertEqual(state - 1, arena.find(state))
+        self.assertEqual(-1, arena.find(100))
+        self.assertEqual(-1, arena.reach(7, 0, -1, 0, 5))
+        self.assertEqual(6, arena.reach(7, 0, 3, 1, 4))
+        self.assertEqual(3, arena.parents[6])
+
+    def test_lazyAStar(self):
+        """
+        Lazy aStar should find the same solution lengths while skipping full heuristic evaluations
+        :return:
+        """
+        random.seed(17)
+        for i in range(3):
+            puzzle = Puzzle()
+            puzzle.scramblePuzzle(30)
+            (node, fLimit, count, moves) = aStar(puzzle.tiles, heuristicMy)
+            result = aStar(puzzle.tiles, heuristicMy, lazy=True)
+            (lazyNode, fLimit, lazyCount, moves) = result
+            self.assertEqual(node.cost, lazyNode.cost)
+            self.assertGreater(result.stats.lazyAvoided, 0)
+            self.assertEqual(result.stats.lazyDeferred - result.stats.lazyEvaluated, result.stats.lazyAvoided)
+
+            # a heuristic without a cheap part runs the normal search
+            plain = aStar(puzzle.tiles, heuristicCityBlock)
+            lazy = aStar(puzzle.tiles, heuristicCityBlock, lazy=True)
+            self.assertEqual(plain[2], lazy[2])
+            self.assertEqual(0, lazy.stats.lazyDeferred)
+
+    def test_searchStats(self):
+        """
+        Each search returns its SearchStats along with the usual tuple
+        :return:
+        """
+        random.seed(9)
+        puzzle = Puzzle()
+        puzzle.scramblePuzzle(20)
+        for searchFunc in [aStar, rbfs, idaStar]:
+            result = searchFunc(puzzle.tiles, heuristicMy)
+            (node, fLimit, count, moves) = result
+            stats = result.stats
+            self.assertIsNotNone(node)
+            self.assertGreater(stats.expanded, 0)
+            self.assertGreaterEqual(stats.generated, stats.expanded)
+            self.assertEqual(stats.expanded, sum(stats.depthExpansions))
+            self.assertGreater(stats.heuristicNs, 0)
+            self.assertGreater(stats.peakOpen, 0)
+
+        (node, fLimit, count, moves) = result = aStar(puzzle.tiles, heuristicCityBlock)
+        self.assertEqual(result.stats.expanded, result.stats.peakClosed)  # aStar keeps every expanded state
+
+        # sampled timing: only every sampleRate-th call is timed, all calls are counted
+        stats = SearchStats(sampleRate=4)
+        for i in range(10):
+            stats.evaluate(heuristicCityBlock, puzzle)
+        self.assertEqual(10, stats.heuristicCalls)
+        self.assertEqual(3, stats.sampledCalls)
+
+    def test_openLists(self):
+        """
+        Open lists pop the lowest f, then the highest g, then the newest entry, and aStar gives
+        the same solution length with either one
+        :return:
+        """
+        for openList in [BucketQueue, HeapQueue]:
+            queue = openList()
+            for (f, g, name) in [(5, 1, 'a'), (3, 0, 'b'), (5, 3, 'c'), (3, 2, 'd'), (3, 2, 'e'), (7, 0, 'f')]:
+                queue.put(f, g, name)
+            self.assertEqual(6, len(queue))
+            order = [queue.get() for i in range(3)]
+            queue.put(4, 1, 'g')
+            while not queue.empty():
+                order.append(queue.get())
+            self.assertEqual([(3, 2, 'e'), (3, 2, 'd'), (3, 0, 'b'), (4, 1, 'g'), (5, 3, 'c'), (5, 1, 'a'),
+                              (7, 0, 'f')], order)
+
+        random.seed(8)
+        puzzle = Puzzle()
+        puzzle.scramblePuzzle(30)
+        (bucketNode, fLimit, count, moves) = aStar(puzzle.tiles, heuristicMy, BucketQueue)
+        (heapNode, fLimit, count, moves) = aStar(puzzle.tiles, heuristicMy, HeapQueue)
+        self.assertEqual(bucketNode.cost, heapNode.cost)
+
+    def test_boundedSearch(self):
+        """
+        Weighted A* and focal search solutions should stay within their bound of the optimal (aStar) cost,
+        and the reported lower bound should never be above the optimal cost
+        :return:
+        """
+        random.seed(12)
+        for i in range(4):
+            puzzle = Puzzle()
+            puzzle.scramblePuzzle(30)
+            (optimal, fLimit, count, moves) = aStar(puzzle.tiles, heuristicMy)
+
+            for (searchFunc, param, bound) in [(weightedAStar, 2, 2), (focalSearch, 0.25, 1.25),
+                                               (weightedAStar, 1, 1), (focalSearch, 0, 1)]:
+                result = searchFunc(puzzle.tiles, heuristicMy, param)
+                (node, fLimit, count, moves) = result
+                self.assertTrue(node.isPuzzleSolved())
+                self.assertLessEqual(node.cost, bound * optimal.cost)
+                self.assertLessEqual(result.stats.lowerBound, optimal.cost)
+                self.assertGreaterEqual(result.stats.suboptimality, node.cost / optimal.cost)
+                self.assertLessEqual(result.stats.suboptimality, bound)
+
+    def test_smaStar(self):
+        """
+        SMA* should find optimal solutions while never keeping more nodes than its memory limit,
+        and report no solution when the solution path does not fit
+        :return:
+        """
+        random.seed(13)
+        for i in range(3):
+            puzzle = Puzzle()
+            puzzle.scramblePuzzle(30)
+            (optimal, fLimit, count, moves) = aStar(puzzle.tiles, heuristicMy)
+            for memoryLimit in [None, 200]:
+                result = smaStar(puzzle.tiles, heuristicMy, memoryLimit)
+                (node, fLimit, count, moves) = result
+                self.assertTrue(node.isPuzzleSolved())
+                self.assertEqual(optimal.cost, node.cost)
+                if memoryLimit:
+                    self.assertLessEqual(result.stats.peakClosed, memoryLimit)
+
+        puzzle = Puzzle()
+        puzzle.scramblePuzzle(12)
+        (optimal, fLimit, count, moves) = aStar(puzzle.tiles, heuristicMy)
+        (node, fLimit, count, moves) = smaStar(puzzle.tiles, heuristicMy, optimal.cost + 1)
+        self.assertEqual(optimal.cost, node.cost)
+        result = smaStar(puzzle.tiles, heuristicMy, optimal.cost)
+        self.assertIsNone(result[0])
+        self.assertEqual(SearchStatus.NO_SOLUTION, result.status)
+
+        limit = puzzleModule.maxNodesPerSearch
+        puzzleModule.maxNodesPerSearch = optimal.cost  # the default memory limit follows the node limit
+        try:
+            self.assertEqual(SearchStatus.NO_SOLUTION, smaStar(puzzle.tiles, heuristicMy).status)
+        finally:
+            puzzleModule.maxNodesPerSearch = limit
+
     def test_rbfs_m_values(self):
         m = 8
         puzzle = Puzzle()
@@ -279,6 +475,106 @@ class TestPuzzle(unittest.TestCase):
         (node, fLimit, nodesChecked, moves) = rbfs(puzzle.tiles, heuristicMy)
         self.assertTrue(node.cost <= m, 'Solution took move moves than scramble')
 
+    def test_idaStar(self):
+        """
+        Functional tests for IDA* search algo, solutions should be as short as aStar's
+        :return:
+        """
+        # base case: already solved puzzle (0 moves)
+        puzzle = Puzzle()
+        (node, fLimit, count, moves) = idaStar(puzzle.tiles, heuristicCityBlock)
+        self.assertEqual(0, node.cost)
+
+        # simple case: puzzle off by 2 moves
+        puzzle = Puzzle()
+        puzzle.moveEmpty(moveL)
+        puzzle.moveEmpty(moveU)
+        (node, fLimit, count, moves) = idaStar(puzzle.tiles, heuristicCityBlock)
+        self.assertEqual(2, node.cost)
+        self.assertTrue(node.isPuzzleSolved())
+
+        random.seed(5)
+        for heuristic in [heuristicCityBlock, heuristicMy]:
+            puzzle = Puzzle()
+            puzzle.scramblePuzzle(25)
+            (node, fLimit, count, moves) = idaStar(puzzle.tiles, heuristic)
+            (aStarNode, fLimit, count, aStarMoves) = aStar(puzzle.tiles, heuristicCityBlock)
+            self.assertIsNotNone(node, "Failed to find solution")
+            self.assertTrue(node.isPuzzleSolved())
+            self.assertEqual(aStarNode.cost, node.cost)
+
+    def test_transpositionTable(self):
+        """
+        A transposition table keeps the deeper of two entries for a slot, and rbfs/idaStar still find
+        optimal solutions with one (large or tiny) while expanding fewer nodes
+        :return:
+        """
+        automaton = getMoveAutomaton()
+        table = TranspositionTable(automaton, entries=2)
+        self.assertEqual(2, len(table))
+        self.assertIsNone(table.get(5, 1))
+        table.store(5, 1, 3, 10)
+        self.assertEqual((3, 10), table.get(5, 1))
+        self.assertIsNone(table.get(5, 2))
+        table.store(5, 1, 3, 8)  # a lower bound for the same state does not replace the higher one
+        self.assertEqual((3, 10), table.get(5, 1))
+        table.store(7, 0, 2, maxsize)
+        self.assertEqual((2, maxsize), table.get(7, 0))
+
+        random.seed(20)
+        for i in range(2):
+            puzzle = Puzzle()
+            puzzle.scramblePuzzle(40)
+            (optimal, fLimit, count, moves) = aStar(puzzle.tiles, heuristicMy)
+            for searchFunc in [rbfs, idaStar]:
+                plain = searchFunc(puzzle.tiles, heuristicMy)
+                for tableBytes in [1 << 24, 4096]:
+                    result = searchFunc(puzzle.tiles, heuristicMy, tableBytes)
+                    self.assertEqual(optimal.cost, result[0].cost)
+                    self.assertGreater(result.stats.tableHits, 0)
+                    self.assertLessEqual(result.stats.expanded, plain.stats.expanded)
+                self.assertEqual(0, plain.stats.tableHitRate)
+
+    def test_movePruning(self):
+        """
+        The move automaton skips undoing the last move and longer redundant sequences, without losing
+        the shortest path to any state
+        :return:
+        """
+        inverse = getMoveAutomaton(inverseDepth)
+        automaton = getMoveAutomaton()
+        for sequence in ['UD', 'DU', 'LR', 'RL']:
+            self.assertFalse(inverse.accepts(sequence))
+            self.assertFalse(automaton.accepts(sequence))
+        self.assertTrue(inverse.accepts('DLURDL'))
+        self.assertFalse(automaton.accepts('DLURDL'))
+        self.assertAlmostEqual(2.13, branchingFactor(inverse, 4), places=2)
+        self.assertLess(branchingFactor(automaton, 4), branchingFactor(inverse, 4))
+
+        # children never undo the parent's move
+        packed = PackedPuzzle()
+        child = packed.generateChildren()[0]
+        self.assertNotIn(child.getKey(), [c.getKey() for c in child.generateChildren()])
+
+        # every state within depth moves is still reached at its shortest distance
+        depth = 6
+        for start in [Puzzle(), PackedPuzzle()]:
+            distances = {start.getKey(): 0}
+            level = [start]
+            for cost in range(1, depth + 1):
+                level = [child for node in level for child in node.generateChildren(getMoveAutomaton(0))
+                         if distances.setdefault(child.getKey(), cost) == cost]
+
+            pruned = {}
+            stack = [start]
+            while stack:
+                node = stack.pop()
+                key = node.getKey()
+                pruned[key] = min(pruned.get(key, depth), node.cost)
+                if node.cost < depth:
+                    stack.extend(node.generateChildren(automaton))
+            self.assertEqual(distances, pruned)
+
     def test_cityBlock(self):
         """
         Unit tests for city block heuristic
@@ -333,6 +629,438 @@ class TestPuzzle(unittest.TestCase):
         #            9         10        11       12        13        14   15
         self.assertEqual(expected, heuristicMy(puzzle))
 
+    def test_packTiles(self):
+        """
+        Packing a board and unpacking it should give back the same grid
+        :return:
+        """
+        puzzle = Puzzle()
+        state, blank = packTiles(puzzle.tiles)
+        self.assertEqual(solvedState, state)
+        self.assertEqual(15, blank)
+        self.assertEqual(puzzle.tiles, unpackState(state))
+
+        puzzle.scramblePuzzle(20)
+        state, blank = packTiles(puzzle.tiles)
+        self.assertEqual(puzzle.tiles, unpackState(state))
+        self.assertEqual(puzzle.getEmptyPosition(), divmod(blank, 4))
+
+    def test_packedPuzzle(self):
+        """
+        Packed puzzle moves and children should match the list based puzzle
+        :return:
+        """
+        puzzle = Puzzle()
+        packed = PackedPuzzle()
+        self.assertTrue(packed.isPuzzleSolved())
+
+        for move in [moveL, moveU, moveU, moveR, moveD, moveL]:
+            puzzle.moveEmpty(move)
+            packed.moveEmpty(move)
+            self.assertEqual(puzzle.tiles, packed.tiles)
+            self.assertEqual(puzzle.getEmptyPosition(), packed.getEmptyPosition())
+            self.assertEqual(puzzle.getEmptyMoves(), packed.getEmptyMoves())
+        self.assertFalse(packed.isPuzzleSolved())
+        self.assertEqual(puzzle.getKey(), packed.getKey())
+        self.assertEqual(puzzle.getPosition(7), packed.getPosition(7))
+
+        children = puzzle.generateChildren()
+        packedChildren = packed.generateChildren()
+        self.assertEqual([c.tiles for c in children], [c.tiles for c in packedChildren])
+        self.assertEqual([c.move for c in children], [c.move for c in packedChildren])
+        self.assertEqual([c.cost for c in children], [c.cost for c in packedChildren])
+
+    def test_nodeSlots(self):
+        """
+        Nodes have no per-instance __dict__ and share their goal tables with every node of the same size
+        :return:
+        """
+        for nodeClass in [Puzzle, PackedPuzzle]:
+            node = nodeClass()
+            self.assertFalse(hasattr(node, '__dict__'))
+            child = node.generateChildren()[0]
+            self.assertIs(node.target_pos, child.target_pos)
+            self.assertIs(node.target_pos, nodeClass(size=4).target_pos)
+            self.assertTrue(node.isPuzzleSolved())
+            self.assertFalse(child.isPuzzleSolved())
+
+        # packed nodes have no slot for a tile grid, their tiles are rebuilt from the packed state
+        self.assertNotIn('tiles', [slot for nodeClass in PackedPuzzle.__mro__
+                                   for slot in nodeClass.__dict__.get('__slots__', ())])
+        self.assertEqual(Puzzle().tiles, PackedPuzzle().tiles)
+
+        # the solved grid handed out is a copy, moving on it does not change the shared goal
+        puzzle = Puzzle()
+        puzzle.moveEmpty(moveL)
+        self.assertFalse(puzzle.isPuzzleSolved())
+        self.assertTrue(Puzzle().isPuzzleSolved())
+
+    def test_rankPositions(self):
+        """
+        Ranking the cells of a pattern should give a unique index in range for every placement
+        :return:
+        """
+        seen = set()
+        for a in range(16):
+            for b in range(16):
+                if a != b:
+                    seen.add(rankPositions([a, b]))
+        self.assertEqual(set(range(tableSize(2))), seen)
+
+    def test_permutationRank(self):
+        """
+        Ranks are unique, in [0, cells! / 2) and unrank back to the same board, and a BitSet/bytearray
+        breadth first search reaches every board of the 8 puzzle
+        :return:
+        """
+        self.assertEqual(181440, stateCount(3))
+        random.seed(21)
+        for size in [3, 4]:
+            ranks = set()
+            for i in range(200):
+                puzzle = Puzzle(size=size)
+                puzzle.scramblePuzzle(random.randint(0, 40))
+                rank = rankPuzzle(puzzle)
+                self.assertTrue(0 <= rank < stateCount(size))
+                self.assertEqual(puzzle.tiles, unrankPuzzle(rank, size).tiles)
+                ranks.add((rank, puzzle.getKey()))
+            self.assertEqual(len(ranks), len({rank for rank, key in ranks}))  # different boards, different ranks
+
+        closed = BitSet(100)
+        closed.add(3)
+        closed.add(99)
+        self.assertIn(3, closed)
+        self.assertNotIn(4, closed)
+        self.assertEqual(2, len(closed))
+
+        distances = breadthFirstDistances(3)
+        self.assertNotIn(unknownDistance, distances)
+        self.assertEqual(31, max(distances))  # hardest 8 puzzles take 31 moves
+        self.assertEqual(2, distances.count(31))
+        for i in range(3):
+            puzzle = Puzzle(size=3)
+            puzzle.scramblePuzzle(30)
+            (node, fLimit, count, moves) = aStar(puzzle.tiles, heuristicCityBlock)
+            self.assertEqual(node.cost, distances[rankPuzzle(puzzle)])
+
+    def test_externalBFS(self):
+        """
+        The disk-based search finds the same layers as an in-memory search, with many small runs per layer,
+        and picks up after the last complete layer when it is run again
+        :return:
+        """
+        distances = breadthFirstDistances(3)
+        board = getBoardInfo(3)
+        stateBytes = puzzleStateBytes(3)
+        runStates = external_bfs.runStates
+        external_bfs.runStates = 1000
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                sizes = externalBFS(directory, [board.solvedState], puzzleSuccessors(3), stateBytes, 10)
+                self.assertEqual(11, len(sizes))
+                with open(layerFilename(directory, 11) + '.run0', 'wb') as fh:  # interrupted while writing layer 11
+                    fh.write(b'partial')
+                with open(layerFilename(directory, 10) + '.run2', 'wb') as fh:  # layer 10 written, runs not deleted
+                    fh.write(b'stale')
+
+                self.assertEqual(sizes, externalBFS(directory, [], puzzleSuccessors(3), stateBytes, 10))
+                self.assertFalse(os.path.exists(layerFilename(directory, 10) + '.run2'))
+                self.assertEqual(distances, puzzleDistances(directory, 3))
+                self.assertFalse(os.path.exists(layerFilename(directory, 11) + '.run0'))
+        finally:
+            external_bfs.runStates = runStates
+
+    def test_bidirectional(self):
+        """
+        mmSearch finds solutions as short as aStar's, to the usual goal and to another goal, and the heuristics
+        measure the distance to the goal of the node's board
+        :return:
+        """
+        random.seed(24)
+        puzzle = Puzzle()
+        puzzle.scramblePuzzle(30)
+        goal = puzzle.tiles
+        self.assertEqual(0, heuristicCityBlock(Puzzle(goal, goal=goal)))
+        self.assertEqual(0, heuristicMy(PackedPuzzle(goal, goal=goal)))
+        self.assertEqual(heuristicCityBlock(Puzzle(goal)), heuristicCityBlock(Puzzle(Puzzle().tiles, goal=goal)))
+        for heuristic in [heuristicWalkingDistance, heuristicPDB, symmetricHeuristic(heuristicCityBlock, dual=False)]:
+            # tables and reflections only know the usual goal
+            self.assertRaises(ValueError, aStar, Puzzle().tiles, heuristic, goal=goal)
+
+        for m in [0, 10, 25, 40]:
+            for target in [None, goal]:
+                puzzle = Puzzle(goal=target)
+                puzzle.scramblePuzzle(m)
+                for heuristic in [heuristicCityBlock, heuristicMy]:
+                    (node, fLimit, count, moves) = aStar(puzzle.tiles, heuristic, goal=target)
+                    result = mmSearch(puzzle.tiles, heuristic, target)
+                    self.assertEqual(SearchStatus.SOLVED, result.status)
+                    self.assertEqual(moves, result[3])
+                    self.assertEqual(target or Puzzle().tiles, node.tiles)
+                    self.assertEqual(target or Puzzle().tiles, result[0].tiles)
+
+    def test_perimeter(self):
+        """
+        Boards inside the perimeter are solved without searching, boards outside it get the same solution
+        length from aStar and rbfs with and without the perimeter, and the table is written to disk
+        :return:
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            perimeter = loadPerimeter(4, 10, directory)
+            self.assertTrue(os.path.exists(perimeterFilename(4, 10, directory)))
+            self.assertEqual(0, perimeter.distance(getBoardInfo(4).solvedState))
+
+            random.seed(23)
+            for m in [8, 20, 30]:
+                puzzle = Puzzle()
+                puzzle.scramblePuzzle(m)
+                for search in [aStar, rbfs]:
+                    (node, fLimit, count, moves) = search(puzzle.tiles, heuristicCityBlock)
+                    (perimeterNode, fLimit, perimeterCount, perimeterMoves) = search(puzzle.tiles, heuristicCityBlock,
+                                                                                    perimeter=perimeter)
+                    self.assertTrue(perimeterNode.isPuzzleSolved())
+                    self.assertEqual(moves, perimeterMoves)
+                    if moves <= 10:
+                        self.assertEqual(0, perimeterCount)
+
+        # distances are stored in 6 bits of a byte
+        self.assertRaises(ValueError, buildPerimeter, 3, maxPerimeterDepth + 1)
+        self.assertRaises(ValueError, getPerimeter, 4, maxPerimeterDepth + 1)
+
+    def test_patternDatabase(self):
+        """
+        Small pattern databases: solved puzzle is 0, a single tile pattern is its city block distance,
+        and the sum never over-estimates the optimal solution found by aStar
+        :return:
+        """
+        self.keepDatabases()
+        partition = [[1, 2, 3], [4], [5, 9, 13]]
+        with tempfile.TemporaryDirectory() as directory:
+            buildPartition(partition, directory)
+            usePatternDatabases(partition, directory)
+
+            puzzle = Puzzle()
+            self.assertEqual(0, heuristicPDB(puzzle))
+
+            random.seed(15)
+            for m in [5, 10, 15]:
+                puzzle = Puzzle()
+                puzzle.scramblePuzzle(m)
+                (node, fLimit, count, moves) = aStar(puzzle.tiles, heuristicCityBlock)
+                self.assertLessEqual(heuristicPDB(puzzle), node.cost)
+
+            random.seed(16)
+            self.checkDelta(heuristicPDB, PackedPuzzle(), 40)
+
+            usePatternDatabases([[4]], directory)
+            row, col = puzzle.getPosition(4)
+            self.assertEqual(abs(row - 0) + abs(col - 3), heuristicPDB(puzzle))
+
+            # the delta loads the default tables itself when it is the first lookup
+            with mock.patch('pattern_database.patternPartition', partition), \
+                    mock.patch('pattern_database.pdbDirectory', directory):
+                for child in PackedPuzzle().generateChildren():
+                    loadedDatabases.clear()
+                    tileDatabases.clear()
+                    childH = heuristicPDB.delta(0, child.move, child.getMovedTile(), child)
+                    self.assertEqual(heuristicPDB(child), childH)
+
+    def keepDatabases(self):
+        """
+        Put back the pattern databases heuristicPDB had loaded when the test ends, so tables the test loads from
+        temporary directories are not used by later tests
+        :return:
+        """
+        loaded = dict(loadedDatabases)
+        tiles = dict(tileDatabases)
+
+        def restore():
+            loadedDatabases.clear()
+            loadedDatabases.update(loaded)
+            tileDatabases.clear()
+            tileDatabases.update(tiles)
+
+        self.addCleanup(restore)
+
+    def test_symmetry(self):
+        """
+        Reflecting twice (and taking the dual twice with the empty square home) gives the board back, a pattern
+        that mirrors an earlier one has no table and looks up the same values as its own table would, the max of
+        the regular, reflected and dual lookups stays admissible, and dual search finds optimal solutions
+        :return:
+        """
+        self.keepDatabases()
+        board = getBoardInfo(4)
+        partition = [[2, 3, 4], [5, 9, 13], [1, 6, 11], [7, 8, 12], [10, 14, 15]]
+        with tempfile.TemporaryDirectory() as directory, tempfile.TemporaryDirectory() as ownDirectory:
+            buildPartition(partition, directory)
+            self.assertEqual(3, len(os.listdir(directory)))  # [5, 9, 13] and [10, 14, 15] reuse mirrored tables
+            buildPartition([[5, 9, 13]], ownDirectory)
+
+            random.seed(25)
+            puzzles = []
+            for m in [10, 20, 30]:
+                puzzle = Puzzle()
+                puzzle.scramblePuzzle(m)
+                puzzles.append(PackedPuzzle(puzzle.tiles))
+            usePatternDatabases([[2, 3, 4]], directory)
+            upper = [heuristicPDB(puzzle) for puzzle in puzzles]
+            usePatternDatabases([[5, 9, 13]], ownDirectory)
+            lower = [heuristicPDB(puzzle) for puzzle in puzzles]
+            usePatternDatabases(partition[:2], directory)
+            self.assertEqual([a + b for a, b in zip(upper, lower)], [heuristicPDB(puzzle) for puzzle in puzzles])
+
+            usePatternDatabases(partition, directory)
+            random.seed(26)
+            self.checkDelta(heuristicPDB, PackedPuzzle(), 40)
+            heuristic = symmetricHeuristic(heuristicPDB)
+            # dual lookups are inconsistent, searches that close states refuse them
+            self.assertFalse(hasattr(heuristic, 'cheap'))
+            for search in [aStar, arenaAStar]:
+                self.assertRaises(ValueError, search, puzzles[0].tiles, heuristic)
+            self.assertEqual(heuristicPDB, symmetricHeuristic(heuristicPDB, dual=False).cheap)
+            for puzzle in puzzles:
+                self.assertEqual(puzzle.state, reflectState(reflectState(puzzle.state, board), board))
+                home, moves = blankHome(puzzle.state, puzzle.blank, board)
+                self.assertEqual(home, dualState(dualState(home, board), board))
+
+                (node, fLimit, count, moves) = aStar(puzzle.tiles, heuristicMy)
+                self.assertLessEqual(heuristicPDB(puzzle), heuristic(puzzle))
+                self.assertLessEqual(heuristic(puzzle), moves)
+                result = idaStar(puzzle.tiles, heuristicPDB, dualSearch=True)
+                self.assertEqual(moves, result[3])
+                self.assertTrue(result[0].isPuzzleSolved())
+            # moves after a switch solve the dual, so they come back reversed and undone
+            self.assertEqual(['U', 'L', 'L', 'R'], undoDualSwitches(['U', dualMarker, 'L', 'R', dualMarker, 'L']))
+
+    def checkDelta(self, heuristic, puzzle, steps):
+        """
+        Walk random moves from puzzle and check the heuristic delta matches a full evaluation at each step
+        :return:
+        """
+        parent = puzzle
+        parentH = heuristic(parent)
+        for i in range(steps):
+            child = random.choice(parent.generateChildren())
+            childH = heuristic.delta(parentH, child.move, child.getMovedTile(), child)
+            self.assertEqual(heuristic(child), childH)
+            parent, parentH = child, childH
+
+    def test_walkingDistance(self):
+        """
+        Walking distance is 0 when solved, never below city block or above the optimal solution,
+        its delta matches a full evaluation, and the table reads back the same from disk
+        :return:
+        """
+        self.assertEqual(0, heuristicWalkingDistance(Puzzle()))
+
+        random.seed(19)
+        for m in [10, 20, 30]:
+            puzzle = Puzzle()
+            puzzle.scramblePuzzle(m)
+            (node, fLimit, count, moves) = aStar(puzzle.tiles, heuristicWalkingDistance)
+            self.assertLessEqual(heuristicCityBlock(puzzle), heuristicWalkingDistance(puzzle))
+            self.assertLessEqual(heuristicWalkingDistance(puzzle), node.cost)
+            (optimal, fLimit, count, moves) = aStar(puzzle.tiles, heuristicCityBlock)
+            self.assertEqual(optimal.cost, node.cost)
+            # searches that evaluate children on one moving board carry the keys on that board
+            for result in [idaStar(puzzle.tiles, heuristicWalkingDistance),
+                           idaStar(puzzle.tiles, heuristicWalkingDistance, 1024 * 1024),
+                           arenaAStar(puzzle.tiles, heuristicWalkingDistance)]:
+                self.assertEqual(optimal.cost, result[0].cost)
+
+        # keys passed from parent to child by the delta alone stay right along a walk
+        parent = PackedPuzzle()
+        parentH = heuristicWalkingDistance(parent)
+        for i in range(60):
+            child = random.choice(parent.generateChildren())
+            childH = heuristicWalkingDistance.delta(parentH, child.move, child.getMovedTile(), child)
+            self.assertEqual(heuristicWalkingDistance(PackedPuzzle(state=child.state, blank=child.blank)), childH)
+            parent, parentH = child, childH
+
+        self.checkDelta(heuristicWalkingDistance, PackedPuzzle(), 60)
+        self.checkDelta(heuristicWalkingDistance, Puzzle(size=3), 40)
+
+        with tempfile.TemporaryDirectory() as directory:
+            table = loadWalkingDistance(3, directory)
+            self.assertTrue(os.path.exists(walkingFilename(3, directory)))
+            self.assertEqual(table.distances, loadWalkingDistance(3, directory).distances)
+
+    def test_heuristicDelta(self):
+        """
+        Incremental heuristic values should match the full heuristic for packed and list based nodes
+        :return:
+        """
+        random.seed(4)
+        for heuristic in [heuristicCityBlock, heuristicMy]:
+            self.checkDelta(heuristic, PackedPuzzle(), 60)
+            self.checkDelta(heuristic, Puzzle(), 60)
+
+    def test_linearConflictTables(self):
+        """
+        Table lookups should give the same linear conflict value as counting each line directly
+        :return:
+        """
+        random.seed(7)
+        for i in range(200):
+            tiles = list(range(1, 16)) + [emptySquare]
+            random.shuffle(tiles)
+            grid = [tiles[row * 4:row * 4 + 4] for row in range(4)]
+
+            config = copy.deepcopy(grid)
+            cols = list(map(list, zip(*config)))
+            expected = 0
+            for line in range(4):
+                expected += count_conflicts_line(config[line], utility.row_sols[line]) * 2
+                expected += count_conflicts_line(cols[line], utility.col_sols[line]) * 2
+
+            self.assertEqual(expected, linear_conflict_heuristic(Puzzle(grid)))
+            self.assertEqual(expected, linear_conflict_heuristic(PackedPuzzle(grid)))
+
+    def test_puzzleSizes(self):
+        """
+        8, 24 and 35 puzzles should solve in the same process as 15 puzzles, with per-size tables
+        :return:
+        """
+        random.seed(11)
+        for size in [3, 5, 4, 6]:
+            puzzle = Puzzle(size=size)
+            self.assertEqual(size, len(puzzle.tiles))
+            self.assertTrue(puzzle.isPuzzleSolved())
+            puzzle.scramblePuzzle(16)
+
+            # packing round trip (5x5 and up use 5 or 6 bits per cell)
+            state, blank = packTiles(puzzle.tiles)
+            self.assertEqual(puzzle.tiles, unpackState(state, size))
+            self.assertEqual(getBoardInfo(size).cellBits, (size * size - 1).bit_length())
+
+            for heuristic in [heuristicCityBlock, heuristicMy]:
+                self.checkDelta(heuristic, PackedPuzzle(puzzle.tiles), 40)
+                self.checkDelta(heuristic, Puzzle(puzzle.tiles), 40)
+
+                results = [search(puzzle.tiles, heuristic) for search in [aStar, idaStar]]
+                for (node, fLimit, count, moves) in results:
+                    self.assertTrue(node.isPuzzleSolved())
+                    self.assertEqual(size, node.size)
+                self.assertEqual(results[0][0].cost, results[1][0].cost)
+
+        # 5x5 linear conflict lookups match counting each line directly
+        board = getBoardInfo(5)
+        for i in range(50):
+            tiles = list(range(1, 25)) + [emptySquare]
+            random.shuffle(tiles)
+            grid = [tiles[row * 5:row * 5 + 5] for row in range(5)]
+
+            config = copy.deepcopy(grid)
+            cols = list(map(list, zip(*config)))
+            expected = 0
+            for line in range(5):
+                expected += count_conflicts_line(config[line], board.rowSols[line]) * 2
+                expected += count_conflicts_line(cols[line], board.colSols[line]) * 2
+
+            self.assertEqual(expected, linear_conflict_heuristic(Puzzle(grid)))
+            self.assertEqual(expected, linear_conflict_heuristic(PackedPuzzle(grid)))
+
     def test_getTargetPosition(self):
         puzzle = Puzzle()
         print(f'{puzzle.target_pos=}')
@@ -0,0 +1,173 @@
+#!/usr/bin/python3
+
+# AI 531 - Project 2 - 15 Puzzle
+# Move pruning with a move-sequence automaton
+
+from collections import deque
+
+"""
+Many move sequences lead to the same board as another sequence that is shorter, or as long but earlier in
+move order (U < L < R < D). Such a sequence is redundant: any path that contains it can be rewritten into
+an equal or shorter path without it, so a search never needs to generate it. The shortest ones are undoing
+the last move (UD, DU, LR, RL); longer ones circle the blank around a small block of cells, which gives
+the same board as circling it the other way (DLURDL is redundant, for example).
+
+The redundant sequences are found once by a breadth first search of move sequences on an unbounded board.
+A sequence is redundant when a sequence found earlier gives the same board, and the blank of the earlier
+sequence stays within the rows and columns the later one visits (so the earlier sequence can be used
+wherever the later one can, on any board size). The sequences are then compiled into an automaton
+(Aho-Corasick): a search keeps the automaton state of the moves that led to each node, and a move is
+skipped when the automaton has no transition for it.
+
+Only the tree searches idaStar and rbfs use the longer sequences. Searches with duplicate detection only
+skip undoing the last move, since combining longer sequences with a closed list can remove every optimal
+path to a state. smaStar also only skips undoing the last move (see sma_star).
+"""
+
+moveSteps = {'U': (-1, 0), 'L': (0, -1), 'R': (0, 1), 'D': (1, 0)}  # move of the empty square -> (row, col) step
+moveOrder = 'ULRD'  # order moves are tried in, an earlier sequence is preferred over a later one of the same length
+inverseDepth = 2  # sequence length that only finds undoing the last move
+pruningDepth = 8  # longest redundant sequence used by tree searches (each step costs about 3x the time to build)
+
+automata = {}  # depth -> MoveAutomaton built for that depth
+
+
+class MoveAutomaton:
+    """
+    Automaton that reads the moves made from the start and rejects a move that would complete a redundant sequence
+    next[state] maps each allowed move to the next state, the start state is 0
+    """
+
+    def __init__(self, sequences):
+        self.sequences = sorted(sequences, key=lambda sequence: (len(sequence), sequence))  # redundant sequences
+        goto = [{}]  # trie of the sequences
+        redundant = [False]  # the trie node ends a redundant sequence
+        for sequence in self.sequences:
+            state = 0
+            for move in sequence:
+                if move not in goto[state]:
+                    goto.append({})
+                    redundant.append(False)
+                    goto[state][move] = len(goto) - 1
+                state = goto[state][move]
+            redundant[state] = True
+
+        # breadth first over the trie: a node's fail link is the longest proper suffix that is also in the trie
+        fail = [0] * len(goto)
+        transitions = [{} for state in goto]
+        waiting = deque()
+        for move in moveOrder:
+            transitions[0][move] = goto[0].get(move, 0)
+            if move in goto[0]:
+                waiting.append(goto[0][move])
+        while waiting:
+            state = waiting.popleft()
+            redundant[state] = redundant[state] or redundant[fail[state]]
+            for move in moveOrder:
+                if move in goto[state]:
+                    child = goto[state][move]
+                    fail[child] = transitions[fail[state]][move]
+                    transitions[state][move] = child
+                    waiting.append(child)
+                else:
+                    transitions[state][move] = transitions[fail[state]][move]
+
+        self.next = [{move: child for move, child in moves.items() if not redundant[child]} for moves in transitions]
+
+    def __len__(self):
+        return len(self.next)
+
+    def accepts(self, moves):
+        """
+        Return True if a move sequence contains no redundant sequence
+        :param moves: moves of the empty square
+        :return:
+        """
+        state = 0
+        for move in moves:
+            state = self.next[state].get(move)
+            if state is None:
+                return False
+        return True
+
+
+def findRedundantSequences(depth):
+    """
+    Breadth first search of the move sequences up to depth moves on an unbounded board
+    A board is the blank's position and the tiles moved away from their cells (relative to the start)
+    :param depth: longest sequence to check
+    :return: set of redundant sequences (strings of moves)
+    """
+    redundant = set()
+    start = ((0, 0), ())
+    seen = {start: (0, 0, 0, 0)}  # board -> rows and columns visited by the first sequence reaching it
+    level = [('', (0, 0), {}, (0, 0, 0, 0))]  # (sequence, blank, tile origin of each moved cell, visited box)
+
+    for length in range(depth):
+        nextLevel = []
+        for (sequence, blank, moved, box) in level:
+            for move in moveOrder:
+                extended = sequence + move
+                if any(extended[i:] in redundant for i in range(len(extended) - 1)):
+                    continue  # ends with a sequence already known to be redundant
+
+                step = moveSteps[move]
+                target = (blank[0] + step[0], blank[1] + step[1])
+                childMoved = dict(moved)
+                origin = childMoved.pop(target, target)  # the tile at target slides into the blank
+                if origin != blank:
+                    childMoved[blank] = origin
+                key = (target, tuple(sorted(childMoved.items())))
+                childBox = (min(box[0], target[0]), max(box[1], target[0]),
+                            min(box[2], target[1]), max(box[3], target[1]))
+
+                earlierBox = seen.get(key)
+                if earlierBox is not None:
+                    if childBox[0] <= earlierBox[0] and earlierBox[1] <= childBox[1] and \
+                            childBox[2] <= earlierBox[2] and earlierBox[3] <= childBox[3]:
+                        redundant.add(extended)
+                    continue
+                seen[key] = childBox
+                nextLevel.append((extended, target, childMoved, childBox))
+        level = nextLevel
+
+    return redundant
+
+
+def getMoveAutomaton(depth=pruningDepth):
+    """
+    Return the automaton for redundant sequences up to depth moves, built on first use
+    :param depth: inverseDepth to only skip undoing the last move
+    :return: MoveAutomaton
+    """
+    automaton = automata.get(depth)
+    if automaton is None:
+        automaton = automata[depth] = MoveAutomaton(findRedundantSequences(depth))
+    return automaton
+
+
+def branchingFactor(automaton, size, iterations=100):
+    """
+    Asymptotic branching factor of the search tree on a size x size board with the automaton's pruning:
+    the growth rate of the number of move sequences of a given length, found by power iteration over
+    (blank cell, automaton state) pairs
+    :param automaton: MoveAutomaton
+    :param size: rows/cols of the board
+    :param iterations: sequence length to grow the counts to
+    :return:
+    """
+    counts = {(cell, 0): 1.0 for cell in range(size * size)}
+    growth = 0.0
+    for i in range(iterations):
+        nextCounts = {}
+        for (cell, state), count in counts.items():
+            row, col = divmod(cell, size)
+            for move, nextState in automaton.next[state].items():
+                step = moveSteps[move]
+                if 0 <= row + step[0] < size and 0 <= col + step[1] < size:
+                    key = (cell + step[0] * size + step[1], nextState)
+                    nextCounts[key] = nextCounts.get(key, 0.0) + count
+        total = sum(nextCounts.values())
+        growth = total / sum(counts.values())
+        counts = {key: count / total for key, count in nextCounts.items()}
+    return growth
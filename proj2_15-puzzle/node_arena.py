@@ -0,0 +1,234 @@
+#!/usr/bin/python3
+
+# AI 531 - Project 2 - 15 Puzzle
+# Array-backed node storage for A*
+
+import sys
+
+from array import array
+from open_list import BucketQueue
+import puzzle as puzzleModule
+from puzzle import PackedPuzzle, movePacked, newSolutionNode, finishSearch, \
+    moveL, moveR, moveU, moveD
+from search_stats import SearchStats, SearchStatus
+
+"""
+A Puzzle node is a Python object of a few hundred bytes that keeps its parent alive. The arena stores
+nodes column-wise instead, in parallel typed arrays (packed state, empty cell, parent index, move code,
+cost, closed flag), so a node is just an int index and costs tens of bytes. States are found again
+through an open addressing hash table of indices, also a typed array. arenaAStar runs A* on an arena
+with an open list of indices and only builds Puzzle nodes for the solution path.
+"""
+
+moveCodes = [moveU, moveL, moveR, moveD]  # move code stored in the arena -> move
+moveIndex = {move: code for code, move in enumerate(moveCodes)}  # move -> move code
+noParent = -1  # parent index of the root
+hashMultiplier = 0x9E3779B97F4A7C15  # 2^64 / golden ratio, spreads packed states over the table (Fibonacci hashing)
+hashMask = (1 << 64) - 1
+
+
+class NodeArena:
+    """
+    Search nodes of one board size stored in typed arrays, a node is its index in the arrays
+    """
+
+    def __init__(self, board, tableBits=10):
+        self.board = board
+        if board.numCells * board.cellBits <= 64:
+            self.states = array('Q')  # packed state of each node
+        else:
+            self.states = []  # states wider than 64 bits (5x5 and up) are kept as Python ints
+        self.blanks = array('B')  # cell of the empty square
+        self.parents = array('i')  # index of the parent node (noParent for the root)
+        self.moves = array('B')  # code of the move that led here (moveCodes)
+        self.costs = array('H')  # moves from the start (g)
+        self.closed = bytearray()  # 1 once the node has been expanded
+        self.tableBits = tableBits
+        self.table = array('i', [-1]) * (1 << tableBits)  # node index for each slot, -1 = empty
+
+    def __len__(self):
+        return len(self.costs)
+
+    def slot(self, state):
+        """
+        Return the first table slot to probe for a state
+        :param state: packed state
+        :return:
+        """
+        return ((hash(state) * hashMultiplier) & hashMask) >> (64 - self.tableBits)
+
+    def find(self, state):
+        """
+        Return the index of the node holding a state, or -1 if it has not been reached
+        :param state: packed state
+        :return:
+        """
+        table = self.table
+        mask = len(table) - 1
+        slot = self.slot(state)
+        while True:
+            index = table[slot]
+            if index < 0 or self.states[index] == state:
+                return index
+            slot = (slot + 1) & mask
+
+    def reach(self, state, blank, parent, move, cost):
+        """
+        Record that a state was reached. A new state is added, a state that is not expanded yet is updated if
+        this path is cheaper (the open list entry pushed for the older path is then stale)
+        :param state: packed state
+        :param blank: cell of the empty square
+        :param parent: index of the node it was reached from (noParent for the root)
+        :param move: code of the move from the parent
+        :param cost: moves from the start
+        :return: index of the node if this is the cheapest path so far, else -1
+        """
+        table = self.table
+        mask = len(table) - 1
+        slot = self.slot(state)
+        while True:
+            index = table[slot]
+            if index < 0:
+                break
+            if self.states[index] == state:
+                if self.closed[index] or self.costs[index] <= cost:
+                    return -1
+                self.parents[index] = parent
+                self.moves[index] = move
+                self.costs[index] = cost
+                return index
+            slot = (slot + 1) & mask
+
+        index = len(self.costs)
+        table[slot] = index
+        self.states.append(state)
+        self.blanks.append(blank)
+        self.parents.append(parent)
+        self.moves.append(move)
+        self.costs.append(cost)
+        self.closed.append(0)
+        if 2 * len(self.costs) > len(table):  # keep the table at most half full
+            self.grow()
+        return index
+
+    def grow(self):
+        """
+        Double the hash table and re-insert every node
+        :return:
+        """
+        self.tableBits += 1
+        table = self.table = array('i', [-1]) * (1 << self.tableBits)
+        mask = len(table) - 1
+        for index, state in enumerate(self.states):
+            slot = self.slot(state)
+            while table[slot] >= 0:
+                slot = (slot + 1) & mask
+            table[slot] = index
+
+    def getMoves(self, index):
+        """
+        Return the moves from the root to a node by walking the parent indices
+        :param index:
+        :return:
+        """
+        moves = []
+        while self.parents[index] != noParent:
+            moves.append(moveCodes[self.moves[index]])
+            index = self.parents[index]
+        moves.reverse()
+        return moves
+
+    def memoryBytes(self):
+        """
+        Return the bytes used by the node arrays and the hash table
+        :return:
+        """
+        size = 0
+        for column in [self.blanks, self.parents, self.moves, self.costs, self.table]:
+            size += len(column) * column.itemsize
+        size += len(self.closed)
+        if isinstance(self.states, array):
+            size += len(self.states) * self.states.itemsize
+        else:
+            size += sys.getsizeof(self.states) + sum(sys.getsizeof(state) for state in self.states)
+        return size
+
+
+def arenaAStar(tiles, whichHeuristic, nodeLimit=None):
+    """
+    A* search with nodes stored in a NodeArena, same expansions and solution length as aStar
+    :param nodeLimit: nodes to generate before giving up (defaults to maxNodesPerSearch)
+    :return: Solution node (or None if no solution found), fLimit, nodes checked, moves (stats and arena in result)
+    """
+    if not getattr(whichHeuristic, 'consistent', True):
+        raise ValueError('arenaAStar does not reopen expanded states, use a consistent heuristic')
+    nodeLimit = nodeLimit or puzzleModule.maxNodesPerSearch
+    count = 0
+    stats = SearchStats()
+    view = PackedPuzzle(tiles)  # node the heuristics are evaluated on, moved to each child in turn
+    view.parent = PackedPuzzle(tiles)  # the node being expanded, whose keys a heuristic's delta reads
+    board = view.board
+    arena = NodeArena(board)
+    bits = board.cellBits
+    mask = board.cellMask
+    delta = getattr(whichHeuristic, 'delta', None)
+    Q = BucketQueue('i')
+
+    rootIndex = arena.reach(view.state, view.blank, noParent, 0, 0)
+    Q.put(stats.evaluate(whichHeuristic, view), 0, rootIndex)
+
+    while not Q.empty():
+        if count >= nodeLimit:
+            print('Max nodes exceeded, terminating search. Nodes checked: %d' % count)
+            return finishArena(None, count, stats, SearchStatus.NODE_LIMIT, arena)
+        (f, g, index) = Q.get()
+
+        if arena.closed[index] or g > arena.costs[index]:
+            stats.duplicates += 1
+            continue  # stale queue entry, this state was reached more cheaply
+        arena.closed[index] = 1
+        state = arena.states[index]
+        blank = arena.blanks[index]
+        if state == board.solvedState:
+            node = newSolutionNode(tiles, arena.getMoves(index))
+            return finishArena(node, count, stats, SearchStatus.SOLVED, arena)
+        stats.expand(g)
+
+        view.parent.state = state
+        view.parent.blank = blank
+        view.parent.heuristicKeys = None  # the delta builds them once for all the children
+        h = f - g
+        undo = 3 - arena.moves[index] if index != rootIndex else None  # moveCodes of opposite moves add up to 3
+        for move, target in board.packedMoves[blank]:
+            if moveIndex[move] == undo:
+                continue  # back to the parent, which is already expanded
+            stats.generated += 1
+            childState = movePacked(state, blank, target, bits)
+            childIndex = arena.reach(childState, target, index, moveIndex[move], g + 1)
+            if childIndex < 0:
+                stats.duplicates += 1
+                continue  # already expanded, or already queued with an equal or better cost
+            count += 1
+
+            view.state = childState
+            view.blank = target
+            view.cost = g + 1
+            view.move = move
+            if delta:
+                childH = stats.evaluate(delta, h, move, (state >> (target * bits)) & mask, view)
+            else:
+                childH = stats.evaluate(whichHeuristic, view)
+            Q.put(g + 1 + childH, g + 1, childIndex)
+        stats.updatePeaks(len(Q), stats.expanded)
+
+    return finishArena(None, count, stats, SearchStatus.NO_SOLUTION, arena)
+
+
+def finishArena(node, count, stats, status, arena):
+    """
+    Package arenaAStar's return value like aStar's, with the arena in result.arena
+    :return: SearchResult
+    """
+    result = finishSearch(node, None, count, node.cost if node else 0, stats, status)
+    result.arena = arena
+    return result
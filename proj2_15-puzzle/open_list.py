@@ -0,0 +1,139 @@
+#!/usr/bin/python3
+
+# AI 531 - Project 2 - 15 Puzzle
+# Open lists for aStar
+
+import heapq
+
+from array import array
+
+"""
+Both queues take (f, g, node) entries and pop the lowest f first. Among equal f values the node with
+the highest g (deepest, so usually closest to the goal) comes first, and among equal f and g the most
+recently added node (LIFO). Neither takes a lock, unlike queue.PriorityQueue.
+"""
+
+
+class BucketQueue:
+    """
+    Open list for small integer f and g values: buckets[f][g] is a stack of nodes
+    Put is O(1), get is O(1) amortized (the lowest non-empty f only moves forward as buckets are emptied)
+    """
+
+    def __init__(self, typecode=None):
+        """
+        :param typecode: store the stacks in array(typecode) instead of lists (for int entries, e.g. arena indices)
+        """
+        self.buckets = []  # buckets[f] = list of stacks indexed by g (trailing empty stacks are removed)
+        self.minF = 0  # no bucket below this f has nodes
+        self.size = 0
+        self.newStack = list if typecode is None else lambda: array(typecode)
+
+    def put(self, f, g, node):
+        buckets = self.buckets
+        while len(buckets) <= f:
+            buckets.append([])
+        stacks = buckets[f]
+        while len(stacks) <= g:
+            stacks.append(self.newStack())
+        stacks[g].append(node)
+
+        self.size += 1
+        if f < self.minF:
+            self.minF = f
+
+    def get(self):
+        """
+        Remove and return the best entry
+        :return: (f, g, node)
+        """
+        buckets = self.buckets
+        f = self.minF
+        while not buckets[f]:
+            f += 1
+        self.minF = f
+
+        stacks = buckets[f]
+        g = len(stacks) - 1
+        node = stacks[g].pop()
+        while stacks and not stacks[-1]:  # drop empty stacks so the last one is always the highest g
+            stacks.pop()
+
+        self.size -= 1
+        return f, g, node
+
+    def empty(self):
+        return self.size == 0
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        """
+        Yield every (f, g, node) entry without removing it, in no particular order
+        """
+        for f, stacks in enumerate(self.buckets):
+            for g, stack in enumerate(stacks):
+                for node in stack:
+                    yield f, g, node
+
+
+class HeapQueue:
+    """
+    Open list on a binary heap (heapq), works for any f values (not only small integers)
+    Put and get are O(log n)
+    """
+
+    def __init__(self):
+        self.heap = []
+        self.count = 0  # insertion counter, negated so later entries win ties
+
+    def put(self, f, g, node):
+        self.count += 1
+        heapq.heappush(self.heap, (f, -g, -self.count, node))
+
+    def get(self):
+        """
+        Remove and return the best entry
+        :return: (f, g, node)
+        """
+        (f, negG, negCount, node) = heapq.heappop(self.heap)
+        return f, -negG, node
+
+    def empty(self):
+        return not self.heap
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __iter__(self):
+        """
+        Yield every (f, g, node) entry without removing it, in no particular order
+        """
+        for (f, negG, negCount, node) in self.heap:
+            yield f, -negG, node
+
+
+if __name__ == '__main__':
+    # compare the open lists on the same scrambled puzzles: python open_list.py
+    import random
+    import time
+
+    from linear_conflict import heuristicMy
+    from puzzle import Puzzle, aStar
+
+    random.seed(0)
+    puzzles = []
+    for i in range(10):
+        puzzle = Puzzle()
+        puzzle.scramblePuzzle(40)
+        puzzles.append(puzzle.tiles)
+
+    for openList in [BucketQueue, HeapQueue]:
+        nodes = 0
+        start = time.time()
+        for tiles in puzzles:
+            (node, fLimit, count, moves) = aStar(tiles, heuristicMy, openList)
+            nodes += count
+        runTime = time.time() - start
+        print('%s: nodes=%d, time=%.3f, nodes/second=%.0f' % (openList.__name__, nodes, runTime, nodes / runTime))
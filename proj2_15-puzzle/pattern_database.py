@@ -0,0 +1,329 @@
+#!/usr/bin/python3
+
+# AI 531 - Project 2 - 15 Puzzle
+# Additive disjoint pattern database heuristic
+
+import mmap
+import os
+import time
+
+from collections import deque
+from puzzle import Puzzle, PackedPuzzle, puzzleSize, packTiles, getBoardInfo
+from symmetry import getSymmetryTables
+
+"""
+A pattern database (PDB) stores the exact number of moves needed to bring a subset of tiles (the pattern)
+to their goal cells, counting only moves of pattern tiles. Tiles outside the pattern are treated as
+indistinguishable. If the tiles are split into disjoint patterns, each move only moves one tile, so the
+values of all patterns can be added and the sum is still admissible.
+
+Each table is built once with a backward breadth-first search from the goal, written to disk as a flat
+byte array (one byte per placement of the pattern tiles) and memory-mapped at solve time.
+
+The search also keeps a byte for every placement and cell of the empty square (16 times the table), and
+each tile added to a pattern multiplies the work by about 12: a 4 tile table takes 3 seconds, 5 tiles 50
+seconds and the 6 tile table of partition663 about 12 minutes and 1GB of memory. Tables of 7 or 8 tiles
+(a 7-8 split) are out of reach this way, the 8 tile search alone would need 8.3GB for those bytes.
+
+A pattern that is the reflection of an earlier pattern of its partition about the main diagonal (the lower
+triangle of partition663 is the upper triangle reflected) has no table of its own: its value is the earlier
+pattern's table looked up with every cell reflected (symmetry), which halves the disk and memory used.
+"""
+
+numCells = puzzleSize * puzzleSize  # cells of the default board
+partition663 = [[2, 3, 4, 7, 8, 12], [5, 9, 13, 10, 14, 15], [1, 6, 11]]  # 6-6-3 split (upper/lower triangle, diagonal)
+patternPartition = partition663  # partition heuristicPDB loads for the default board size
+pdbDirectory = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pdb')  # where tables are stored
+unknownDistance = 255  # marks table entries the search has not reached yet
+
+loadedDatabases = {}  # board size -> list of (tiles, table, cell map) lookups used by heuristicPDB
+tileDatabases = {}  # board size -> {tile: (tiles, table, cell map) it belongs to}, for heuristicPDBDelta
+
+
+def goalCell(tile):
+    """
+    Return the cell index (row major) where a tile belongs in the solved puzzle
+    :param tile:
+    :return:
+    """
+    return tile - 1
+
+
+def tableSize(patternSize, cells=numCells):
+    """
+    Number of ways to place patternSize distinct tiles on the board (cells! / (cells - patternSize)!)
+    :param patternSize:
+    :param cells: cells on the board
+    :return:
+    """
+    size = 1
+    for i in range(patternSize):
+        size *= cells - i
+    return size
+
+
+def rankPositions(positions, cells=numCells):
+    """
+    Map the cells of the pattern tiles to a dense index in [0, tableSize(len(positions), cells))
+    Digit i is the cell of tile i among the cells not used by tiles 0..i-1 (mixed radix 16, 15, 14, ...)
+    :param positions: cell index of each pattern tile, in pattern order
+    :param cells: cells on the board
+    :return:
+    """
+    index = 0
+    for i, cell in enumerate(positions):
+        smaller = 0
+        for j in range(i):
+            if positions[j] < cell:
+                smaller += 1
+        index = index * (cells - i) + cell - smaller
+    return index
+
+
+def patternFilename(pattern, directory=None, size=puzzleSize):
+    """
+    Return the file a pattern's table is stored in
+    :param pattern: list of tiles
+    :param directory: table directory (defaults to pdbDirectory)
+    :param size: number of rows and cols of the board
+    :return:
+    """
+    return os.path.join(directory or pdbDirectory, 'pdb%dx%d_%s.bin' % (
+        size, size, '_'.join(str(tile) for tile in pattern)))
+
+
+def mirrorSource(partition, index, size=puzzleSize):
+    """
+    Return the earlier pattern of a partition whose reflection has the same tiles as pattern index
+    :param partition: list of patterns
+    :param index: position of the pattern in the partition
+    :param size: number of rows and cols of the board
+    :return: the earlier pattern, or None if the pattern needs its own table
+    """
+    cells, tiles = getSymmetryTables(getBoardInfo(size))
+    reflected = set(tiles[tile] for tile in partition[index])
+    for pattern in partition[:index]:
+        if set(pattern) == reflected:
+            return pattern
+    return None
+
+
+def buildPatternDatabase(pattern, size=puzzleSize):
+    """
+    Backward breadth-first search from the goal over placements of the pattern tiles and the empty square.
+    Moving a pattern tile costs 1, moving any other tile costs 0 (0-1 BFS with a deque), so the
+    tables of disjoint patterns can be added together.
+    Memory is one byte per placement and empty cell (tableSize(len(pattern)) * cells) plus the queue
+    :param pattern: list of tiles
+    :param size: number of rows and cols of the board
+    :return: bytearray with the move count for every placement of the pattern tiles (min over empty cells)
+    """
+    board = getBoardInfo(size)
+    cells = board.numCells
+    neighbours = [[target for move, target in moves] for moves in board.packedMoves]  # cells the empty square can reach
+    entries = tableSize(len(pattern), cells)
+    table = bytearray([unknownDistance]) * entries
+    best = bytearray([unknownDistance]) * (entries * cells)  # distance for each placement and empty cell
+
+    goal = tuple(goalCell(tile) for tile in pattern)
+    blank = board.solvedBlank
+    best[rankPositions(goal, cells) * cells + blank] = 0
+    queue = deque([(goal, blank, 0)])
+
+    while queue:
+        positions, blank, dist = queue.popleft()
+        index = rankPositions(positions, cells)
+        if best[index * cells + blank] < dist:
+            continue  # reached again with a lower distance after this entry was queued
+        if dist < table[index]:
+            table[index] = dist
+
+        for target in neighbours[blank]:
+            if target in positions:  # a pattern tile slides into the empty cell
+                i = positions.index(target)
+                newPositions = positions[:i] + (blank,) + positions[i + 1:]
+                newIndex = rankPositions(newPositions, cells)
+                newDist = dist + 1
+            else:  # a tile outside the pattern moves, this is free
+                newPositions = positions
+                newIndex = index
+                newDist = dist
+
+            slot = newIndex * cells + target
+            if newDist < best[slot]:
+                best[slot] = newDist
+                if newDist == dist:
+                    queue.appendleft((newPositions, target, newDist))
+                else:
+                    queue.append((newPositions, target, newDist))
+
+    return table
+
+
+def writePatternDatabase(pattern, directory=None, size=puzzleSize):
+    """
+    Build the table for a pattern and write it to disk as a flat byte array
+    :param pattern: list of tiles
+    :param directory: table directory (defaults to pdbDirectory)
+    :param size: number of rows and cols of the board
+    :return: filename written
+    """
+    filename = patternFilename(pattern, directory, size)
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    table = buildPatternDatabase(pattern, size)
+    with open(filename + '.tmp', 'wb') as fh:  # write then rename so a partial file is never loaded
+        fh.write(table)
+    os.replace(filename + '.tmp', filename)
+    return filename
+
+
+def buildPartition(partition=None, directory=None, size=puzzleSize):
+    """
+    Build and write the tables for every pattern in a partition (except patterns that mirror an earlier one)
+    :param partition: list of patterns (defaults to patternPartition)
+    :param directory: table directory (defaults to pdbDirectory)
+    :param size: number of rows and cols of the board
+    :return:
+    """
+    partition = partition or patternPartition
+    for index, pattern in enumerate(partition):
+        if mirrorSource(partition, index, size):
+            continue  # looked up in the mirrored pattern's table
+        start = time.time()
+        filename = writePatternDatabase(pattern, directory, size)
+        print('Wrote %s (%d entries) in %.1f seconds' % (
+            filename, tableSize(len(pattern), size * size), time.time() - start))
+
+
+def loadPatternDatabase(pattern, directory=None, size=puzzleSize):
+    """
+    Memory-map a pattern table that was written by writePatternDatabase
+    :param pattern: list of tiles
+    :param directory: table directory (defaults to pdbDirectory)
+    :param size: number of rows and cols of the board
+    :return: read only mmap (indexing it returns the move count as an int)
+    """
+    filename = patternFilename(pattern, directory, size)
+    if not os.path.exists(filename):
+        raise FileNotFoundError('Pattern database %s not found, build it with: python pattern_database.py' % filename)
+
+    with open(filename, 'rb') as fh:
+        table = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(table) != tableSize(len(pattern), size * size):
+        raise ValueError('Pattern database %s has %d entries, expected %d' % (
+            filename, len(table), tableSize(len(pattern), size * size)))
+    return table
+
+
+def usePatternDatabases(partition=None, directory=None, size=puzzleSize):
+    """
+    Load the tables heuristicPDB will use for puzzles of one board size
+    :param partition: list of disjoint patterns (defaults to patternPartition)
+    :param directory: table directory (defaults to pdbDirectory)
+    :param size: number of rows and cols of the board
+    :return:
+    """
+    partition = partition or patternPartition
+    cells, tiles = getSymmetryTables(getBoardInfo(size))
+    databases = []
+    for index, pattern in enumerate(partition):
+        source = mirrorSource(partition, index, size)
+        if source:  # rank the reflected cells of the tiles that mirror the source's tiles, in the source's order
+            databases.append(([tiles[tile] for tile in source], loadPatternDatabase(source, directory, size), cells))
+        else:
+            databases.append((pattern, loadPatternDatabase(pattern, directory, size), None))
+    loadedDatabases[size] = databases
+    tileDatabases[size] = {tile: database for database in databases for tile in database[0]}
+
+
+def getDatabases(size):
+    """
+    Return the loaded (tiles, table, cell map) lookups for a board size (the default board loads patternPartition on first use)
+    :param size: number of rows and cols of the board
+    :return:
+    """
+    if size not in loadedDatabases:
+        if size != puzzleSize:
+            raise ValueError('No pattern databases loaded for %dx%d boards, call usePatternDatabases' % (size, size))
+        usePatternDatabases()
+    return loadedDatabases[size]
+
+
+def tileCells(puzzle):
+    """
+    Return a list where entry t is the cell index of tile t (entry 0 is the empty cell)
+    :param puzzle:
+    :return:
+    """
+    board = puzzle.board
+    if isinstance(puzzle, PackedPuzzle):
+        state = puzzle.state
+    else:
+        state, blank = packTiles(puzzle.tiles, board)
+
+    cells = [0] * board.numCells
+    for cell in range(board.numCells):
+        cells[(state >> (cell * board.cellBits)) & board.cellMask] = cell
+    return cells
+
+
+def heuristicPDB(puzzle: Puzzle):
+    """
+    Additive pattern database heuristic: sum of the table values of each disjoint pattern
+    This is admissible since each table only counts moves of its own tiles
+    :return:
+    """
+    if not puzzle.board.usualGoal:
+        raise ValueError('Pattern databases are built for the usual goal')
+    databases = getDatabases(puzzle.size)
+    numCells = puzzle.board.numCells
+    cells = tileCells(puzzle)
+    sum = 0
+    for pattern, table, cellMap in databases:
+        if cellMap is None:
+            sum += table[rankPositions([cells[tile] for tile in pattern], numCells)]
+        else:
+            sum += table[rankPositions([cellMap[cells[tile]] for tile in pattern], numCells)]
+
+    return sum
+
+
+def heuristicPDBDelta(parentH, move, movedTile, child: Puzzle):
+    """
+    Incremental pattern database heuristic: only the table of the pattern holding the moved tile changes, so
+    that table is read for the child and the parent (two lookups instead of one per pattern). Finding where the
+    pattern's tiles are still reads the whole board, so the cost is O(cells) like heuristicPDB with fewer lookups
+    :param parentH: heuristicPDB value of the parent
+    :param move: direction the empty square moved
+    :param movedTile: numbered tile that moved
+    :param child: node after the move
+    :return: heuristicPDB value of the child
+    """
+    if not child.board.usualGoal:
+        raise ValueError('Pattern databases are built for the usual goal')
+    getDatabases(child.size)  # loads the tables if the delta is the first lookup on this board size
+    databases = tileDatabases[child.size]
+    if movedTile not in databases:  # tile is not in any pattern
+        return parentH
+
+    pattern, table, cellMap = databases[movedTile]
+    numCells = child.board.numCells
+    cells = tileCells(child)
+    row, col = child.getEmptyPosition()
+    oldCell = row * child.size + col  # the moved tile was where the empty square is now
+    positions = [cells[tile] for tile in pattern]
+    oldPositions = [oldCell if tile == movedTile else cells[tile] for tile in pattern]
+    if cellMap is not None:
+        positions = [cellMap[cell] for cell in positions]
+        oldPositions = [cellMap[cell] for cell in oldPositions]
+    res = parentH + table[rankPositions(positions, numCells)] - table[rankPositions(oldPositions, numCells)]
+
+    return res
+
+
+heuristicPDB.delta = heuristicPDBDelta
+
+
+if __name__ == '__main__':
+    # build the default tables: python pattern_database.py
+    buildPartition(partition663)
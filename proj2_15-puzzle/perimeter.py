@@ -0,0 +1,214 @@
+#!/usr/bin/python3
+
+# AI 531 - Project 2 - 15 Puzzle
+# Perimeter search: exact distances of the boards near the goal
+
+import os
+import sys
+import time
+
+from move_pruning import moveOrder
+from pattern_database import pdbDirectory
+from puzzle import puzzleSize, getBoardInfo, movePacked, newSolutionNode
+
+"""
+A perimeter is every board within depth moves of the goal, found with one breadth first search backwards
+from the goal. For each board it keeps the exact number of moves to the goal and the first move of a
+shortest path there, packed in one int (distance << 2 | index of the move in moveOrder). Following first
+moves from a board in the perimeter walks a shortest path to the goal with no search.
+
+aStar and rbfs take a PerimeterTable and treat its boards as goals whose f value is exact: a child in the
+perimeter is queued with f = g + distance (never below g + h, h is admissible) and the search stops when
+such a node would be expanded. Every other node then has an f value at least as high, so the path through
+the perimeter is a shortest one. A start board inside the perimeter is answered without searching.
+
+The table of a (board size, depth) is written once to pdbDirectory (each board's packed state followed by a
+byte of its code) and loaded from there.
+"""
+
+perimeterDepth = 14  # default radius of the perimeter (61865 boards of the 4x4 puzzle, 0.6MB on disk)
+maxPerimeterDepth = 63  # largest distance that fits in an entry's byte next to the move index
+
+perimeterTables = {}  # (board size, depth) -> PerimeterTable
+
+
+class PerimeterTable:
+    """
+    Distance to the goal and first move of a shortest path for every board within depth moves of the goal
+    """
+
+    def __init__(self, size, depth, entries):
+        self.size = size
+        self.depth = depth
+        self.board = getBoardInfo(size)
+        self.entries = entries  # packed state -> distance << 2 | index of the first move in moveOrder
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, state):
+        return state in self.entries
+
+    def distance(self, state):
+        """
+        Return the exact number of moves from a board to the goal
+        :param state: packed tiles
+        :return: distance, or None if the board is outside the perimeter
+        """
+        code = self.entries.get(state)
+        return None if code is None else code >> 2
+
+    def movesToGoal(self, state):
+        """
+        Follow first moves from a board in the perimeter to the goal
+        :param state: packed tiles
+        :return: moves of the empty square (a shortest solution)
+        """
+        board = self.board
+        blank = 0
+        while (state >> (blank * board.cellBits)) & board.cellMask:
+            blank += 1
+        moves = []
+        code = self.entries[state]
+        while code >> 2:
+            move = moveOrder[code & 3]
+            target = blank + board.moveOffsets[move]
+            state = movePacked(state, blank, target, board.cellBits)
+            blank = target
+            moves.append(move)
+            code = self.entries[state]
+        return moves
+
+    def solutionNode(self, tiles, node):
+        """
+        Build the solution through a node whose board is in the perimeter
+        :param tiles: starting board of the search (2D list)
+        :param node: search node in the perimeter
+        :return: last node of the chain (the goal)
+        """
+        path = []
+        step = node
+        while step.parent is not None:
+            path.append(step.move)
+            step = step.parent
+        path.reverse()
+        return newSolutionNode(tiles, path + self.movesToGoal(node.getKey()))
+
+
+def checkDepth(depth):
+    """
+    Raise ValueError for a depth whose distances do not fit in a table entry
+    :param depth: radius of the perimeter
+    :return:
+    """
+    if not 0 <= depth <= maxPerimeterDepth:
+        raise ValueError('Perimeter depth must be between 0 and %d, not %d' % (maxPerimeterDepth, depth))
+
+
+def buildPerimeter(size=puzzleSize, depth=perimeterDepth):
+    """
+    Breadth first search from the goal to depth moves, recording the move back towards the goal
+    :param size: number of rows and cols of the board
+    :param depth: radius of the perimeter
+    :return: dict packed state -> distance << 2 | index of the first move in moveOrder
+    """
+    checkDepth(depth)
+    board = getBoardInfo(size)
+    bits = board.cellBits
+    entries = {board.solvedState: 0}
+    layer = [(board.solvedState, board.solvedBlank)]
+    for dist in range(1, depth + 1):
+        nextLayer = []
+        for state, blank in layer:
+            for move, target in board.packedMoves[blank]:
+                child = movePacked(state, blank, target, bits)
+                if child not in entries:
+                    # opposite moves sum to 3 in moveOrder, undoing this move leads back towards the goal
+                    entries[child] = dist << 2 | (3 - moveOrder.index(move))
+                    nextLayer.append((child, target))
+        layer = nextLayer
+    return entries
+
+
+def stateBytes(size):
+    """
+    Number of bytes a packed board takes in a table file
+    :param size: number of rows and cols of the board
+    :return:
+    """
+    board = getBoardInfo(size)
+    return (board.numCells * board.cellBits + 7) // 8
+
+
+def perimeterFilename(size=puzzleSize, depth=perimeterDepth, directory=None):
+    """
+    Return the file a perimeter is stored in
+    :param size: number of rows and cols of the board
+    :param depth: radius of the perimeter
+    :param directory: table directory (defaults to pdbDirectory)
+    :return:
+    """
+    return os.path.join(directory or pdbDirectory, 'perimeter%dx%d_%d.bin' % (size, size, depth))
+
+
+def writePerimeter(size=puzzleSize, depth=perimeterDepth, directory=None):
+    """
+    Build a perimeter and write it to disk, one (state, code) entry per board
+    :param size: number of rows and cols of the board
+    :param depth: radius of the perimeter
+    :param directory: table directory (defaults to pdbDirectory)
+    :return: filename written
+    """
+    filename = perimeterFilename(size, depth, directory)
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    entries = buildPerimeter(size, depth)
+    width = stateBytes(size)
+    with open(filename + '.tmp', 'wb') as fh:  # write then rename so a partial file is never loaded
+        fh.write(b''.join(state.to_bytes(width, 'little') + bytes((code,)) for state, code in entries.items()))
+    os.replace(filename + '.tmp', filename)
+    return filename
+
+
+def loadPerimeter(size=puzzleSize, depth=perimeterDepth, directory=None):
+    """
+    Load a perimeter, building and writing it first if needed
+    :param size: number of rows and cols of the board
+    :param depth: radius of the perimeter
+    :param directory: table directory (defaults to pdbDirectory)
+    :return: PerimeterTable
+    """
+    filename = perimeterFilename(size, depth, directory)
+    if not os.path.exists(filename):
+        writePerimeter(size, depth, directory)
+
+    with open(filename, 'rb') as fh:
+        data = fh.read()
+    width = stateBytes(size)
+    if len(data) % (width + 1):
+        raise ValueError('Perimeter table %s has an invalid size (%d bytes)' % (filename, len(data)))
+    entries = {int.from_bytes(data[i:i + width], 'little'): data[i + width] for i in range(0, len(data), width + 1)}
+    table = perimeterTables[(size, depth)] = PerimeterTable(size, depth, entries)
+    return table
+
+
+def getPerimeter(size=puzzleSize, depth=perimeterDepth):
+    """
+    Return the loaded perimeter of a board size and depth, loading it on first use
+    :param size: number of rows and cols of the board
+    :param depth: radius of the perimeter
+    :return: PerimeterTable
+    """
+    checkDepth(depth)
+    table = perimeterTables.get((size, depth))
+    if table is None:
+        table = loadPerimeter(size, depth)
+    return table
+
+
+if __name__ == '__main__':
+    # rebuild a perimeter: python perimeter.py [depth] [size]
+    depth = int(sys.argv[1]) if len(sys.argv) > 1 else perimeterDepth
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else puzzleSize
+    start = time.time()
+    filename = writePerimeter(size, depth)
+    print('Wrote %s (%d boards) in %.1f seconds' % (filename, len(loadPerimeter(size, depth)), time.time() - start))
@@ -0,0 +1,199 @@
+#!/usr/bin/python3
+
+# AI 531 - Project 2 - 15 Puzzle
+# Perfect hashing of boards by permutation rank
+
+import sys
+import time
+
+from math import factorial
+from puzzle import Puzzle, PackedPuzzle, puzzleSize, packTiles, getBoardInfo, movePacked
+
+"""
+A board is a permutation: the cell of each tile, in tile order with the empty square as tile 0. Its
+lexicographic rank (Lehmer code: digit t is the number of smaller cells not used by tiles 0..t-1) is a
+dense index in [0, cells!). Only half of the permutations can be reached from the goal. Swapping the
+cells of the last two tiles changes the rank by one (2k <-> 2k + 1) and, since neither is the empty
+square, always turns a reachable board into an unreachable one. So rank // 2 is a perfect hash of the
+reachable boards onto [0, cells! / 2), and unranking tries 2k and keeps whichever board is reachable.
+
+With boards as dense ints, a closed list is a BitSet (one bit per board) and a distance table a bytearray
+(one byte per board): the whole 8 puzzle (181440 boards) fits in 23KB and 178KB.
+"""
+
+unknownDistance = 255  # distance table entry of a board the search has not reached
+
+
+class BitSet:
+    """
+    Set of ints in [0, size) stored as one bit each
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.bits = bytearray((size + 7) // 8)
+
+    def add(self, index):
+        self.bits[index >> 3] |= 1 << (index & 7)
+
+    def __contains__(self, index):
+        return self.bits[index >> 3] >> (index & 7) & 1 == 1
+
+    def __len__(self):
+        return int.from_bytes(self.bits, 'little').bit_count()
+
+
+def stateCount(size=puzzleSize):
+    """
+    Number of boards reachable from the goal (cells! / 2)
+    :param size: number of rows and cols of the board
+    :return:
+    """
+    return factorial(size * size) // 2
+
+
+def isReachable(state, blank, board):
+    """
+    Return True if a board can be reached from the goal: every move swaps the empty square with a tile,
+    flipping the parity of the permutation (cell -> goal cell of its tile) and moving the empty square
+    by one cell, so the two parities always match
+    :param state: packed tiles
+    :param blank: cell of the empty square
+    :param board: BoardInfo of the puzzle
+    :return:
+    """
+    goals = []  # goal cell of the tile on each cell
+    for cell in range(board.numCells):
+        tile = (state >> (cell * board.cellBits)) & board.cellMask
+        goals.append(tile - 1 if tile else board.solvedBlank)
+    parity = 0
+    seen = [False] * board.numCells
+    for start in range(board.numCells):  # a cycle of length k is k - 1 swaps
+        if not seen[start]:
+            cell = start
+            while not seen[cell]:
+                seen[cell] = True
+                cell = goals[cell]
+                parity ^= 1
+            parity ^= 1
+    row, col = divmod(blank, board.size)
+    goalRow, goalCol = divmod(board.solvedBlank, board.size)
+    return parity == (abs(row - goalRow) + abs(col - goalCol)) & 1
+
+
+def rankState(state, board):
+    """
+    Perfect hash of a reachable board: its lexicographic rank folded in half
+    :param state: packed tiles
+    :param board: BoardInfo of the puzzle
+    :return: rank in [0, stateCount(board.size))
+    """
+    bits = board.cellBits
+    mask = board.cellMask
+    cells = board.numCells
+    positions = [0] * cells  # cell of each tile
+    for cell in range(cells):
+        positions[(state >> (cell * bits)) & mask] = cell
+
+    used = 0  # bit c is set once cell c has been given to a tile
+    rank = 0
+    for tile in range(cells - 1):
+        cell = positions[tile]
+        rank = rank * (cells - tile) + cell - (used & ((1 << cell) - 1)).bit_count()
+        used |= 1 << cell
+    return rank >> 1
+
+
+def unrankState(rank, board):
+    """
+    Inverse of rankState
+    :param rank: rank in [0, stateCount(board.size))
+    :param board: BoardInfo of the puzzle
+    :return: packed tiles, cell of the empty square
+    """
+    cells = board.numCells
+    digits = []
+    value = rank << 1
+    for base in range(1, cells + 1):  # Lehmer digits, last tile first
+        value, digit = divmod(value, base)
+        digits.append(digit)
+    digits.reverse()
+
+    free = list(range(cells))
+    positions = [free.pop(digit) for digit in digits]
+    state = 0
+    for tile, cell in enumerate(positions):
+        state |= tile << (cell * board.cellBits)
+    if not isReachable(state, positions[0], board):
+        # the other board of the pair has the last two tiles swapped
+        a, b = positions[-2], positions[-1]
+        tiles = (cells - 2) ^ (cells - 1)
+        state ^= (tiles << (a * board.cellBits)) | (tiles << (b * board.cellBits))
+    return state, positions[0]
+
+
+def rankPuzzle(puzzle: Puzzle):
+    """
+    Return the rank of a puzzle node's board
+    :param puzzle:
+    :return:
+    """
+    if isinstance(puzzle, PackedPuzzle):
+        return rankState(puzzle.state, puzzle.board)
+    return rankState(packTiles(puzzle.tiles, puzzle.board)[0], puzzle.board)
+
+
+def unrankPuzzle(rank, size=puzzleSize):
+    """
+    Return a PackedPuzzle for a rank
+    :param rank: rank in [0, stateCount(size))
+    :param size: number of rows and cols of the board
+    :return:
+    """
+    board = getBoardInfo(size)
+    state, blank = unrankState(rank, board)
+    return PackedPuzzle(None, None, None, 0, state, blank, size)
+
+
+def breadthFirstDistances(size=3, maxDepth=None):
+    """
+    Breadth first search from the goal over every reachable board, with a BitSet closed list
+    :param size: number of rows and cols of the board (3 searches the whole 8 puzzle in seconds)
+    :param maxDepth: stop after boards at this distance (None searches everything)
+    :return: bytearray of the distance of every board by rank (unknownDistance if not reached)
+    """
+    board = getBoardInfo(size)
+    count = stateCount(size)
+    bits = board.cellBits
+    closed = BitSet(count)
+    distances = bytearray([unknownDistance]) * count
+
+    start = rankState(board.solvedState, board)
+    closed.add(start)
+    distances[start] = 0
+    layer = [(board.solvedState, board.solvedBlank)]
+    depth = 0
+    while layer and depth != maxDepth:
+        depth += 1
+        nextLayer = []
+        for state, blank in layer:
+            for move, target in board.packedMoves[blank]:
+                child = movePacked(state, blank, target, bits)
+                rank = rankState(child, board)
+                if rank not in closed:
+                    closed.add(rank)
+                    distances[rank] = depth
+                    nextLayer.append((child, target))
+        layer = nextLayer
+
+    return distances
+
+
+if __name__ == '__main__':
+    # search every board of a size: python permutation_rank.py [size]
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    start = time.time()
+    distances = breadthFirstDistances(size)
+    reached = [dist for dist in distances if dist != unknownDistance]
+    print('%d boards, %d reached, max distance %d, %.1f seconds' % (
+        len(distances), len(reached), max(reached), time.time() - start))
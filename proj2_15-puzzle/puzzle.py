@@ -7,11 +7,13 @@
 
 import copy
 import random
-import time
 import utility
 
-from queue import PriorityQueue
+from move_pruning import getMoveAutomaton, inverseDepth
+from open_list import BucketQueue
+from search_stats import SearchStats, SearchResult, SearchStatus
 from sys import maxsize
+from transposition_table import TranspositionTable
 from typing import Dict
 
 """
@@ -48,60 +50,41 @@ collectData = True  # set to True to generate test data (long runtime)
 csvFilename = 'data.csv'  # where test runtimes are written
 debug = False  # prints debug messages when enabled
 maxNodesPerSearch = 50000  # max nodes to search before rbfs gives up
+statePacking = True  # searches store boards as nibble-packed ints (PackedPuzzle) instead of lists of lists
+openListType = BucketQueue  # open list used by aStar (HeapQueue also works for non-integer f values)
 
 moveL = 'L'  # movement the empty tile can do: left, right, up, down
 moveR = 'R'  # if tile is on an edge, some movements will not be allowed
 moveU = 'U'
 moveD = 'D'
+reverseMoves = {moveU: moveD, moveD: moveU, moveL: moveR, moveR: moveL}  # move that undoes each move
 
 
-class Puzzle:
-    totalNodes = 0  # global counter of total nodes in total tree
-
-    def __init__(self, tiles=None, parent=None, move=None, cost=0):
-        self.tiles = tiles  # state of all tiles (2D array)
-        self.parent = parent  # parent node of this puzzle (None=root node)
-        self.move = move  # direction the empty tile was moved to get here (from parent)
-
-        if not tiles:  # if board config is not given, start with solved board
-            self.tiles = self.getSolvedPuzzle()
-
-        if parent:  # total cost to get here is parent + node cost (1)
-            self.cost = parent.cost + cost
-        else:
-            self.cost = cost
-
-        self.evalFunc = self.cost  # estimate value (updated by search funcs)
-
-        if debug:
-            print('New node: move=%s, cost=%s' % (self.move, self.cost))
 
-        if tiles is None:
-            # self.size = puzzleSize
-            self.tiles = self.getSolvedPuzzle()
-        else:
-            # self.size = len(self.tiles)
-            assert all(len(e) == len(self.tiles) for e in self.tiles)
+class SearchNode:
+    """
+    Fields and moves shared by Puzzle and PackedPuzzle, each of which adds the slots its board is stored in
+    Nodes use __slots__ (no per-instance __dict__), the goal board and target positions live in the
+    BoardInfo shared by every node of the same size
+    """
+    __slots__ = ('parent', 'move', 'cost', 'evalFunc', 'heuristic', 'fullHeuristic', 'size', 'board', 'moveState',
+                 'heuristicKeys')
+    totalNodes = 0  # global counter of total nodes in total tree
 
-        self.evalFunc = self.cost  # start as cost, rbfs will update during search to cost + estimate
-        Puzzle.totalNodes += 1
-        self.target_pos = self.generateTargetPosition()
-
-    def generateTargetPosition(self) -> Dict[int, tuple]:
-        target = self.getSolvedPuzzle()
-        target_pos = {}
-        for i in range(puzzleSize):
-            for j in range(puzzleSize):
-                target_val = target[i][j]
-                target_pos[target_val] = (i, j)
-        return target_pos
+    @property
+    def target_pos(self) -> Dict[int, tuple]:
+        """
+        Goal (row, col) of every tile, shared by all nodes of this size (do not modify)
+        :return:
+        """
+        return self.board.targetPosition
 
     def getTargetPosition(self, val) -> tuple:
-        return self.target_pos[val]
+        return self.board.targetPosition[val]
 
     def getSolvedPuzzle(self):
         """
-        Build and return an ordered grid of puzzleSize x puzzleSize (last cell is empty)
+        Return a new ordered grid of size x size (last cell is empty)
         For a 4x4 grid, it should look like:
         [1,   2,  3,  4],
         [5,   6,  7,  8],
@@ -109,25 +92,14 @@ class Puzzle:
         [13, 14, 15, emptySquare]
         :return:
         """
-        # TODO : cache the solved solution
-
-        puzzle = []
-        for row in range(puzzleSize):
-            line = []
-            for col in range(puzzleSize):
-                line.append(row * puzzleSize + col + 1)  # add 1 to start tiles at 1 instead of 0
-            puzzle.append(line)
-
-        # set the last square to blank
-        puzzle[puzzleSize - 1][puzzleSize - 1] = emptySquare
-        return puzzle
+        return [list(row) for row in self.board.solvedTiles]
 
     def isPuzzleSolved(self):
         """
         Return True if the tiles are in the goal state, else False
         :return:
         """
-        return self.tiles == self.getSolvedPuzzle()
+        return self.tiles == self.board.solvedTiles
 
     def scramblePuzzle(self, m):
         """
@@ -205,8 +177,8 @@ class Puzzle:
         :param target:
         :return:
         """
-        for row in range(puzzleSize):
-            for col in range(puzzleSize):
+        for row in range(self.size):
+            for col in range(self.size):
                 if self.tiles[row][col] == target:
                     return (row, col)
 
@@ -229,9 +201,9 @@ class Puzzle:
             moves.append(moveU)
         if col > 0:  # left (cannot be on left col)
             moves.append(moveL)
-        if col < puzzleSize - 1:  # right (cannot be on right column)
+        if col < self.size - 1:  # right (cannot be on right column)
             moves.append(moveR)
-        if row < puzzleSize - 1:  # down (cannot be on bottom row)
+        if row < self.size - 1:  # down (cannot be on bottom row)
             moves.append(moveD)
 
         return moves
@@ -260,23 +232,31 @@ class Puzzle:
 
         # put the empty square where the numbered tile previously was
         self.tiles[row][col] = emptySquare
+        self.heuristicKeys = None  # no longer describe the board
 
-    def generateChildren(self):
+    def generateChildren(self, automaton=None):
         """
         Generate valid children tile configurations given the current tiles
-        One child node for each direction the empty square can move
+        One child node for each direction the empty square can move, except moves that complete a redundant
+        move sequence
+        :param automaton: MoveAutomaton of the sequences to skip (defaults to only skipping undoing the last move)
         :return:
         """
         children = []
+        nextStates = (automaton or getMoveAutomaton(inverseDepth)).next[self.moveState]
 
         # get list of valid moves the empty tile can do
         moves = self.getEmptyMoves()
         for move in moves:
+            moveState = nextStates.get(move)
+            if moveState is None:  # pruned
+                continue
             # copy tiles into new child node
             tiles = copy.deepcopy(self.tiles)
             child = Puzzle(tiles, self, move, 1)
             # move the empty square in the child node
             child.moveEmpty(move)
+            child.moveState = moveState
             children.append(child)
 
         return children
@@ -298,6 +278,334 @@ class Puzzle:
         moveStr = ", ".join(moves)
         print("Solution: %s" % moveStr)
 
+    def getMovedTile(self):
+        """
+        Return the numbered tile that moved from the parent to get here (it was where the empty square is now)
+        :return:
+        """
+        row, col = self.getEmptyPosition()
+        return self.parent.tiles[row][col]
+
+    def getKey(self):
+        """
+        Return a hashable key for the current board (the packed state)
+        :return:
+        """
+        return packTiles(self.tiles)[0]
+
+
+class Puzzle(SearchNode):
+    """
+    Search node holding the board as a 2D list of tiles
+    """
+    __slots__ = ('tiles',)
+
+    def __init__(self, tiles=None, parent=None, move=None, cost=0, size=None, goal=None):
+        self.parent = parent  # parent node of this puzzle (None=root node)
+        self.move = move  # direction the empty tile was moved to get here (from parent)
+
+        # number of rows and cols: same as the parent, else taken from the tiles, else size (default puzzleSize)
+        # the goal is the parent's, else goal (default tiles in order)
+        if parent:
+            self.board = parent.board
+        elif tiles:
+            self.board = getBoardInfo(len(tiles), goal)
+        else:
+            self.board = getBoardInfo(size or len(goal or ()) or puzzleSize, goal)
+        self.size = self.board.size  # goal and move tables shared by all nodes of this size
+
+        if not tiles:  # if board config is not given, start with solved board
+            tiles = self.getSolvedPuzzle()
+        else:
+            assert all(len(e) == len(tiles) for e in tiles)
+        self.tiles = tiles  # state of all tiles (2D array)
+
+        if parent:  # total cost to get here is parent + node cost (1)
+            self.cost = parent.cost + cost
+        else:
+            self.cost = cost
+
+        self.evalFunc = self.cost  # start as cost, rbfs will update during search to cost + estimate
+        self.heuristic = None  # heuristic estimate of this node (set by search funcs)
+        self.fullHeuristic = None  # expensive heuristic value, computed when the node is chosen (lazy aStar)
+        self.moveState = 0  # MoveAutomaton state of the moves from the root (set by generateChildren)
+        self.heuristicKeys = None  # abstract state a heuristic's delta carries from parent to child (walking distance)
+
+        if debug:
+            print('New node: move=%s, cost=%s' % (self.move, self.cost))
+        SearchNode.totalNodes += 1
+
+
+def buildSolvedTiles(size):
+    """
+    Build the goal grid for a size x size puzzle (tiles in order, last cell empty)
+    :param size: number of rows and cols
+    :return:
+    """
+    puzzle = []
+    for row in range(size):
+        line = []
+        for col in range(size):
+            line.append(row * size + col + 1)  # add 1 to start tiles at 1 instead of 0
+        puzzle.append(line)
+
+    # set the last square to blank
+    puzzle[size - 1][size - 1] = emptySquare
+    return puzzle
+
+
+class BoardInfo:
+    """
+    Goal, packing and move tables for one board size. Built once per size by getBoardInfo and
+    shared by every node, heuristic and search on boards of that size.
+    A board for another goal (any arrangement of the tiles) has its own BoardInfo: nodes built with it
+    check for that goal and the heuristics that read their targets from the board measure the distance to it.
+    """
+
+    def __init__(self, size, goal=None):
+        """
+        :param size: number of rows and cols
+        :param goal: goal grid (defaults to buildSolvedTiles(size))
+        """
+        self.size = size  # number of rows and cols
+        self.numCells = size * size
+        self.cellBits = (self.numCells - 1).bit_length()  # bits per cell in a packed state (4 for 3x3 and 4x4)
+        self.cellMask = (1 << self.cellBits) - 1
+        self.lineBits = size * self.cellBits  # bits of one packed row
+        self.lineMask = (1 << self.lineBits) - 1
+        self.columnShifts = [row * (self.lineBits - self.cellBits) for row in range(size)]  # cell (row, 0) -> cell row
+        self.moveOffsets = {moveU: -size, moveL: -1, moveR: 1, moveD: size}  # change in cell index of the empty square
+
+        self.solvedTiles = [list(row) for row in goal] if goal else buildSolvedTiles(size)  # goal grid, shared
+        self.usualGoal = goal is None  # tiles in order, last cell empty (the goal the heuristic tables are built for)
+        self.solvedState, self.solvedBlank = packTiles(self.solvedTiles, self)
+        self.targetPosition = {val: divmod(index, size) for index, val in enumerate(
+            val for row in self.solvedTiles for val in row)}  # tile -> (row, col) in the goal
+        self.rowSols = [list(row) for row in self.solvedTiles]  # goal contents of each row
+        self.colSols = [list(col) for col in zip(*self.solvedTiles)]  # goal contents of each column
+
+        # for each cell of the empty square, the legal (move, new empty cell) pairs
+        # same move order as Puzzle.getEmptyMoves (up, left, right, down)
+        self.packedMoves = []
+        for blank in range(self.numCells):
+            row, col = divmod(blank, size)
+            moves = []
+            if row > 0:
+                moves.append((moveU, blank - size))
+            if col > 0:
+                moves.append((moveL, blank - 1))
+            if col < size - 1:
+                moves.append((moveR, blank + 1))
+            if row < size - 1:
+                moves.append((moveD, blank + size))
+            self.packedMoves.append(moves)
+
+        # city block distance of every tile from every cell: cityBlockTable[tile][cell]
+        self.cityBlockTable = [[0] * self.numCells]  # empty square (tile 0) is not counted
+        for tile in range(1, self.numCells):
+            targetRow, targetCol = self.targetPosition[tile]
+            self.cityBlockTable.append([abs(targetRow - row) + abs(targetCol - col)
+                                        for row in range(size) for col in range(size)])
+
+
+boardInfos = {}  # size -> BoardInfo
+
+
+def getBoardInfo(size, goal=None):
+    """
+    Return the shared tables for a board size, building them the first time the size is used
+    A goal other than the usual one gets new tables on every call (a search shares them through its nodes),
+    so boards solved to once-off goals are not kept
+    :param size: number of rows and cols
+    :param goal: goal grid, when it is not the usual one (tiles in order, last cell empty)
+    :return:
+    """
+    if goal is not None:
+        if sorted(map(str, (val for row in goal for val in row))) != \
+                sorted(map(str, (val for row in buildSolvedTiles(size) for val in row))):
+            raise ValueError('A goal must hold each tile of a %dx%d board once' % (size, size))
+        if goal != getBoardInfo(size).solvedTiles:
+            return BoardInfo(size, goal)
+    board = boardInfos.get(size)
+    if board is None:
+        board = boardInfos[size] = BoardInfo(size)
+    return board
+
+
+def packTiles(tiles, board=None):
+    """
+    Pack a 2D tile grid into a single int, cellBits per cell in row major order (first cell in the lowest bits)
+    The empty square is stored as 0
+    :param tiles: 2D list of tiles
+    :param board: BoardInfo for the grid size (looked up from the grid when not given)
+    :return: packed state, index of the empty cell
+    """
+    bits = (board or getBoardInfo(len(tiles))).cellBits
+    state = 0
+    blank = None
+    for index, val in enumerate(val for row in tiles for val in row):
+        if val == emptySquare:
+            blank = index
+        else:
+            state |= val << (index * bits)
+    return state, blank
+
+
+def unpackState(state, size=puzzleSize):
+    """
+    Expand a packed state back into a 2D tile grid (inverse of packTiles)
+    :param state: packed state
+    :param size: number of rows and cols
+    :return: 2D list of tiles
+    """
+    board = getBoardInfo(size)
+    tiles = []
+    for row in range(size):
+        line = []
+        for col in range(size):
+            val = (state >> ((row * size + col) * board.cellBits)) & board.cellMask
+            line.append(val if val else emptySquare)
+        tiles.append(line)
+    return tiles
+
+
+# tables for the default puzzleSize board
+defaultBoard = getBoardInfo(puzzleSize)
+cellBits = defaultBoard.cellBits
+cellMask = defaultBoard.cellMask
+moveOffsets = defaultBoard.moveOffsets
+packedMoves = defaultBoard.packedMoves
+solvedState, solvedBlank = defaultBoard.solvedState, defaultBoard.solvedBlank
+solvedTargetPosition = defaultBoard.targetPosition
+cityBlockTable = defaultBoard.cityBlockTable
+
+
+def movePacked(state, blank, target, bits=cellBits):
+    """
+    Slide the tile at cell index target into the empty cell at index blank
+    The empty cell holds 0, so xor-ing the tile into both cells swaps them
+    :param state: packed state
+    :param blank: index of the empty cell
+    :param target: index of the cell the empty square moves to (must be adjacent)
+    :param bits: bits per cell (BoardInfo.cellBits)
+    :return: new packed state (the empty square is now at target)
+    """
+    tile = (state >> (target * bits)) & ((1 << bits) - 1)
+    return state ^ (tile << (target * bits)) ^ (tile << (blank * bits))
+
+
+class PackedPuzzle(SearchNode):
+    """
+    Puzzle node whose board is a single packed int (cellBits per cell) plus the index of the empty cell
+    Moves are done with shifts and masks (no deepcopy), the solved check is an int compare
+    and the state can be used directly as a dict/set key.
+    The tiles attribute is still available for heuristics and printing, but it is rebuilt
+    from the packed state on each access (edits to the returned grid are not kept)
+    """
+
+    __slots__ = ('state', 'blank')
+
+    def __init__(self, tiles=None, parent=None, move=None, cost=0, state=None, blank=None, size=None, goal=None):
+        if parent:
+            self.board = parent.board
+        else:
+            self.board = getBoardInfo(len(tiles) if tiles else size or len(goal or ()) or puzzleSize, goal)
+        self.size = self.board.size
+
+        if state is None:  # build from a tile grid (or the solved board)
+            state, blank = packTiles(tiles, self.board) if tiles else (self.board.solvedState, self.board.solvedBlank)
+        self.state = state  # packed tiles
+        self.blank = blank  # cell index of the empty square
+        self.parent = parent
+        self.move = move
+
+        if parent:
+            self.cost = parent.cost + cost
+        else:
+            self.cost = cost
+
+        self.evalFunc = self.cost
+        self.heuristic = None
+        self.fullHeuristic = None
+        self.moveState = 0
+        self.heuristicKeys = None
+        SearchNode.totalNodes += 1
+
+    @property
+    def tiles(self):
+        return unpackState(self.state, self.size)
+
+    @tiles.setter
+    def tiles(self, tiles):
+        self.state, self.blank = packTiles(tiles, self.board)
+        self.heuristicKeys = None
+
+    def getKey(self):
+        return self.state
+
+    def getMovedTile(self):
+        return (self.parent.state >> (self.blank * self.board.cellBits)) & self.board.cellMask
+
+    def isPuzzleSolved(self):
+        return self.state == self.board.solvedState
+
+    def getPosition(self, target):
+        if target == emptySquare:
+            return divmod(self.blank, self.size)
+        board = self.board
+        for index in range(board.numCells):
+            if (self.state >> (index * board.cellBits)) & board.cellMask == target:
+                return divmod(index, self.size)
+
+    def getEmptyMoves(self):
+        return [move for move, target in self.board.packedMoves[self.blank]]
+
+    def moveEmpty(self, move):
+        target = self.blank + self.board.moveOffsets[move]
+        self.state = movePacked(self.state, self.blank, target, self.board.cellBits)
+        self.blank = target
+        self.heuristicKeys = None
+
+    def generateChildren(self, automaton=None):
+        children = []
+        bits = self.board.cellBits
+        nextStates = (automaton or getMoveAutomaton(inverseDepth)).next[self.moveState]
+        for move, target in self.board.packedMoves[self.blank]:
+            moveState = nextStates.get(move)
+            if moveState is None:  # pruned
+                continue
+            child = PackedPuzzle(None, self, move, 1, movePacked(self.state, self.blank, target, bits), target)
+            child.moveState = moveState
+            children.append(child)
+        return children
+
+
+def newSearchNode(tiles, goal=None):
+    """
+    Build the root node for a search: a PackedPuzzle when statePacking is enabled, else a list based Puzzle
+    :param tiles: starting board (2D list)
+    :param goal: goal board (2D list, defaults to tiles in order)
+    :return:
+    """
+    if statePacking:
+        return PackedPuzzle(tiles, goal=goal)
+    return Puzzle(tiles, None, None, 0, goal=goal)
+
+
+def newSolutionNode(tiles, moves, goal=None):
+    """
+    Build the chain of nodes for a solution found without keeping nodes (so printSolution and cost work)
+    :param tiles: starting board (2D list)
+    :param moves: moves of the empty square from the start to the goal
+    :param goal: goal board (2D list, defaults to tiles in order)
+    :return: last node of the chain
+    """
+    node = PackedPuzzle(tiles, goal=goal)
+    for move in moves:
+        target = node.blank + node.board.moveOffsets[move]
+        node = PackedPuzzle(None, node, move, 1, movePacked(node.state, node.blank, target, node.board.cellBits), target)
+    return node
+
 
 def heuristicCityBlock(puzzle: Puzzle):
     """
@@ -305,13 +613,12 @@ def heuristicCityBlock(puzzle: Puzzle):
     This is admissible since it never over-estimates the number of moves
     :return:
     """
-    start = time.time()
-
     # for each tile, count the number of moves to its intended position (assume no other tiles)
     sum = 0
-    for row in range(puzzleSize):
-        for col in range(puzzleSize):
-            val = puzzle.tiles[row][col]
+    tiles = puzzle.tiles
+    for row in range(puzzle.size):
+        for col in range(puzzle.size):
+            val = tiles[row][col]
             if val == emptySquare:
                 continue
             actRow, actCol = puzzle.getTargetPosition(val)
@@ -320,126 +627,284 @@ def heuristicCityBlock(puzzle: Puzzle):
                 print(f'{actRow=}, {actCol=}, {val=}, {dist=}')
             sum += dist
 
-    end = time.time()
-    runtime = end - start
-    utility.heuristicTime += runtime
-
     return sum
 
 
-def aStar(tiles, whichHeuristic):
+def cityBlockDelta(parentH, move, movedTile, child: Puzzle):
+    """
+    Incremental city block: a move only changes the distance of the tile that moved
+    The tile moved from the child's empty cell into the parent's empty cell
+    :param parentH: city block value of the parent
+    :param move: direction the empty square moved
+    :param movedTile: numbered tile that moved
+    :param child: node after the move
+    :return: city block value of the child
+    """
+    board = child.board
+    row, col = child.getEmptyPosition()
+    oldCell = row * board.size + col
+    newCell = oldCell - board.moveOffsets[move]
+    distances = board.cityBlockTable[movedTile]
+    return parentH - distances[oldCell] + distances[newCell]
+
+
+heuristicCityBlock.delta = cityBlockDelta
+
+
+def childHeuristic(whichHeuristic, parent: Puzzle, child: Puzzle, stats: SearchStats):
+    """
+    Return the heuristic value of a child node. When the heuristic has a delta function and the
+    parent value is known, only the change caused by the move is computed
+    :param whichHeuristic: heuristic function, optionally with a .delta(parentH, move, movedTile, child) attribute
+    :param parent: expanded node (parent.heuristic is its value)
+    :param child: node generated from parent
+    :param stats: stats of the search (counts and times the call)
+    :return:
+    """
+    delta = getattr(whichHeuristic, 'delta', None)
+    if delta is None or parent.heuristic is None:
+        child.heuristic = stats.evaluate(whichHeuristic, child)
+    else:
+        child.heuristic = stats.evaluate(delta, parent.heuristic, child.move, child.getMovedTile(), child)
+    return child.heuristic
+
+
+def lazyHeuristic(whichHeuristic, node: Puzzle, stats: SearchStats):
+    """
+    Return the full heuristic value of a node that was queued with only its cheap estimate (lazy aStar)
+    The parent was expanded, so its full value is known and the delta function can be used
+    :param whichHeuristic: expensive heuristic, optionally with a .delta attribute
+    :param node: node at the front of the open list
+    :param stats: stats of the search
+    :return:
+    """
+    delta = getattr(whichHeuristic, 'delta', None)
+    if delta is None or node.parent is None:
+        return stats.evaluate(whichHeuristic, node)
+    return stats.evaluate(delta, node.parent.fullHeuristic, node.move, node.getMovedTile(), node)
+
+
+def finishSearch(node, fLimit, count, moves, stats: SearchStats, status: SearchStatus):
+    """
+    Package a search's return value and add its heuristic time to utility.heuristicTime
+    :return: SearchResult (unpacks as node, fLimit, count, moves)
+    """
+    utility.heuristicTime += stats.heuristicNs / 1e9
+    return SearchResult(node, fLimit, count, moves, stats, status)
+
+
+def aStar(tiles, whichHeuristic, openList=None, lazy=False, perimeter=None, goal=None):
     """
     A* search
-    :return: Solution node (or None if no solution found), fLimit, nodes checked, moves
+    Expanded states are kept in a closed set keyed by the packed state. A state already on the open
+    list is only pushed again if the new path is cheaper; the older entry is skipped when popped (lazy deletion)
+    Expanded states are never reopened, so heuristics marked consistent = False raise ValueError
+    :param openList: open list class (BucketQueue or HeapQueue from open_list), defaults to openListType
+    :param lazy: queue children with the heuristic's cheap estimate (whichHeuristic.cheap) and only compute the
+        full heuristic when a node reaches the front of the open list, re-queueing it if its f goes up
+    :param perimeter: PerimeterTable of the boards near the goal (from perimeter), a node in it is queued with its
+        exact f and the search stops when it reaches the front of the open list
+    :param goal: board to solve to (2D list, defaults to tiles in order), heuristicCityBlock and heuristicMy
+        measure the distance to it (the pattern database and walking distance tables are for the usual goal and
+        raise ValueError for others)
+    :return: Solution node (or None if no solution found), fLimit, nodes checked, moves (stats in result.stats)
     """
     global count
     count = 0
     node = None
-    expanded = []
-    Q = PriorityQueue()
+    stats = SearchStats()
+    if not getattr(whichHeuristic, 'consistent', True):
+        raise ValueError('aStar does not reopen expanded states, use a consistent heuristic (or idaStar, rbfs)')
+    if perimeter is not None and goal is not None:
+        raise ValueError('A perimeter is built around the usual goal')
+    if perimeter is not None and packTiles(tiles, getBoardInfo(len(tiles)))[0] in perimeter:
+        node = perimeter.solutionNode(tiles, newSolutionNode(tiles, []))  # answered without searching
+        return finishSearch(node, None, count, node.cost, stats, SearchStatus.SOLVED)
+    expanded = set()  # keys of states that have been expanded
+    bestCost = {}  # cheapest cost found so far for each state that has been queued
+    Q = (openList or openListType)()
+    cheap = getattr(whichHeuristic, 'cheap', None) if lazy else None  # lower bound of whichHeuristic
     # get parent node
-    parentNode = Puzzle(tiles, None, None, 0)
+    parentNode = newSearchNode(tiles, goal)
     # Get huristic value in var 'estimate'
-    estimate = whichHeuristic(parentNode)
-    # put the parent node, node count, and heuristic value in the queue
-    Q.put((estimate, count, parentNode))
-    # heuristic_time = 0
+    estimate = stats.evaluate(whichHeuristic, parentNode)
+    parentNode.heuristic = estimate
+    if cheap:  # children are estimated from the parent's cheap value
+        parentNode.heuristic = stats.evaluate(cheap, parentNode)
+        parentNode.fullHeuristic = estimate
+    # put the parent node in the queue with its f value and cost
+    Q.put(estimate, parentNode.cost, parentNode)
+    bestCost[parentNode.getKey()] = parentNode.cost
 
     while not Q.empty():
         if count >= maxNodesPerSearch:
-            print('Max nodes exceeded, terminating search. Nodes checked: %d' % nodesChecked)
+            print('Max nodes exceeded, terminating search. Nodes checked: %d' % count)
             moves = node.cost
-            return None, None, count, moves
-        (nodeEstimate, nodeCount, node) = Q.get()
-
-        # append the expanded list with the state of the variable 'node'. Unbale to do so, idk why?
-        expanded.append(node.tiles)
+            return finishSearch(None, None, count, moves, stats, SearchStatus.NODE_LIMIT)
+        (nodeEstimate, nodeCost, node) = Q.get()
+
+        key = node.getKey()
+        if key in expanded or node.cost > bestCost[key]:
+            stats.duplicates += 1
+            continue  # stale queue entry, this state was reached more cheaply
+        if cheap and node.fullHeuristic is None:
+            # only the cheap estimate is known, compute the full one now that the node would be expanded
+            node.fullHeuristic = lazyHeuristic(whichHeuristic, node, stats)
+            stats.lazyEvaluated += 1
+            if node.cost + node.fullHeuristic > nodeEstimate:
+                stats.lazyRequeued += 1
+                Q.put(node.cost + node.fullHeuristic, node.cost, node)
+                continue
+        expanded.add(key)
         if node.isPuzzleSolved():
-            return node, None, count, node.cost
+            return finishSearch(node, None, count, node.cost, stats, SearchStatus.SOLVED)
+        if perimeter is not None and key in perimeter:
+            node = perimeter.solutionNode(tiles, node)
+            return finishSearch(node, None, count, node.cost, stats, SearchStatus.SOLVED)
         children = node.generateChildren()
+        stats.expand(node.cost)
+        stats.generated += len(children)
 
         for child in children:
-            if child.tiles not in expanded:
-                count += 1
-                # get new F value
-                # heuristicEst, runtime = whichHeuristic(child)
-                # estimate = child.cost + heuristicEst
-                # heuristic_time += runtime
-                estimate = child.cost + whichHeuristic(child)
-                Q.put((estimate, count, child))
-
-    return node, None, count, node.cost
+            childKey = child.getKey()
+            if childKey in expanded or bestCost.get(childKey, maxsize) <= child.cost:
+                stats.duplicates += 1
+                continue  # already expanded, or already queued with an equal or better cost
+            bestCost[childKey] = child.cost
+            count += 1
+            # get new F value
+            if cheap:
+                estimate = child.cost + childHeuristic(cheap, node, child, stats)
+                stats.lazyDeferred += 1
+            else:
+                estimate = child.cost + childHeuristic(whichHeuristic, node, child, stats)
+            if perimeter is not None and childKey in perimeter:
+                # exact distance (never below the heuristic), lazy aStar has nothing left to compute for it
+                child.fullHeuristic = perimeter.distance(childKey)
+                estimate = child.cost + child.fullHeuristic
+            Q.put(estimate, child.cost, child)
+        stats.updatePeaks(len(Q), len(expanded))
+
+    return finishSearch(node, None, count, node.cost, stats, SearchStatus.NO_SOLUTION)
 
 
 nodesChecked = 0  # global var to keep track of nodes checked in rbfs (both searches should reset at start)
 
 
-def rbfs(tiles, whichHeuristic):
+def rbfs(tiles, whichHeuristic, tableBytes=None, perimeter=None):
+    """
+    Recursive best first search, run without recursion: each level of the recursion is a frame
+    [node, fLimit, successors] on an explicit stack. Only the frames on the current path are kept,
+    so memory stays linear in the depth and the solution length is not capped by Python's recursion limit.
+    Successor entries are [f, position, child] lists; when a child's frame is popped its backed-up
+    f value replaces the entry's f in the parent frame.
+    Children that complete a redundant move sequence (move_pruning) are not generated.
+    With a transposition table, the value backed up from a child is remembered for its state, and a child
+    whose state is in the table starts from the remembered value instead of its heuristic.
+    :param tableBytes: memory budget of a TranspositionTable (no table when None)
+    :param perimeter: PerimeterTable of the boards near the goal (from perimeter), a child in it gets its exact f
+        and the search stops when it would be expanded
+    :return: Solution node (or None if no solution found), fLimit, nodes checked, moves (stats in result.stats,
+             SearchStatus in result.status)
+    """
     global nodesChecked
 
     nodesChecked = 0
+    stats = SearchStats()
+    if perimeter is not None and packTiles(tiles, getBoardInfo(len(tiles)))[0] in perimeter:
+        solution = perimeter.solutionNode(tiles, newSolutionNode(tiles, []))  # answered without searching
+        solution.printSolution()
+        return finishSearch(solution, None, nodesChecked, solution.cost, stats, SearchStatus.SOLVED)
+    automaton = getMoveAutomaton()  # rbfs has no duplicate detection, so longer redundant sequences are skipped too
+    table = TranspositionTable(automaton, tableBytes) if tableBytes else None
+
+    root = newSearchNode(tiles)
+    root.heuristic = stats.evaluate(whichHeuristic, root)
+    root.evalFunc = root.cost + root.heuristic
+
+    stack = [[root, maxsize, None]]
+    held = 0  # nodes held in the successor lists of the frames on the stack
+    backedUp = None  # f value returned by the last popped frame
+    solution = None
+    status = SearchStatus.NO_SOLUTION
+
+    while stack:
+        frame = stack[-1]
+        (node, fLimit, successors) = frame
+
+        if successors is None:  # first visit to this frame: expand the node
+            if node.isPuzzleSolved():
+                solution = node
+                status = SearchStatus.SOLVED
+                break
+            if perimeter is not None and node.getKey() in perimeter:
+                solution = perimeter.solutionNode(tiles, node)
+                status = SearchStatus.SOLVED
+                break
+
+            nodesChecked += 1
+            if nodesChecked >= maxNodesPerSearch:
+                print('Max nodes exceeded, terminating search. Nodes checked: %d' % nodesChecked)
+                status = SearchStatus.NODE_LIMIT
+                break
+
+            children = node.generateChildren(automaton)
+            stats.expand(node.cost)
+            stats.generated += len(children)
+
+            successors = []
+            for childPos, child in enumerate(children):  # childPos separates nodes with the same f value
+                entry = table.get(child.getKey(), child.moveState) if table is not None else None
+                if entry:
+                    stats.tableHits += 1
+                    child.heuristic = entry[0]
+                    estimate = child.cost + max(entry)
+                else:
+                    if table is not None:
+                        stats.tableMisses += 1
+                    estimate = child.cost + childHeuristic(whichHeuristic, node, child, stats)
+                if perimeter is not None:
+                    distance = perimeter.distance(child.getKey())
+                    if distance is not None:  # exact, a table bound can be higher (it only covers the pruned subtree)
+                        estimate = max(estimate, child.cost + distance)
+                # a child can not be better than the value backed up into its parent
+                child.evalFunc = max(estimate, node.evalFunc)
+                successors.append([child.evalFunc, childPos, child])
+
+                if debug:
+                    print("\t%s estimate = %d, cost = %d" % (child.move, estimate, child.cost))
+                    child.print()
+
+            frame[2] = successors
+            held += len(successors)
+            stats.updatePeaks(held)
+        else:  # returned from the best child: store its backed-up value
+            successors[0][0] = backedUp
+            successors[0][2].evalFunc = backedUp
+
+        if not successors:
+            backedUp = maxsize
+            stack.pop()
+            if table is not None:
+                table.store(node.getKey(), node.moveState, node.heuristic, backedUp)
+            continue
 
-    puzzle = Puzzle(tiles, None, None, 0)
-
-    try:
-        (node, fLimit) = rbfsMain(puzzle, maxsize, whichHeuristic)
-    except Exception:
-        node = None
-
-    if node:
-        node.printSolution()
-        return (node, fLimit, nodesChecked, node.cost)
-    else:
-        print("No solution found")
-        return (None, maxsize, nodesChecked, 0)
-
-
-def rbfsMain(node, fLimit, whichHeuristic):
-    global nodesChecked
-    successors = []
-    # result = None
-
-    # if debug:
-    #     print('rbfsMain flimit=%d, move=%s:' % (fLimit, node.move))
-    #     node.print()
-
-    if node.isPuzzleSolved():
-        return node, None
-
-    nodesChecked += 1
-    if nodesChecked >= maxNodesPerSearch:
-        print('Max nodes exceeded, terminating search. Nodes checked: %d' % nodesChecked)
-        raise Exception('node limit exceeded')
-
-    children = node.generateChildren()
-    if len(children) == 0:
-        return None, maxsize
-
-    childPos = 0  # used to differentiate between nodes with the same f value
-
-    for child in children:
-        childPos += 1
-        estimate = child.cost + whichHeuristic(child)
-        successors.append((estimate, childPos, child))
-        child.evalFunc = estimate
-
-        if debug:
-            print("\t%s estimate = %d, cost = %d" % (child.move, estimate, child.cost))
-            child.print()
-
-    while len(successors) > 0:
         successors.sort()
         (bestF, bestPos, bestNode) = successors[0]
-        if bestNode.evalFunc > fLimit:
-            return None, bestNode.evalFunc
-
-        (altF, altPos, altNode) = successors[1]
-        minF = min(fLimit, altF)
-
-        (result, bestNode.evalFunc) = rbfsMain(bestNode, minF, whichHeuristic)
-        successors[0] = (bestNode.evalFunc, bestPos, bestNode)
-
-        if result != None:
-            break
-
-    return result, None
+        if bestF > fLimit:  # every successor is over the limit: back up the best value to the parent
+            backedUp = bestF
+            held -= len(successors)
+            stack.pop()
+            if table is not None:
+                table.store(node.getKey(), node.moveState, node.heuristic, backedUp - node.cost)
+            continue
+
+        altF = successors[1][0] if len(successors) > 1 else maxsize  # next best alternative
+        stack.append([bestNode, min(fLimit, altF), None])
+
+    if solution:
+        solution.printSolution()
+        return finishSearch(solution, None, nodesChecked, solution.cost, stats, status)
+    else:
+        print("No solution found")
+        return finishSearch(None, maxsize, nodesChecked, 0, stats, status)
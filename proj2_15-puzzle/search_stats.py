@@ -0,0 +1,155 @@
+#!/usr/bin/python3
+
+# AI 531 - Project 2 - 15 Puzzle
+# Search statistics
+
+from enum import Enum
+from time import perf_counter_ns
+
+timingSampleRate = 16  # time one heuristic call out of this many (1 = time every call)
+
+
+class SearchStats:
+    """
+    Counters for one solve. Searches call expand() for every expanded node and evaluate() for every
+    heuristic value they compute. Only one heuristic call in sampleRate is timed and the total is
+    scaled up from the samples, so the clock is rarely read on the hot path.
+    """
+
+    def __init__(self, sampleRate=timingSampleRate):
+        self.expanded = 0  # nodes expanded (children generated from them)
+        self.generated = 0  # child nodes created
+        self.duplicates = 0  # children dropped (or queue entries skipped) because the state was already seen
+        self.pruned = 0  # nodes dropped from memory to stay within a memory budget (smaStar)
+        self.lazyDeferred = 0  # children queued with only the cheap heuristic (lazy aStar)
+        self.lazyEvaluated = 0  # of those, nodes that reached the front and got the full heuristic
+        self.lazyRequeued = 0  # nodes queued again because the full heuristic raised their f
+        self.tableHits = 0  # transposition table lookups that found the state (rbfs/idaStar)
+        self.tableMisses = 0  # transposition table lookups that did not
+        self.dualSwitches = 0  # times dual search carried on from the dual state (idaStar)
+        self.peakOpen = 0  # most nodes waiting to be expanded at one time (for rbfs/idaStar: nodes held in memory)
+        self.peakClosed = 0  # most expanded states kept at one time
+        self.depthExpansions = []  # depthExpansions[g] = nodes expanded at depth g
+        self.heuristicCalls = 0  # heuristic values computed (full or delta)
+        self.sampleRate = sampleRate
+        self.sampledCalls = 0  # heuristic calls that were timed
+        self.sampledNs = 0  # time spent in the timed calls
+        self.untilSample = 0  # calls left before the next timed one
+        self.lowerBound = None  # proven lower bound on the optimal solution cost (bounded-suboptimal searches)
+        self.suboptimality = None  # solution cost / lowerBound, the solution is at most this factor from optimal
+
+    def expand(self, depth):
+        """
+        Count an expansion at the given depth
+        :param depth: cost of the expanded node
+        :return:
+        """
+        self.expanded += 1
+        histogram = self.depthExpansions
+        while len(histogram) <= depth:
+            histogram.append(0)
+        histogram[depth] += 1
+
+    def evaluate(self, func, *args):
+        """
+        Call a heuristic (or its delta) and time it if this call is a sample
+        :param func: heuristic function
+        :param args: arguments for func
+        :return: func's value
+        """
+        self.heuristicCalls += 1
+        if self.untilSample:
+            self.untilSample -= 1
+            return func(*args)
+
+        self.untilSample = self.sampleRate - 1
+        start = perf_counter_ns()
+        value = func(*args)
+        self.sampledNs += perf_counter_ns() - start
+        self.sampledCalls += 1
+        return value
+
+    def merge(self, other):
+        """
+        Add the counts of another SearchStats (e.g. from a worker process) to this one
+        Peaks are added as well, so they are the most memory used if every worker peaked at the same time
+        :param other:
+        :return:
+        """
+        for name in ['expanded', 'generated', 'duplicates', 'pruned', 'lazyDeferred', 'lazyEvaluated', 'lazyRequeued',
+                     'tableHits', 'tableMisses', 'dualSwitches', 'peakOpen', 'peakClosed', 'heuristicCalls', 'sampledCalls', 'sampledNs']:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        while len(self.depthExpansions) < len(other.depthExpansions):
+            self.depthExpansions.append(0)
+        for depth, expanded in enumerate(other.depthExpansions):
+            self.depthExpansions[depth] += expanded
+
+    def updatePeaks(self, openSize, closedSize=0):
+        if openSize > self.peakOpen:
+            self.peakOpen = openSize
+        if closedSize > self.peakClosed:
+            self.peakClosed = closedSize
+
+    @property
+    def lazyAvoided(self):
+        """
+        Full heuristic evaluations lazy aStar did not need (children that never reached the front of the open list)
+        :return:
+        """
+        return self.lazyDeferred - self.lazyEvaluated
+
+    @property
+    def tableHitRate(self):
+        """
+        Fraction of transposition table lookups that found the state (0 if the table was not used)
+        :return:
+        """
+        lookups = self.tableHits + self.tableMisses
+        return self.tableHits / lookups if lookups else 0
+
+    @property
+    def heuristicNs(self):
+        """
+        Estimated nanoseconds spent computing heuristics (sampled time scaled to all calls)
+        :return:
+        """
+        if not self.sampledCalls:
+            return 0
+        return self.sampledNs * self.heuristicCalls // self.sampledCalls
+
+    def __str__(self):
+        text = 'expanded=%d, generated=%d, duplicates=%d, peakOpen=%d, peakClosed=%d, heuristicCalls=%d, ' \
+               'heuristicTime=%.6fs' % (self.expanded, self.generated, self.duplicates, self.peakOpen,
+                                        self.peakClosed, self.heuristicCalls, self.heuristicNs / 1e9)
+        if self.lazyDeferred:
+            text += ', lazyAvoided=%d, lazyRequeued=%d' % (self.lazyAvoided, self.lazyRequeued)
+        if self.tableHits or self.tableMisses:
+            text += ', tableHits=%d, tableMisses=%d, tableHitRate=%.3f' % (self.tableHits, self.tableMisses,
+                                                                          self.tableHitRate)
+        if self.dualSwitches:
+            text += ', dualSwitches=%d' % self.dualSwitches
+        if self.suboptimality is not None:
+            text += ', lowerBound=%d, suboptimality=%.3f' % (self.lowerBound, self.suboptimality)
+        return text
+
+
+class SearchStatus(Enum):
+    """
+    How a search ended
+    """
+    SOLVED = 'solved'  # goal reached
+    NODE_LIMIT = 'node limit'  # gave up after maxNodesPerSearch nodes
+    NO_SOLUTION = 'no solution'  # search space exhausted without reaching the goal
+
+
+class SearchResult(tuple):
+    """
+    Return value of the searches: unpacks as (node, fLimit, count, moves) like before,
+    with the SearchStats of the solve in result.stats and how it ended in result.status
+    """
+
+    def __new__(cls, node, fLimit, count, moves, stats=None, status=None):
+        result = super().__new__(cls, (node, fLimit, count, moves))
+        result.stats = stats
+        result.status = status
+        return result
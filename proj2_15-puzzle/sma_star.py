@@ -0,0 +1,174 @@
+#!/usr/bin/python3
+
+# AI 531 - Project 2 - 15 Puzzle
+# Simplified memory-bounded A*
+
+import heapq
+import sys
+
+import puzzle as puzzleModule
+from puzzle import PackedPuzzle, newSearchNode, childHeuristic, finishSearch
+from search_stats import SearchStats, SearchStatus
+
+"""
+SMA* keeps at most memoryLimit nodes of the search tree in memory. It expands the best leaf like A*, and
+when memory is full it drops the worst leaf (highest f, shallowest) and remembers its f in the parent,
+so the parent's f is backed up from all of its children, in memory or not. A parent whose dropped child
+looks best again regenerates that child. The search returns an optimal solution (for an admissible
+heuristic) as long as the solution path fits in memory, it just does more work the smaller the budget.
+Children that undo the last move are not generated. The longer redundant move sequences (move_pruning) are not
+skipped: with them the search could keep dropping and regenerating the same subtrees when memory barely fits.
+"""
+
+smaMemoryLimit = None  # default number of nodes smaStar may keep in memory (None: puzzle.maxNodesPerSearch)
+infinity = float('inf')  # f of nodes that cannot lead to a solution within the memory limit
+
+
+class SmaNode:
+    """
+    Search tree node of smaStar, wraps a puzzle node
+    """
+
+    __slots__ = ('puzzle', 'f', 'parent', 'depth', 'children', 'forgotten', 'version', 'inMemory')
+
+    def __init__(self, puzzle, f, parent=None):
+        self.puzzle = puzzle
+        self.f = f  # backed up f: lowest f of the children (in memory or forgotten) once expanded
+        self.parent = parent
+        self.depth = parent.depth + 1 if parent else 0
+        self.children = []  # children in memory
+        self.forgotten = {}  # move -> f of children dropped from memory
+        self.version = 0  # bumped when the node's queue keys change, older queue entries are skipped
+        self.inMemory = True
+
+    def openKey(self):
+        """
+        Return the f the node is ranked by when choosing what to expand next
+        Leaves use their own f, expanded nodes the best forgotten child they can regenerate (None if none)
+        :return:
+        """
+        if not self.children:
+            return self.f
+        if self.forgotten:
+            return min(self.forgotten.values())
+        return None
+
+
+def estimateNodeBytes(tiles):
+    """
+    Rough memory used by one smaStar node (the SmaNode, its puzzle node and their containers)
+    :param tiles:
+    :return:
+    """
+    puzzle = newSearchNode(tiles)
+    node = SmaNode(puzzle, 0)
+    size = sys.getsizeof(node) + sys.getsizeof(node.children) + sys.getsizeof(node.forgotten) + sys.getsizeof(puzzle)
+    if isinstance(puzzle, PackedPuzzle):
+        size += sys.getsizeof(puzzle.state)
+    else:
+        size += sys.getsizeof(puzzle.tiles) + sum(sys.getsizeof(row) for row in puzzle.tiles)
+    return size
+
+
+def smaStar(tiles, whichHeuristic, memoryLimit=None, memoryBytes=None):
+    """
+    SMA* search
+    :param memoryLimit: most nodes kept in memory (defaults to smaMemoryLimit, else puzzle.maxNodesPerSearch)
+    :param memoryBytes: memory budget in bytes instead of nodes (converted with estimateNodeBytes)
+    :return: Solution node (or None if no solution fits in memory), fLimit, nodes generated, moves
+    """
+    if memoryLimit is None:
+        memoryLimit = memoryBytes // estimateNodeBytes(tiles) if memoryBytes else \
+            smaMemoryLimit or puzzleModule.maxNodesPerSearch
+    memoryLimit = max(memoryLimit, 2)
+    stats = SearchStats()
+    count = 0  # nodes generated (including regenerated ones)
+    counter = 0  # insertion counter for queue ties
+    best = []  # heap of (key, -depth, -counter, version, node): lowest f first, deepest among ties
+    worst = []  # heap of (-f, depth, counter, version, node) for leaves: highest f first, shallowest among ties
+
+    def queue(node):
+        nonlocal counter
+        node.version += 1
+        counter += 1
+        key = node.openKey()
+        if key is not None:
+            heapq.heappush(best, (key, -node.depth, -counter, node.version, node))
+        if not node.children and node.parent:  # the root is never dropped
+            heapq.heappush(worst, (-node.f, node.depth, counter, node.version, node))
+
+    puzzle = newSearchNode(tiles)
+    puzzle.heuristic = stats.evaluate(whichHeuristic, puzzle)
+    root = SmaNode(puzzle, puzzle.heuristic)
+    queue(root)
+    used = 1
+
+    while best:
+        (key, negDepth, negCount, version, node) = heapq.heappop(best)
+        if not node.inMemory or version != node.version:
+            continue  # dropped or re-queued since this entry was pushed
+        if key == infinity:
+            break  # every remaining path is longer than memory allows
+        if not node.children and node.puzzle.isPuzzleSolved():
+            return finishSearch(node.puzzle, node.f, count, node.puzzle.cost, stats, SearchStatus.SOLVED)
+
+        # generate all children of a leaf, or regenerate the best forgotten child of an expanded node
+        if node.children:
+            moves = [min(node.forgotten, key=node.forgotten.get)]
+        else:
+            moves = None
+            stats.expand(node.depth)
+        for child in node.puzzle.generateChildren():
+            if moves is not None and child.move not in moves:
+                continue
+            count += 1
+            stats.generated += 1
+            f = max(child.cost + childHeuristic(whichHeuristic, node.puzzle, child, stats),
+                    node.forgotten.pop(child.move, node.f))  # f never drops below what was backed up
+            if child.cost >= memoryLimit - 1 and not child.isPuzzleSolved():
+                f = infinity  # path would not fit in memory
+            node.children.append(SmaNode(child, f, node))
+            used += 1
+
+        if not node.children and not node.forgotten:
+            node.f = infinity  # dead end
+        backUp(node)
+        queue(node)
+        for child in node.children:
+            if child.version == 0:
+                queue(child)
+
+        # drop the worst leaves until the tree fits in memory again
+        while used > memoryLimit:
+            (negF, depth, order, version, leaf) = heapq.heappop(worst)
+            if not leaf.inMemory or version != leaf.version or leaf.children:
+                continue
+            parent = leaf.parent
+            parent.children.remove(leaf)
+            parent.forgotten[leaf.puzzle.move] = leaf.f
+            leaf.inMemory = False
+            used -= 1
+            stats.pruned += 1
+            queue(parent)
+        stats.updatePeaks(len(best), used)
+
+    print("No solution found within %d nodes of memory" % memoryLimit)
+    return finishSearch(None, infinity, count, 0, stats, SearchStatus.NO_SOLUTION)
+
+
+def backUp(node):
+    """
+    Update f values from a node up to the root: each node's f is the lowest f of its children in memory
+    and forgotten children (never below its own estimate)
+    :param node:
+    :return:
+    """
+    while node:
+        fs = [child.f for child in node.children] + list(node.forgotten.values())
+        if not fs:
+            return
+        f = min(fs)
+        if f <= node.f:
+            return
+        node.f = f
+        node = node.parent
@@ -0,0 +1,164 @@
+#!/usr/bin/python3
+
+# AI 531 - Project 2 - 15 Puzzle
+# Reflected and dual heuristic lookups
+
+from puzzle import Puzzle, PackedPuzzle, packTiles, movePacked, reverseMoves
+
+"""
+A table-driven heuristic gives one value per board, but two other boards are known to be exactly as far
+from the goal, and their values are also lower bounds:
+
+The reflection about the main diagonal: cell (row, col) goes to (col, row) and the tile that belongs on
+(row, col) is replaced by the one that belongs on (col, row). The goal (and its empty square in the corner)
+is its own reflection and moves map to moves, so the reflected board needs the same number of moves.
+
+The dual board: a board is a permutation of the cells, the dual is its inverse. Where the board has tile t on
+cell c, the dual has the tile that belongs on c on the goal cell of t. When the empty square is on its goal
+cell, a solution of the dual is a solution of the board with its moves reversed and undone, so both need
+the same number of moves. With the empty square elsewhere that is not true, so the lookup moves the empty
+square home first (right, then down) and takes the moves that took off the dual's value.
+
+symmetricHeuristic(h) returns the max of the three lookups. The reflected value of a heuristic that is
+consistent is consistent, so max(regular, reflected) can be used by any search. Dual values are admissible but
+not consistent (they can drop by more than one between a parent and a child), so with dual lookups use a
+search that does not close states (idaStar, rbfs): the heuristic is marked consistent = False and aStar and
+arenaAStar refuse it.
+
+Dual search (idaStar(..., dualSearch=True)) goes further: when the empty square is home and the dual board
+has the higher heuristic value, the search carries on from the dual board, and the moves found from there are
+reversed and undone when the solution is put together.
+
+Both are for the usual goal (tiles in order, empty square last).
+"""
+
+dualMarker = None  # entry in a searched path where the search switched to the dual board
+
+symmetryTables = {}  # board size -> (cell -> reflected cell, tile -> reflected tile)
+
+
+def getSymmetryTables(board):
+    """
+    Return the reflection tables of a board size, building them on first use
+    :param board: BoardInfo of the puzzle
+    :return: (cell -> reflected cell, tile -> reflected tile)
+    """
+    tables = symmetryTables.get(board.size)
+    if tables is None:
+        size = board.size
+        cells = [col * size + row for row in range(size) for col in range(size)]
+        tiles = [0] + [cells[tile - 1] + 1 for tile in range(1, board.numCells)]  # tile t belongs on cell t - 1
+        tables = symmetryTables[board.size] = (cells, tiles)
+    return tables
+
+
+def reflectState(state, board):
+    """
+    Reflect a packed board about the main diagonal
+    :param state: packed tiles
+    :param board: BoardInfo of the puzzle
+    :return: packed tiles of the reflected board
+    """
+    cells, tiles = getSymmetryTables(board)
+    bits = board.cellBits
+    mask = board.cellMask
+    reflected = 0
+    for cell in range(board.numCells):
+        reflected |= tiles[(state >> (cell * bits)) & mask] << (cells[cell] * bits)
+    return reflected
+
+
+def dualState(state, board):
+    """
+    Return the dual of a packed board (the inverse permutation), the same number of moves from the goal when
+    the empty square is on its goal cell
+    :param state: packed tiles
+    :param board: BoardInfo of the puzzle
+    :return: packed tiles of the dual board
+    """
+    bits = board.cellBits
+    mask = board.cellMask
+    blank = board.solvedBlank
+    dual = 0
+    for cell in range(board.numCells):
+        tile = (state >> (cell * bits)) & mask
+        goal = tile - 1 if tile else blank
+        dual |= (cell + 1 if cell != blank else 0) << (goal * bits)
+    return dual
+
+
+def blankHome(state, blank, board):
+    """
+    Move the empty square to its goal cell, along its row then down its column
+    :param state: packed tiles
+    :param blank: cell of the empty square
+    :param board: BoardInfo of the puzzle
+    :return: packed tiles after the moves, number of moves made
+    """
+    size = board.size
+    goalRow, goalCol = divmod(board.solvedBlank, size)
+    moves = 0
+    while blank % size != goalCol:
+        target = blank + (1 if blank % size < goalCol else -1)
+        state = movePacked(state, blank, target, board.cellBits)
+        blank = target
+        moves += 1
+    while blank // size != goalRow:
+        target = blank + (size if blank // size < goalRow else -size)
+        state = movePacked(state, blank, target, board.cellBits)
+        blank = target
+        moves += 1
+    return state, moves
+
+
+def symmetricHeuristic(whichHeuristic, reflected=True, dual=True):
+    """
+    Return a heuristic that is the max of whichHeuristic's regular, reflected and dual lookups
+    :param whichHeuristic: admissible heuristic for the usual goal (heuristicPDB, heuristicWalkingDistance, ...)
+    :param reflected: include the lookup of the reflected board
+    :param dual: include the lookup of the dual board (makes the heuristic inconsistent)
+    :return: heuristic function (with .cheap for lazy aStar when it is consistent)
+    """
+
+    def heuristic(puzzle: Puzzle):
+        board = puzzle.board
+        if not board.usualGoal:
+            raise ValueError('Reflected and dual lookups are for the usual goal')
+        if isinstance(puzzle, PackedPuzzle):
+            state, blank = puzzle.state, puzzle.blank
+        else:
+            state, blank = packTiles(puzzle.tiles, board)
+        h = whichHeuristic(puzzle)
+        if reflected:
+            cells, tiles = getSymmetryTables(board)
+            h = max(h, whichHeuristic(PackedPuzzle(None, None, None, 0, reflectState(state, board), cells[blank],
+                                                   board.size)))
+        if dual:
+            home, moves = blankHome(state, blank, board)
+            h = max(h, whichHeuristic(PackedPuzzle(None, None, None, 0, dualState(home, board), board.solvedBlank,
+                                                   board.size)) - moves)
+        return h
+
+    heuristic.__name__ = 'symmetric_' + whichHeuristic.__name__
+    heuristic.consistent = not dual  # searches with a closed set need a consistent heuristic
+    if not dual:
+        heuristic.cheap = whichHeuristic  # lower bound used to queue children in lazy aStar
+    return heuristic
+
+
+def undoDualSwitches(path):
+    """
+    Turn a path searched with dual search into the moves that solve the start board: the moves after each
+    switch solve the dual board, so they are reversed and undone
+    :param path: moves with dualMarker where the search switched boards
+    :return: moves of the empty square from the start to the goal
+    """
+    moves = []
+    segment = []
+    for move in reversed(path):
+        if move is dualMarker:
+            moves = [reverseMoves[move] for move in reversed(segment + moves)]
+            segment = []
+        else:
+            segment.insert(0, move)
+    return segment + moves
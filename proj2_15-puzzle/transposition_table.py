@@ -0,0 +1,100 @@
+#!/usr/bin/python3
+
+# AI 531 - Project 2 - 15 Puzzle
+# Transposition table for rbfs and idaStar
+
+import sys
+
+from array import array
+
+"""
+rbfs and idaStar keep no record of the states they have searched, so every time they come back to a
+state (rbfs after backtracking, idaStar in every iteration) the whole subtree below it is searched again
+from its heuristic value. A TranspositionTable remembers, for a state, its heuristic value and the best
+lower bound on the moves still needed from it that a search backed up (backed-up f minus the cost of the
+path that led to the state). A search that meets the state again starts from that bound instead.
+
+The table has a fixed number of slots (a power of two that fits the memory budget) and no chaining: a
+state hashes to one slot. A new entry replaces another state's entry only if its bound is at least as
+high, so entries for states whose subtrees were searched deeper are kept (depth-preferred replacement).
+
+Both searches skip redundant move sequences (move_pruning), which makes the subtree below a state depend
+on the moves that led to it, so entries are keyed by the packed state and the automaton state together
+(the automaton state in the low bits of one int).
+"""
+
+entryBytes = 64  # estimated memory per slot: the key int, its list pointer and the value arrays
+transpositionBytes = 64 * 1024 * 1024  # default memory budget of a table
+unsolvable = (1 << 31) - 1  # stored bound of a state with no solution below it (sys.maxsize does not fit)
+hashMultiplier = 0x9E3779B97F4A7C15  # Fibonacci hashing, as in node_arena
+hashMask = (1 << 64) - 1
+
+
+class TranspositionTable:
+    """
+    Fixed-size table of (heuristic, backed-up bound) entries keyed by (packed state, automaton state)
+    """
+
+    def __init__(self, automaton, memoryBytes=None, entries=None):
+        """
+        :param automaton: MoveAutomaton the search skips moves with
+        :param memoryBytes: memory budget (defaults to transpositionBytes), ignored when entries is given
+        :param entries: number of slots (rounded down to a power of two)
+        """
+        self.moveStateBits = (len(automaton) - 1).bit_length()
+        if entries is None:
+            entries = (memoryBytes or transpositionBytes) // entryBytes
+        self.tableBits = max(entries.bit_length() - 1, 1)
+        size = 1 << self.tableBits
+        self.keys = [None] * size
+        self.heuristics = array('i', [0]) * size
+        self.bounds = array('i', [0]) * size
+        self.used = 0  # slots holding an entry
+        self.replaced = 0  # entries overwritten by another state's entry
+        self.rejected = 0  # entries not stored because the slot held a deeper one
+
+    def __len__(self):
+        return len(self.keys)
+
+    def slot(self, key):
+        return ((hash(key) * hashMultiplier) & hashMask) >> (64 - self.tableBits)
+
+    def get(self, state, moveState):
+        """
+        Return the entry stored for a state
+        :param state: packed state
+        :param moveState: automaton state of the moves that led to it
+        :return: (heuristic, bound) or None if the state is not in the table, bound is sys.maxsize if unsolvable
+        """
+        key = state << self.moveStateBits | moveState
+        slot = self.slot(key)
+        if self.keys[slot] != key:
+            return None
+        bound = self.bounds[slot]
+        return self.heuristics[slot], sys.maxsize if bound == unsolvable else bound
+
+    def store(self, state, moveState, heuristic, bound):
+        """
+        Remember a state's heuristic value and backed-up bound, unless its slot holds a deeper entry
+        :param state: packed state
+        :param moveState: automaton state of the moves that led to it
+        :param heuristic: heuristic value of the state
+        :param bound: lower bound on the moves from the state to the goal (sys.maxsize or more if unsolvable)
+        :return:
+        """
+        key = state << self.moveStateBits | moveState
+        slot = self.slot(key)
+        bound = min(bound, unsolvable)
+        old = self.keys[slot]
+        if old is None:
+            self.used += 1
+        elif old != key:
+            if self.bounds[slot] > bound:
+                self.rejected += 1
+                return
+            self.replaced += 1
+        elif self.bounds[slot] > bound:
+            return  # already knows more about this state
+        self.keys[slot] = key
+        self.heuristics[slot] = heuristic
+        self.bounds[slot] = bound
@@ -0,0 +1,284 @@
+#!/usr/bin/python3
+
+# AI 531 - Project 2 - 15 Puzzle
+# Walking distance heuristic
+
+import os
+import sys
+import time
+
+from collections import deque
+from pattern_database import pdbDirectory
+from puzzle import Puzzle, PackedPuzzle, puzzleSize, packTiles, movePacked, heuristicCityBlock, moveU, moveD
+
+"""
+Walking distance (WD) splits the puzzle into two abstractions. The row abstraction only keeps, for each row,
+how many of its tiles belong in each goal row, and which row the empty square is in. A move of the empty
+square up or down takes one tile into the empty square's row, left and right moves do nothing. The exact
+number of moves to reach the goal in this abstraction is found for every abstract state with one breadth
+first search from the goal. The column abstraction is the same with rows and columns swapped, and since the
+goal is symmetric (empty square in the last row and column) it uses the same table.
+
+Vertical moves only count in the row abstraction and horizontal moves in the column one, so the two values
+can be added: WD = WD(rows) + WD(cols). It is admissible and never below the city block distance, since
+every tile needs at least its vertical distance in moves of the row abstraction.
+
+An abstract state is stored as an int key: countBits per (row, goal row) count and the empty square's
+row in the highest bits. The table of every board size is written once to pdbDirectory (each key in
+keyBytes(size) bytes followed by a byte of its distance, 200KB for 4x4) and loaded from there the first time
+the heuristic is used on that board size.
+
+Computing both keys of a board looks at every cell, so the heuristic leaves them on the node
+(heuristicKeys) and the delta function makes a child's keys from its parent's by changing the one
+abstraction the move touches, which makes a child's value O(1) instead of O(cells).
+"""
+
+countBits = 3  # bits per (row, goal row) count in a key, counts go up to the board size
+maxWalkingSize = (1 << countBits) - 1  # largest board size whose counts fit in countBits
+
+walkingTables = {}  # board size -> WalkingDistanceTable
+
+
+class WalkingDistanceTable:
+    """
+    Walking distance of every abstract state for one board size, and the key contribution of each
+    tile on each cell (units[tile][cell], tile 0 is the empty square) for the row and column abstractions
+    """
+
+    def __init__(self, size, distances):
+        self.size = size
+        self.distances = distances  # key -> moves to the goal in the abstraction
+        blankShift = countBits * size * size
+        self.rowUnits = [[row << blankShift for row in range(size) for col in range(size)]]
+        self.colUnits = [[col << blankShift for row in range(size) for col in range(size)]]
+        for tile in range(1, size * size):
+            goalRow, goalCol = divmod(tile - 1, size)
+            self.rowUnits.append([1 << (countBits * (row * size + goalRow)) for row in range(size)
+                                  for col in range(size)])
+            self.colUnits.append([1 << (countBits * (col * size + goalCol)) for row in range(size)
+                                  for col in range(size)])
+
+
+def goalKey(size):
+    """
+    Key of the solved board: every row holds its own tiles, the empty square is in the last row
+    :param size: number of rows and cols of the board
+    :return:
+    """
+    key = (size - 1) << (countBits * size * size)
+    for row in range(size):
+        key += (size - 1 if row == size - 1 else size) << (countBits * (row * size + row))
+    return key
+
+
+def keyBytes(size):
+    """
+    Number of bytes a key takes in a table file
+    :param size: number of rows and cols of the board
+    :return:
+    """
+    return (countBits * size * size + (size - 1).bit_length() + 7) // 8
+
+
+def buildWalkingDistance(size=puzzleSize):
+    """
+    Breadth first search from the goal over the abstract states of the row abstraction
+    :param size: number of rows and cols of the board
+    :return: dict key -> walking distance
+    """
+    if size > maxWalkingSize:
+        raise ValueError('Walking distance supports boards up to %dx%d' % (maxWalkingSize, maxWalkingSize))
+    blankShift = countBits * size * size
+    countMask = (1 << countBits) - 1
+    start = goalKey(size)
+    distances = {start: 0}
+    queue = deque([start])
+
+    while queue:
+        key = queue.popleft()
+        dist = distances[key] + 1
+        blankRow = key >> blankShift
+        for row in (blankRow - 1, blankRow + 1):
+            if row < 0 or row >= size:
+                continue
+            # a tile of goal row goal moves from row into the empty square's row, the empty square to row
+            for goal in range(size):
+                shift = countBits * (row * size + goal)
+                if (key >> shift) & countMask == 0:
+                    continue
+                child = key - (1 << shift) + (1 << (countBits * (blankRow * size + goal))) + \
+                    ((row - blankRow) << blankShift)
+                if child not in distances:
+                    distances[child] = dist
+                    queue.append(child)
+
+    return distances
+
+
+def walkingFilename(size=puzzleSize, directory=None):
+    """
+    Return the file a board size's walking distance table is stored in
+    :param size: number of rows and cols of the board
+    :param directory: table directory (defaults to pdbDirectory)
+    :return:
+    """
+    return os.path.join(directory or pdbDirectory, 'wd%dx%d.bin' % (size, size))
+
+
+def writeWalkingDistance(size=puzzleSize, directory=None):
+    """
+    Build the table for a board size and write it to disk, one (key, distance) entry per abstract state
+    :param size: number of rows and cols of the board
+    :param directory: table directory (defaults to pdbDirectory)
+    :return: filename written
+    """
+    filename = walkingFilename(size, directory)
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    distances = buildWalkingDistance(size)
+    with open(filename + '.tmp', 'wb') as fh:  # write then rename so a partial file is never loaded
+        width = keyBytes(size)
+        for key, dist in distances.items():
+            fh.write(key.to_bytes(width, 'little'))
+            fh.write(bytes((dist,)))
+    os.replace(filename + '.tmp', filename)
+    return filename
+
+
+def loadWalkingDistance(size=puzzleSize, directory=None):
+    """
+    Load the table heuristicWalkingDistance uses for a board size, building and writing it first if needed
+    :param size: number of rows and cols of the board
+    :param directory: table directory (defaults to pdbDirectory)
+    :return: WalkingDistanceTable
+    """
+    filename = walkingFilename(size, directory)
+    if not os.path.exists(filename):
+        writeWalkingDistance(size, directory)
+
+    with open(filename, 'rb') as fh:
+        data = fh.read()
+    width = keyBytes(size)
+    if len(data) % (width + 1):
+        raise ValueError('Walking distance table %s has an invalid size (%d bytes)' % (filename, len(data)))
+    distances = {int.from_bytes(data[i:i + width], 'little'): data[i + width] for i in range(0, len(data), width + 1)}
+    table = walkingTables[size] = WalkingDistanceTable(size, distances)
+    return table
+
+
+def getWalkingDistance(size):
+    """
+    Return the loaded table for a board size, loading it on first use
+    :param size: number of rows and cols of the board
+    :return: WalkingDistanceTable
+    """
+    table = walkingTables.get(size)
+    if table is None:
+        table = loadWalkingDistance(size)
+    return table
+
+
+def packedState(puzzle: Puzzle):
+    """
+    Return the packed tiles of a node
+    :param puzzle:
+    :return:
+    """
+    if isinstance(puzzle, PackedPuzzle):
+        return puzzle.state
+    return packTiles(puzzle.tiles, puzzle.board)[0]
+
+
+def abstractKey(state, units, board):
+    """
+    Return the key of a packed board in one abstraction
+    :param state: packed tiles
+    :param units: WalkingDistanceTable.rowUnits or colUnits
+    :param board: BoardInfo of the puzzle
+    :return:
+    """
+    bits = board.cellBits
+    mask = board.cellMask
+    key = 0
+    for cell in range(board.numCells):
+        key += units[(state >> (cell * bits)) & mask][cell]
+    return key
+
+
+def boardKeys(state, table, board):
+    """
+    Return the keys of a packed board in both abstractions
+    :param state: packed tiles
+    :param table: WalkingDistanceTable of the board size
+    :param board: BoardInfo of the puzzle
+    :return: (row key, col key)
+    """
+    return abstractKey(state, table.rowUnits, board), abstractKey(state, table.colUnits, board)
+
+
+def heuristicWalkingDistance(puzzle: Puzzle):
+    """
+    Walking distance heuristic: moves needed in the row abstraction plus moves needed in the column abstraction
+    This is admissible since each move only counts in one of them
+    :return:
+    """
+    board = puzzle.board
+    if not board.usualGoal:
+        raise ValueError('Walking distance tables are built for the usual goal')
+    table = getWalkingDistance(board.size)
+    puzzle.heuristicKeys = boardKeys(packedState(puzzle), table, board)
+    (rowKey, colKey) = puzzle.heuristicKeys
+    return table.distances[rowKey] + table.distances[colKey]
+
+
+def walkingDistanceDelta(parentH, move, movedTile, child: Puzzle):
+    """
+    Incremental walking distance: an up/down move only changes the row abstraction, a left/right move
+    the column one. The child's key of that abstraction is made from the parent's by moving the tile and
+    the empty square, and both keys are left on the child for its own children.
+    The parent's keys are read from child.parent. A board moved in place with no parent node (idaStar) holds
+    its parent's keys when the move is made, and the search puts them back when it undoes the move. Keys that
+    are missing (the parent's value came from elsewhere) are rebuilt from the parent's board.
+    :param parentH: heuristicWalkingDistance value of the parent
+    :param move: direction the empty square moved
+    :param movedTile: numbered tile that moved
+    :param child: node after the move
+    :return: heuristicWalkingDistance value of the child
+    """
+    board = child.board
+    if not board.usualGoal:
+        raise ValueError('Walking distance tables are built for the usual goal')
+    table = getWalkingDistance(board.size)
+    if isinstance(child, PackedPuzzle):
+        oldCell = child.blank  # the moved tile was where the empty square is now
+    else:
+        row, col = child.getEmptyPosition()
+        oldCell = row * board.size + col
+    newCell = oldCell - board.moveOffsets[move]
+
+    parent = child.parent
+    keys = child.heuristicKeys if parent is None else parent.heuristicKeys
+    if keys is None:
+        keys = boardKeys(movePacked(packedState(child), oldCell, newCell, board.cellBits), table, board)
+        if parent is not None:
+            parent.heuristicKeys = keys
+    (rowKey, colKey) = keys
+
+    vertical = move in (moveU, moveD)
+    units = table.rowUnits if vertical else table.colUnits
+    parentKey = rowKey if vertical else colKey
+    key = parentKey + units[movedTile][newCell] - units[movedTile][oldCell] + units[0][oldCell] - units[0][newCell]
+    child.heuristicKeys = (key, colKey) if vertical else (rowKey, key)
+    return parentH - table.distances[parentKey] + table.distances[key]
+
+
+heuristicWalkingDistance.delta = walkingDistanceDelta
+heuristicWalkingDistance.cheap = heuristicCityBlock  # lower bound used to queue children in lazy aStar
+
+
+if __name__ == '__main__':
+    # rebuild the tables: python walking_distance.py [sizes...]
+    for size in [int(arg) for arg in sys.argv[1:]] or [puzzleSize]:
+        start = time.time()
+        filename = writeWalkingDistance(size)
+        print('Wrote %s (%d states) in %.1f seconds' % (filename, len(loadWalkingDistance(size).distances),
+                                                        time.time() - start))